@@ -0,0 +1,131 @@
+'''benchmark of chunking() on a corpus of many generated documents
+
+usage: python -m benchmarks.bench_chunking [n_docs]
+Compares the single-pass chunker with the original implementation (string +=, repeated
+sentence splits, deepcopy per chunk) and checks that both produce the same JSONL.
+'''
+from src.chunking import chunking, Section, MARKER_PREFIX, MARKER_SUFFIX, _get_sentences, _count_words
+from src import chunking as chunking_module
+from src.extract_text import _render_with_state
+from src.extract_metadata import extract_metadata
+from src.parse_html import parse_html
+from benchmarks.synthetic import synthetic_page
+import sys, json, time, copy, hashlib, contextlib, io
+
+def legacy_get_sections(text: str):
+    '''the original section splitter (string +=), unchanged reference for legacy_chunking'''
+    def make_output(heading: str, lvl: int, txt: str):
+        length = _count_words(txt)
+        if length < 5: return None  # kill very short lines
+        return Section(heading, lvl, txt, False)
+    def parse_marker(line: str):
+        '''parses a section marker line'''
+        end_idx = line.find(MARKER_SUFFIX)
+        inner = line[len(MARKER_PREFIX) : end_idx]  # extract inner content
+        heading, lvl = inner.split('; level: ')
+        return heading.strip(), int(lvl.strip())
+    sect_txt = ''
+    heading = None
+    first = True
+    for ln in text.splitlines():  # process each line
+        ln = ln.strip()
+        if ln.startswith(MARKER_PREFIX):  # found a section marker
+            if not first:  # not the first marker
+                out = make_output(heading, lvl, sect_txt.strip())
+                if out: yield out
+                sect_txt = ''
+            first = False
+            heading, lvl = parse_marker(ln)  # parse marker
+            continue
+        sect_txt += ln + ' '
+
+    out = make_output(heading, lvl, sect_txt.strip())
+    if out: yield out
+
+def legacy_chunking(text: str, chunk_template: dict[str, any]):
+    '''the original chunker (reference output)'''
+    MAX_CHUNK_LENGTH = chunking_module.MAX_CHUNK_LENGTH
+    chunk_txt = ['']
+    sects_in_chunk = [[]]
+    chunk_length = 0
+    prev2 = prev1 = ''
+    for sect in legacy_get_sections(text):
+        sect_length = _count_words(sect.text)
+        if chunk_length + sect_length <= MAX_CHUNK_LENGTH:
+            chunk_txt[-1] += sect.text + ' '
+            sects_in_chunk[-1].append(sect)
+            chunk_length += sect_length
+            tail = _get_sentences(sect.text)
+            if tail: prev2, prev1 = (tail[-2] if len(tail) > 1 else prev1), tail[-1]
+        else:
+            added_to_current = False
+            for s in _get_sentences(sect.text):
+                sentence_length = _count_words(s)
+                if chunk_length + sentence_length <= MAX_CHUNK_LENGTH:
+                    if not added_to_current:
+                        sects_in_chunk[-1].append(sect)
+                        sect.got_split = True
+                        added_to_current = True
+                    chunk_txt[-1] += s + ' '
+                    prev2, prev1 = prev1, s
+                    chunk_length += sentence_length
+                else:
+                    overlap = (prev2 + ' ' + prev1).strip()
+                    chunk_txt.append(((overlap + ' ' + s).strip() + ' '))
+                    sects_in_chunk.append([sect])
+                    if added_to_current: sect.got_split = True
+                    added_to_current = True
+                    chunk_length = _count_words(chunk_txt[-1])
+                    prev2, prev1 = prev1, s
+    out = []
+    char_pos = 0
+    overlap = 0
+    for i, txt in enumerate(chunk_txt):
+        if not txt: continue
+        content_hash = hashlib.sha256(' '.join(txt.split()).encode('utf-8')).hexdigest()
+        nxt_line = copy.deepcopy(chunk_template)
+        nxt_line['id'] = chunk_template['id'] + str(i)
+        nxt_line['text'] = txt.strip()
+        nxt_line['metadata']['headings'] = [{'heading': s.heading, 'lvl': s.lvl, 'got_split': s.got_split} for s in sects_in_chunk[i]]
+        nxt_line['metadata']['chunk_index'] = i
+        nxt_line['metadata']['word_count'] = _count_words(txt)
+        nxt_line['metadata']['start_char'] = char_pos
+        char_pos += len(txt.strip())
+        nxt_line['metadata']['end_char'] = char_pos
+        nxt_line['metadata']['overlap_char'] = overlap
+        if len(_get_sentences(txt)) >= 2:
+            overlap = len(_get_sentences(txt)[-2] + ' ' + _get_sentences(txt)[-1])
+            char_pos -= overlap
+        else: print('WARNING: Overlap is not possible.')
+        nxt_line['metadata']['content_hash'] = content_hash
+        out.append(nxt_line)
+    return out
+
+def _corpus(n_docs: int) -> list[tuple[str, dict[str, any]]]:
+    '''rendered text + metadata of n_docs generated pages of varying size'''
+    docs = []
+    for i in range(n_docs):
+        parsed = parse_html(synthetic_page(20 + (i * 37) % 200, seed=i), parser='lxml')
+        docs.append((_render_with_state(parsed), extract_metadata(parsed)))
+    return docs
+
+def _run(fn, docs) -> tuple[float, list[str]]:
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):  # overlap warnings
+        out = [fn(text, tmpl) for text, tmpl in docs]
+    seconds = time.perf_counter() - start
+    return seconds, [json.dumps(c, ensure_ascii=False) for chunks in out for c in chunks]
+
+def main(n_docs: int = 300) -> int:
+    docs = _corpus(n_docs)
+    words = sum(_count_words(text) for text, _ in docs)
+    t_old, old = _run(legacy_chunking, docs)
+    t_new, new = _run(chunking, docs)
+    print(f'{n_docs} documents, {words:,} words, {len(new):,} chunks')
+    print(f'legacy chunker:      {t_old:.3f}s  ({words / t_old:,.0f} words/s)')
+    print(f'single-pass chunker: {t_new:.3f}s  ({words / t_new:,.0f} words/s)')
+    print('same JSONL' if old == new else 'JSONL DIFFERS')
+    return 0 if old == new else 1
+
+if __name__ == '__main__':
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 300))
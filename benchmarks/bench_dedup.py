@@ -0,0 +1,60 @@
+'''benchmark + check of the near-duplicate stage (src/dedup.py) on generated chunks
+
+usage: python -m benchmarks.bench_dedup [n_chunks]
+Generates unique chunks plus copies with a few words changed (near-duplicates) and exact
+copies, runs NearDuplicates over them in documents of 20 chunks and reports time per chunk
+for growing corpus sizes (LSH => close to linear). On the smallest corpus the result is
+compared with the exact Jaccard similarity of all pairs (precision/recall of the tagging).
+'''
+from src.dedup import NearDuplicates, THRESHOLD, _shingles
+import sys, time, random
+
+def _corpus(n: int, seed: int = 0) -> tuple[list[dict[str, any]], list[int | None]]:
+    '''chunks + the index of the chunk each one was copied from (None = unique)'''
+    rnd = random.Random(seed)
+    vocab = [f'w{i}' for i in range(5000)]
+    texts, source = [], []
+    for i in range(n):
+        if texts and rnd.random() < 0.2:  # near-duplicate: 1-3 words replaced
+            j = rnd.randrange(len(texts))
+            words = texts[j].split()
+            for _ in range(rnd.randint(1, 3)): words[rnd.randrange(len(words))] = rnd.choice(vocab)
+            texts.append(' '.join(words))
+            source.append(source[j] if source[j] is not None else j)
+        elif texts and rnd.random() < 0.05:  # exact copy
+            j = rnd.randrange(len(texts))
+            texts.append(texts[j])
+            source.append(source[j] if source[j] is not None else j)
+        else:
+            texts.append(' '.join(rnd.choice(vocab) for _ in range(rnd.randint(80, 200))))
+            source.append(None)
+    chunks = [{'id': f'doc{i // 20}::c{i % 20}', 'text': t, 'metadata': {'content_hash': str(hash(t))}} for i, t in enumerate(texts)]
+    return chunks, source
+
+def _run(chunks: list[dict[str, any]]) -> tuple[NearDuplicates, float]:
+    dedup = NearDuplicates('tag')
+    start = time.perf_counter()
+    for i in range(0, len(chunks), 20): dedup.filter(chunks[i:i + 20])
+    return dedup, time.perf_counter() - start
+
+def _exact(chunks: list[dict[str, any]]) -> set[int]:
+    '''chunks with a truly similar earlier chunk (all pairs, exact Jaccard)'''
+    sets = [set(_shingles(c['text']).tolist()) for c in chunks]
+    return {i for i in range(len(sets)) if any(len(sets[i] & sets[j]) / len(sets[i] | sets[j]) >= THRESHOLD for j in range(i))}
+
+def main(n: int = 50_000) -> int:
+    chunks, _ = _corpus(min(n, 2000))
+    dedup, _ = _run(chunks)
+    tagged = {i for i, c in enumerate(chunks) if c['metadata']['cluster_id'] != c['id']}
+    truth = _exact(chunks)
+    precision = len(tagged & truth) / len(tagged) if tagged else 1.0
+    recall = len(tagged & truth) / len(truth) if truth else 1.0
+    print(f'{len(chunks)} chunks: {len(truth)} near-duplicates (exact Jaccard >= {THRESHOLD}), {len(tagged)} tagged, precision {precision:.3f}, recall {recall:.3f}')
+    for size in sorted({1000, 10_000, n}):
+        chunks, source = _corpus(size, seed=1)
+        dedup, secs = _run(chunks)
+        print(f'{size:>8,} chunks: {secs:7.2f}s ({secs / size * 1e6:6.1f} us/chunk), {dedup.duplicates:,} near-duplicates ({sum(s is not None for s in source):,} generated)')
+    return 0 if precision > 0.95 and recall > 0.95 else 1
+
+if __name__ == '__main__':
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 50_000))
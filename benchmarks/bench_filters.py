@@ -0,0 +1,71 @@
+'''micro-benchmark of the compiled SKIP_* matchers against the original any(...) loops
+
+usage: python -m benchmarks.bench_filters [repeat]
+Uses every element of the saved pages in data/, checks that both give the same skip
+decision for every element and prints the throughput of each variant.
+'''
+from src.filters.filter_attribute import *
+from src.filters.filter_class import *
+from src.filters.filter_id import *
+from src.filters.filter_tag import *
+from src.filters import matcher
+from src.extract_text import _should_skip_node, _get_tag
+from src.parse_html import parse_html
+from benchmarks.check_parsers import _pages, ROOT
+import sys, time
+
+def legacy_should_skip(node) -> bool:
+    '''the original per-entry any(...) implementation (reference for the skip decisions)'''
+    if not (tag := _get_tag(node)): return True
+    if tag in SKIP_TAG: return True
+    attr = node.attrib
+    classes = attr.get('class')
+    if isinstance(classes, str):
+        for c in classes.strip().lower().split():
+            if c in SKIP_CLASS: return True
+            if any(c.startswith(p) for p in SKIP_CLASS_PREFIX): return True
+            if any(substr in c for substr in SKIP_CLASS_CONTAINS): return True
+    for name, value in attr.items():
+        if isinstance(name, str):
+            name = name.strip().lower()
+            if name in SKIP_ATTR: return True
+            if any(name.startswith(p) for p in SKIP_ATTR_PREFIX): return True
+            if any(substr in name for substr in SKIP_ATTR_NAME_CONTAINS): return True
+        if isinstance(value, str):
+            value = value.strip().lower()
+            if any(substr in value for substr in SKIP_ATTR_VALUE_CONTAINS): return True
+    hidden = attr.get('aria-hidden')
+    if isinstance(hidden, str) and hidden.strip().lower() == 'true': return True
+    id_val = attr.get('id')
+    if id_val and isinstance(id_val, str):
+        id_val = id_val.strip().lower()
+        if id_val in SKIP_ID: return True
+        if any(id_val.startswith(p) for p in SKIP_ID_PREFIX): return True
+        if any(substr in id_val for substr in SKIP_ID_CONTAINS): return True
+    return False
+
+def _legacy_class_token(c: str) -> bool:
+    return c in SKIP_CLASS or any(c.startswith(p) for p in SKIP_CLASS_PREFIX) or any(s in c for s in SKIP_CLASS_CONTAINS)
+
+def _rate(fn, items: list, repeat: int) -> float:
+    '''items per second of fn over items'''
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for it in items: fn(it)
+    return len(items) * repeat / (time.perf_counter() - start)
+
+def main(repeat: int = 5) -> int:
+    nodes = [n for folder in _pages(ROOT / 'data') for n in parse_html((folder / f'{folder.name}_raw.html').read_text(encoding='utf-8'), parser='lxml').root.iter()]
+    tokens = [c for n in nodes if isinstance(n.tag, str) for c in (n.attrib.get('class') or '').lower().split()]
+    mismatch = [n for n in nodes if legacy_should_skip(n) != _should_skip_node(n)]
+    print(f'{len(nodes)} elements, {len(tokens)} class tokens ({len(set(tokens))} distinct), {len(mismatch)} different skip decisions')
+
+    print(f'class token  legacy any():  {_rate(_legacy_class_token, tokens, repeat):>12,.0f} tokens/s')
+    print(f'class token  compiled:      {_rate(matcher._CLASS_RE.search, tokens, repeat):>12,.0f} tokens/s')
+    print(f'class token  compiled+cache:{_rate(matcher.skip_class, tokens, repeat):>12,.0f} tokens/s')
+    print(f'element      legacy:        {_rate(legacy_should_skip, nodes, repeat):>12,.0f} elements/s')
+    print(f'element      compiled:      {_rate(_should_skip_node, nodes, repeat):>12,.0f} elements/s')
+    return 1 if mismatch else 0
+
+if __name__ == '__main__':
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5))
@@ -0,0 +1,59 @@
+'''benchmark + check of the metadata stage (src/extract_metadata.py) on many pages
+
+usage: python -m benchmarks.bench_metadata [n_pages]
+The saved pages of data/ and generated pages (with saved-from comments, og:* meta, canonical
+links) are repeated up to n_pages. Reports microseconds per page for the shared tree, for raw
+HTML (only the head is parsed) and for extract_metadata_many on a thread and a process pool.
+All ways must give the same metadata, also when the threads run extract_metadata at the same
+time on different pages (no module state).
+'''
+from src.extract_metadata import extract_metadata, extract_metadata_many
+from src.parse_html import parse_html
+from benchmarks.synthetic import synthetic_page
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from pathlib import Path
+import sys, time, warnings
+
+ROOT = Path(__file__).resolve().parents[1]
+
+def _pages(n: int) -> list[str]:
+    saved = [p.read_text(encoding='utf-8') for p in sorted((ROOT / 'data').glob('*/*_raw.html'))]
+    generated = []
+    for i in range(20):
+        url = f'https://site{i % 3}.example.org/wiki/Page_{i}'
+        head = f'<meta property="og:site_name" content="Site {i % 3}"><link rel="canonical" href="/wiki/Page_{i}"><meta property="og:url" content="{url}">'
+        html = synthetic_page(3, seed=i).replace('<title>Synthetic page - Wikipedia</title>', f'<title>Page {i}</title>{head}')
+        generated.append(f'<!-- saved from url=({len(url):04}){url} -->\n{html}' if i % 2 else html)
+    pages = saved + generated
+    return [pages[i % len(pages)] for i in range(n)]
+
+def _strip(template: dict[str, any]) -> dict[str, any]: return {k: v for k, v in template['metadata'].items() if k != 'fetched_at'}
+
+def _timed(fn) -> tuple[list[dict[str, any]], float]:
+    start = time.perf_counter()
+    out = [_strip(m) for m in fn()]
+    return out, time.perf_counter() - start
+
+def main(n: int = 2000) -> int:
+    warnings.simplefilter('ignore')
+    pages = _pages(n)
+    trees = [parse_html(html, parser='lxml') for html in pages]
+    results = {}
+    results['shared tree'] = _timed(lambda: map(extract_metadata, trees))
+    results['raw HTML (head)'] = _timed(lambda: map(extract_metadata, pages))
+    with ThreadPoolExecutor(4) as pool:
+        results['threads (4), batches'] = _timed(lambda: extract_metadata_many(pages, pool))
+        results['threads (4), one page each'] = _timed(lambda: pool.map(extract_metadata, pages))  # pages interleave: a shared module tree would mix them up
+    with ProcessPoolExecutor(2) as pool: results['processes (2), batches'] = _timed(lambda: extract_metadata_many(pages, pool))
+    expected = results['shared tree'][0]
+    failed = 0
+    for name, (out, secs) in results.items():
+        same = out == expected
+        failed += not same
+        print(f'{name:<28} {secs / n * 1e6:8.1f} us/page  {"same" if same else "DIFFERENT"}')
+    print(f'{n} pages ({len({m["doc_id"] for m in expected})} distinct)')
+    print('metadata OK' if not failed else f'{failed} ways FAILED')
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000))
@@ -0,0 +1,96 @@
+'''benchmark of section removal in _render_with_state with many unchecked sections
+
+usage: python -m benchmarks.bench_sections [n_sections] [n_unchecked] [n_fuzz]
+Compares the one-pass removal with the original per-range removal (list index lookups)
+and with the GUI preview (pre-grouped section blocks) on a generated page and checks
+that all three render the same text. The preview is also compared with the saved text on
+`n_fuzz` random nested layouts (headings inside wrappers with loose text and tails).
+'''
+from src.extract_text import _render_with_state, _get_section_blocks, _render_sections, _get_headings, _get_visibility, _get_removal_ranges, _insert_section_markers, _get_blocks, _merge_lines
+from src.parse_html import parse_html
+from benchmarks.synthetic import synthetic_page
+import sys, time, random
+
+def legacy_remove_between(start, end) -> None:
+    '''original removal of one range: O(N) list build and list.index lookups per range'''
+    root = start.getroottree().getroot()
+    nodes = list(root.iter())
+    if start not in nodes or (end is not None and end not in nodes): return
+    start_idx = nodes.index(start)
+    end_idx = nodes.index(end) if end is not None else len(nodes)
+    if end is not None and end_idx <= start_idx: return
+    protected = set(end.iterancestors()) | {end} if end is not None else set()
+    for n in reversed(nodes[start_idx:end_idx]):
+        if n in protected: continue
+        p = n.getparent()
+        if p is not None: p.remove(n)
+
+def legacy_render(parsed, state: dict[str, bool]) -> str:
+    '''_render_with_state with the original list membership and per-range removal'''
+    root = parsed.clone()
+    vis = _get_visibility(root)
+    heads = _get_headings(root, vis)
+    keys = [f"{i+1}. {h.text.strip()} (lvl: {h.lvl})" for i, h in enumerate(heads)]
+    to_remove = [heads[i] for i, k in enumerate(keys) if not state.get(k, True)]
+    for start, end in reversed(_get_removal_ranges(heads, to_remove)): legacy_remove_between(start, end)
+    if keys and not state.get(keys[0], True): root.text = ''
+    _insert_section_markers(root, vis)
+    return _merge_lines('\n'.join(block.text for block in _get_blocks(root, vis)))
+
+def _nested(rng: random.Random, depth: int = 0) -> str:
+    '''random body content: headings, paragraphs, loose text and <div> wrappers (with tail text) around them'''
+    parts = []
+    for _ in range(rng.randint(1, 5)):
+        kind = rng.choice(('h', 'h', 'p', 'text', 'div') if depth < 3 else ('h', 'p', 'text'))
+        n = rng.randint(0, 999)
+        if kind == 'h': parts.append(f'<h{(lvl := rng.randint(1, 4))}>Heading {n}</h{lvl}>')
+        elif kind == 'p': parts.append(f'<p>paragraph {n}</p>')
+        elif kind == 'text': parts.append(f'loose text {n}')
+        else: parts.append(f'<div>{_nested(rng, depth + 1)}</div>' + (f'tail {n}' if rng.random() < 0.5 else ''))
+    return ''.join(parts)
+
+def check_nested(n_fuzz: int, seed: int = 0) -> int:
+    '''GUI preview (or its fallback) vs _render_with_state on random nested layouts and states, returns the mismatches'''
+    rng = random.Random(seed)
+    failed = grouped = 0
+    for _ in range(n_fuzz):
+        parsed = parse_html(f'<html><head><title>t</title></head><body>{_nested(rng)}</body></html>', parser='lxml')
+        heads, sections = _get_section_blocks(parsed)
+        keys = [f"{i+1}. {h.text.strip()} (lvl: {h.lvl})" for i, h in enumerate(heads)]
+        state = {k: rng.random() < 0.6 for k in keys}
+        preview = _render_sections(heads, sections, state) if sections is not None else _render_with_state(parsed, state)  # as render_preview in the GUI
+        grouped += sections is not None
+        failed += preview != _render_with_state(parsed, state)
+    print(f'nested layouts: {n_fuzz} pages, {grouped} previewed from section blocks, {failed} differ from the saved text')
+    return failed
+
+def _time(fn, *args) -> tuple[float, any]:
+    start = time.perf_counter()
+    out = fn(*args)
+    return time.perf_counter() - start, out
+
+def main(n_sections: int = 2000, n_unchecked: int = 60, n_fuzz: int = 2000) -> int:
+    parsed = parse_html(synthetic_page(n_sections), parser='lxml')
+    heads = _get_headings(parsed.root)
+    keys = [f"{i+1}. {h.text.strip()} (lvl: {h.lvl})" for i, h in enumerate(heads)]
+    step = max(1, len(keys) // n_unchecked)
+    state = {k: (i % step != step // 2) for i, k in enumerate(keys)}  # every step-th section unchecked, spread over the page
+    unchecked = sum(not v for v in state.values())
+    print(f'{len(parsed.html) / 1e6:.1f} MB page, {sum(1 for _ in parsed.root.iter())} elements, {len(keys)} sections, {unchecked} unchecked')
+
+    t_all, _ = _time(_render_with_state, parsed, None)
+    t_new, new = _time(_render_with_state, parsed, state)
+    t_old, old = _time(legacy_render, parsed, state)
+    print(f'render all sections:         {t_all:.3f}s')
+    print(f'render unchecked (one pass): {t_new:.3f}s')
+    print(f'render unchecked (legacy):   {t_old:.3f}s')
+    t_blocks, (heads, sections) = _time(_get_section_blocks, parsed)
+    t_preview, preview = _time(_render_sections, heads, sections, state)
+    print(f'GUI section blocks (once):   {t_blocks:.3f}s')
+    print(f'GUI preview after toggle:    {t_preview * 1000:.1f}ms')
+    same = new == old == preview and not check_nested(n_fuzz)
+    print('same output' if same else 'OUTPUT DIFFERS')
+    return 0 if same else 1
+
+if __name__ == '__main__':
+    sys.exit(main(*(int(a) for a in sys.argv[1:4])))
@@ -0,0 +1,138 @@
+'''benchmark suite: time and peak memory of every pipeline stage on the saved pages and on generated pages of growing size
+
+usage: python -m benchmarks.bench_stages [--sizes 10k,100k,1m,5m,20m] [--parser lxml] [--repeat 3] [--no-mem] [--out results.json]
+       python -m benchmarks.bench_stages compare old.json new.json
+Works offline (data/ + benchmarks/synthetic.py). Every stage gets the output of the stage
+before it, times are the best of --repeat runs (stages slower than 1s run once). Peak memory
+is measured in an extra run under tracemalloc (Python allocations, libxml2 memory is not
+included). The scaling exponent per stage is the slope of log(time) over log(page size)
+on the generated pages (1.0 = linear). Results are written as JSON (default
+benchmarks/results/stages-<time>.json), compare prints the ratios between two runs.
+'''
+from src.parse_html import PARSER, PARSERS, ParsedHTML, parse_html
+from src.extract_text import _get_visibility, _get_headings, _get_blocks, _merge_lines, _render_with_state
+from src.extract_text_via_bs4 import extract_text_via_bs4
+from src.extract_metadata import extract_metadata
+from src.extract_urls import extract_urls
+from src.chunking import chunking
+from benchmarks.check_parsers import _pages, ROOT
+from benchmarks.synthetic import synthetic_page_of_size
+from datetime import datetime
+from pathlib import Path
+import argparse, contextlib, io, json, math, platform, sys, time, tracemalloc, warnings
+
+RESULTS = ROOT / 'benchmarks' / 'results'
+_UNITS = {'k': 1_000, 'm': 1_000_000}
+
+def _stages(html: str, parser: str) -> list[tuple[str, any]]:
+    '''(name, fn) in pipeline order; every fn returns the input of the next stages'''
+    s: dict[str, any] = {}
+    def parse(): s['parsed'] = parse_html(html, parser=parser)
+    def metadata(): s['template'] = extract_metadata(s['parsed'])
+    def urls(): extract_urls(s['template']['metadata'], ParsedHTML(html, s['parsed'].root))  # fresh wrapper => hrefs not cached
+    def clone(): s['root'] = s['parsed'].clone()
+    def visibility(): s['vis'] = _get_visibility(s['root'])
+    def headings(): _get_headings(s['root'], s['vis'])
+    def blocks(): s['blocks'] = [b.text for b in _get_blocks(s['root'], s['vis'])]
+    def merge_lines(): _merge_lines('\n'.join(s['blocks']))
+    def render(): s['text'] = _render_with_state(s['parsed'])  # clone + visibility + markers + blocks + merge
+    def chunk(): chunking(s['text'], s['template'])
+    def bs4(): extract_text_via_bs4(html)
+    return [(f.__name__, f) for f in (parse, metadata, urls, clone, visibility, headings, blocks, merge_lines, render, chunk, bs4)]
+
+def _time(fn, repeat: int) -> float:
+    best = math.inf
+    for i in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+        if best > 1.0: break  # slow stage => one run is precise enough
+    return best
+
+def _peak(fn) -> int:
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally: tracemalloc.stop()
+
+def bench_page(name: str, html: str, parser: str, repeat: int, mem: bool) -> dict[str, any]:
+    out = {'page': name, 'bytes': len(html.encode('utf-8')), 'stages': {}}
+    with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():  # chunker overlap warnings, bs4 parser warning
+        warnings.simplefilter('ignore')
+        for stage, fn in _stages(html, parser):
+            res = out['stages'][stage] = {'seconds': _time(fn, repeat)}
+            if mem: res['peak_mem'] = _peak(fn)
+    return out
+
+def _scaling(pages: list[dict[str, any]]) -> dict[str, float]:
+    '''least squares slope of log(seconds) over log(bytes) per stage'''
+    out = {}
+    for stage in pages[0]['stages'] if pages else ():
+        pts = [(math.log(p['bytes']), math.log(max(p['stages'][stage]['seconds'], 1e-7))) for p in pages]
+        mx, my = sum(x for x, _ in pts) / len(pts), sum(y for _, y in pts) / len(pts)
+        var = sum((x - mx) ** 2 for x, _ in pts)
+        out[stage] = round(sum((x - mx) * (y - my) for x, y in pts) / var, 2) if var else None
+    return out
+
+def _size(text: str) -> int: return int(float(text[:-1]) * _UNITS[text[-1].lower()]) if text[-1].lower() in _UNITS else int(text)
+
+def _label(n: int) -> str: return f'{n / 1e6:g}MB' if n >= 1e6 else f'{n / 1e3:g}KB'
+
+def run(sizes: list[int], parser: str, repeat: int, mem: bool) -> dict[str, any]:
+    pages = []
+    for folder in _pages(ROOT / 'data'):
+        raw = folder / f'{folder.name}_raw.html'
+        pages.append(bench_page(folder.name, raw.read_text(encoding='utf-8'), parser, repeat, mem))
+        _print_page(pages[-1])
+    synthetic = []
+    for size in sizes:
+        synthetic.append(bench_page(f'synthetic {_label(size)}', synthetic_page_of_size(size), parser, repeat, mem))
+        _print_page(synthetic[-1])
+    scaling = _scaling(synthetic)
+    print('scaling exponent (1.0 = linear): ' + ', '.join(f'{k} {v}' for k, v in scaling.items()))
+    return {'meta': {'date': datetime.now().isoformat(timespec='seconds'), 'parser': parser, 'repeat': repeat, 'python': platform.python_version(), 'platform': platform.platform()},
+            'pages': pages + synthetic, 'scaling': scaling}
+
+def _print_page(page: dict[str, any]) -> None:
+    print(f"{page['page']} ({page['bytes'] / 1e6:.2f} MB)")
+    for stage, res in page['stages'].items():
+        mem = f"  {res['peak_mem'] / 1e6:8.1f} MB" if 'peak_mem' in res else ''
+        print(f"  {stage:<12} {res['seconds'] * 1000:10.2f} ms{mem}")
+
+def compare(old: dict[str, any], new: dict[str, any], threshold: float = 0.1) -> None:
+    '''new/old time ratio per page and stage, changes above threshold are marked'''
+    print(f"old: {old['meta']['date']} ({old['meta']['parser']})  new: {new['meta']['date']} ({new['meta']['parser']})")
+    old_pages = {p['page']: p for p in old['pages']}
+    for page in new['pages']:
+        if page['page'] not in old_pages: continue
+        print(page['page'])
+        for stage, res in page['stages'].items():
+            before = old_pages[page['page']]['stages'].get(stage)
+            if not before: continue
+            ratio = res['seconds'] / before['seconds'] if before['seconds'] else math.inf
+            mark = ('  slower' if ratio > 1 + threshold else '  faster' if ratio < 1 - threshold else '')
+            print(f"  {stage:<12} {before['seconds'] * 1000:10.2f} -> {res['seconds'] * 1000:10.2f} ms  x{ratio:5.2f}{mark}")
+    print('scaling: ' + ', '.join(f"{k} {old['scaling'].get(k)} -> {v}" for k, v in new['scaling'].items()))
+
+def main(argv: list[str]) -> int:
+    if argv[:1] == ['compare']:
+        old, new = (json.loads(Path(p).read_text(encoding='utf-8')) for p in argv[1:3])
+        compare(old, new)
+        return 0
+    ap = argparse.ArgumentParser(description='time and peak memory per pipeline stage')
+    ap.add_argument('--sizes', default='10k,100k,1m,5m,20m', help='generated page sizes in bytes (k/m suffix)')
+    ap.add_argument('--parser', default=PARSER, choices=PARSERS)
+    ap.add_argument('--repeat', type=int, default=3)
+    ap.add_argument('--no-mem', action='store_true', help='skip the tracemalloc runs')
+    ap.add_argument('--out', type=Path, default=None)
+    args = ap.parse_args(argv)
+    result = run([_size(s) for s in args.sizes.split(',') if s], args.parser, args.repeat, not args.no_mem)
+    out = args.out or RESULTS / f"stages-{datetime.now():%Y%m%d-%H%M%S}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, indent=1), encoding='utf-8')
+    print(f'results written to {out}')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
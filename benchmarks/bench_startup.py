@@ -0,0 +1,57 @@
+'''benchmark + check of the command line startup (src/cli.py) for single stage calls on saved input
+
+usage: python -m benchmarks.bench_startup [repeat]
+Runs `python -m src.cli extract` on a saved page and `chunk` on its text in fresh processes
+(best of `repeat`), next to a bare interpreter, the imports of main.py and `python main.py chunk`.
+extract and chunk (also through main.py) must not load any of the heavy modules (browser, GUI,
+bs4, html5lib, the pipeline runner).
+'''
+from benchmarks.synthetic import synthetic_page
+from pathlib import Path
+import sys, json, time, subprocess, tempfile, shutil
+
+ROOT = Path(__file__).resolve().parents[1]
+HEAVY = ('tkinter', 'playwright', 'bs4', 'html5lib', 'colorama', 'asyncio', 'numpy', 'main', 'src.pipeline', 'src.fetcher')
+
+def _best(cmd: list[str], repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(cmd, cwd=ROOT, check=True, capture_output=True)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def _loaded(args: list[str], script: bool = False) -> list[str]:
+    '''heavy modules in sys.modules after the command ran in a fresh process (script: as `python main.py <args>`)'''
+    run = f'sys.argv = ["main.py"] + {args!r}\ntry: runpy.run_path("main.py", run_name="__main__")\nexcept SystemExit: pass' if script else f'from src.cli import main; main({args!r})'
+    code = f'import sys, runpy\n{run}\nprint(__import__("json").dumps([m for m in {HEAVY!r} if m in sys.modules]), file=sys.stderr)'
+    res = subprocess.run([sys.executable, '-c', code], cwd=ROOT, check=True, capture_output=True, text=True)
+    return json.loads(res.stderr.strip().splitlines()[-1])
+
+def main(repeat: int = 5) -> int:
+    tmp = Path(tempfile.mkdtemp())
+    failed = 0
+    try:
+        page = tmp / 'page.html'
+        page.write_text(synthetic_page(20, seed=1), encoding='utf-8')
+        text = tmp / 'page.txt'
+        subprocess.run([sys.executable, '-m', 'src.cli', 'extract', str(page), '--out', str(tmp), '--parser', 'lxml'], cwd=ROOT, check=True)
+        runs = {'python (bare)': [sys.executable, '-c', 'pass'],
+                'import main (all modules)': [sys.executable, '-c', 'import main'],
+                'extract (lxml)': [sys.executable, '-m', 'src.cli', 'extract', str(page), '--out', str(tmp / 'x'), '--parser', 'lxml'],
+                'chunk': [sys.executable, '-m', 'src.cli', 'chunk', str(text), '--out', str(tmp / 'c')],
+                'main.py chunk': [sys.executable, 'main.py', 'chunk', str(text), '--out', str(tmp / 'c')]}
+        times = {name: _best(cmd, repeat) for name, cmd in runs.items()}
+        bare = times['python (bare)']
+        for name, secs in times.items(): print(f'{name:<26} {secs * 1000:7.0f} ms  (+{(secs - bare) * 1000:5.0f} ms over the bare interpreter)')
+        for args in (['extract', str(page), '--out', str(tmp / 'x'), '--parser', 'lxml'], ['chunk', str(text), '--out', str(tmp / 'c')]):
+            for script in (False, True):
+                heavy = _loaded(args, script)
+                failed += bool(heavy)
+                print(f'{"main.py " if script else ""}{args[0]}: heavy modules loaded: {", ".join(heavy) or "none"}')
+    finally: shutil.rmtree(tmp)
+    print('startup OK' if not failed else f'{failed} commands FAILED')
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5))
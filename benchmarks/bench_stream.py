@@ -0,0 +1,70 @@
+'''benchmark + check of the streaming extraction for very large pages (src/stream_extract.py, pipeline.stream_page)
+
+usage: python -m benchmarks.bench_stream [max_mb]
+Generates pages of growing size and processes each one in a fresh process twice: the tree
+path (parse with PARSER = 'lxml', _render_with_state, chunking, write_doc) and the stream path
+(stream_page into the same writer). Reports time and peak RSS growth over the loaded HTML:
+the tree path grows with the page, the stream path must stay flat. Output text and chunks of
+both paths must be identical.
+'''
+from benchmarks.synthetic import synthetic_page_of_size
+from pathlib import Path
+import sys, json, re, time, subprocess, tempfile, shutil, contextlib, io, warnings
+
+def _rss(field: str = 'VmRSS') -> int:
+    '''current (VmRSS) or peak (VmHWM) resident set size in bytes (linux; ru_maxrss would include the parent's size at fork)'''
+    with open('/proc/self/status') as f: return next(int(ln.split()[1]) * 1024 for ln in f if ln.startswith(field + ':'))
+
+def _one(mode: str, html_path: str, out: str) -> None:
+    '''child process: process the page once, print seconds and peak RSS growth as JSON'''
+    from src.writers import FolderWriter
+    html = Path(html_path).read_text(encoding='utf-8')
+    with open('/proc/self/clear_refs', 'w') as f: f.write('5')  # peak := current (the decode of the file above is not part of the run)
+    base = _rss()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()), FolderWriter(out) as writer:
+        if mode == 'tree':
+            from src.parse_html import parse_html
+            from src.extract_text import _render_with_state
+            from src.extract_metadata import extract_metadata
+            from src.chunking import chunking
+            parsed = parse_html(html, parser='lxml')
+            text = _render_with_state(parsed)
+            writer.write_doc('page', html, text, chunking(text, extract_metadata(parsed)))
+        else:
+            from src.pipeline import stream_page
+            stream_page('https://example.org/page', html, 'page', writer, hashes=False)
+    secs = time.perf_counter() - start
+    print(json.dumps({'secs': secs, 'grow': _rss('VmHWM') - base}))
+
+def _read(folder: Path) -> tuple[str, str]:
+    '''output text + chunk lines without fetched_at'''
+    text = (folder / 'data/page/page_output.txt').read_text(encoding='utf-8')
+    chunks = re.sub(r'"fetched_at": "[^"]*"', '', (folder / 'data/page/page_chunks.jsonl').read_text(encoding='utf-8'))
+    return text, chunks
+
+def main(max_mb: int = 32) -> int:
+    warnings.simplefilter('ignore')
+    tmp = Path(tempfile.mkdtemp())
+    failed = 0
+    try:
+        mb = 2
+        while mb <= max_mb:
+            html_path = tmp / 'page.html'
+            html_path.write_text(synthetic_page_of_size(mb << 20, seed=mb), encoding='utf-8')
+            res = {}
+            for mode in ('tree', 'stream'):
+                out = subprocess.run([sys.executable, '-m', 'benchmarks.bench_stream', '--one', mode, str(html_path), str(tmp / mode)],
+                                     capture_output=True, text=True, check=True).stdout
+                res[mode] = json.loads(out.strip().splitlines()[-1])
+            same = _read(tmp / 'tree') == _read(tmp / 'stream')
+            failed += not same
+            print(f'{mb:4} MB: tree {res["tree"]["secs"]:6.2f}s +{res["tree"]["grow"] / 1e6:7.1f} MB | stream {res["stream"]["secs"]:6.2f}s +{res["stream"]["grow"] / 1e6:6.1f} MB | {"same" if same else "DIFFERENT"} output')
+            mb *= 2
+    finally: shutil.rmtree(tmp)
+    print('stream OK' if not failed else f'{failed} sizes FAILED')
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--one']: _one(*sys.argv[2:5])
+    else: sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 32))
@@ -0,0 +1,65 @@
+'''benchmark of the output writers on many generated documents
+
+usage: python -m benchmarks.bench_writers [n_docs]
+Writes the same rendered documents + chunks with every writer in src/writers.py and with
+the old per-file writes (raw and input written separately, one f.write per chunk line)
+and reports time, files and bytes on disk.
+'''
+from src.writers import get_writer, OUTPUTS
+from src.chunking import chunking
+from src.extract_text import _render_with_state
+from src.extract_metadata import extract_metadata
+from src.parse_html import parse_html
+from benchmarks.synthetic import synthetic_page
+from pathlib import Path
+import sys, json, time, tempfile, shutil, contextlib, io
+
+def legacy_write(ROOT: Path, title: str, html: str, text: str, chunks: list[dict[str, any]]) -> None:
+    '''the original main.py writes'''
+    Path(f'{ROOT}/data/{title}').mkdir(parents=True, exist_ok=True)
+    for suffix, content in (('raw.html', html), ('input.txt', html), ('output.txt', text)):
+        with open(f'{ROOT}/data/{title}/{title}_{suffix}', 'w', encoding='utf-8') as f: f.write(content)
+    with open(f'{ROOT}/data/{title}/{title}_chunks.jsonl', 'w', encoding='utf-8') as f:
+        for c in chunks: f.write(json.dumps(c, ensure_ascii=False) + '\n')
+
+def _disk(folder: Path) -> tuple[int, int]:
+    '''(files, bytes) with hard linked files counted once'''
+    inodes = {}
+    for p in folder.rglob('*'):
+        if p.is_file():
+            st = p.stat()
+            inodes[st.st_ino] = st.st_size
+    return sum(1 for p in folder.rglob('*') if p.is_file()), sum(inodes.values())
+
+def _corpus(n_docs: int) -> list[tuple[str, str, str, list[dict[str, any]]]]:
+    '''(title, html, text, chunks) of n_docs generated pages'''
+    docs = []
+    with contextlib.redirect_stdout(io.StringIO()):  # overlap warnings
+        for i in range(n_docs):
+            parsed = parse_html(synthetic_page(20 + (i * 37) % 200, seed=i), parser='lxml')
+            text = _render_with_state(parsed)
+            docs.append((f'doc {i}', parsed.html, text, chunking(text, extract_metadata(parsed))))
+    return docs
+
+def main(n_docs: int = 200) -> int:
+    docs = _corpus(n_docs)
+    print(f'{n_docs} documents, {sum(len(h) for _, h, _, _ in docs) / 1e6:.1f} MB html')
+    for kind in ('legacy', *OUTPUTS):
+        root = Path(tempfile.mkdtemp())
+        try:
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                if kind == 'legacy':
+                    for doc in docs: legacy_write(root, *doc)
+                else:
+                    with get_writer(kind, root) as writer:
+                        for doc in docs: writer.write_doc(*doc)
+            seconds = time.perf_counter() - start
+            files, size = _disk(root)
+            print(f'{kind:<10} {seconds:6.3f}s  {files:5} files  {size / 1e6:7.1f} MB')
+        except ImportError as e: print(f'{kind:<10} skipped ({e.name} not installed)')
+        finally: shutil.rmtree(root)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 200))
@@ -0,0 +1,59 @@
+'''checks learning + applying per-domain boilerplate profiles (src/boilerplate.py) on a generated single-site corpus
+
+usage: python -m benchmarks.check_boilerplate [n_pages]
+Every page has site chrome that the SKIP_* tables do not know (a strip with links, a promo box,
+a legal line, a repeated sentence inside the article) around a generated article. A profile is
+learned from the first 10 pages, the rest is rendered without and with it: the chrome must be
+gone, every article paragraph must still be there, and fewer elements must be visited.
+'''
+from src.boilerplate import BoilerplateProfiles
+from src.extract_text import _render_with_state, _observe_blocks, _get_visibility
+from src.parse_html import parse_html
+from benchmarks.synthetic import synthetic_page
+from pathlib import Path
+import sys, time, tempfile, shutil, warnings
+
+_CHROME = ('Acme Store', 'Spring sale: 20% off everything', 'Copyright Acme Corp. All rights reserved.', 'Subscribe to the Acme newsletter for weekly deals.')
+
+def _page(i: int) -> str:
+    links = ''.join(f'<li><a href="/c{k}">Category {k}</a></li>' for k in range(12))
+    chrome_top = f'<div class="acme-strip"><span class="acme-logo">{_CHROME[0]}</span><ul class="acme-cats">{links}</ul></div><aside class="acme-promo"><p>{_CHROME[1]}</p></aside>'
+    chrome_bottom = f'<div class="acme-legal"><p>{_CHROME[2]}</p></div>'
+    html = synthetic_page(6, seed=i).replace('<main id="content">', f'{chrome_top}<main id="content">').replace('</main>', f'<p>{_CHROME[3]}</p></main>{chrome_bottom}')
+    return html.replace('https://en.wikipedia.org/wiki/Synthetic', f'https://shop.example.com/p{i}')
+
+def main(n_pages: int = 60) -> int:
+    warnings.simplefilter('ignore')  # html5lib/bs4 parser warnings
+    root = Path(tempfile.mkdtemp())
+    failed = 0
+    try:
+        pages = [(f'https://shop.example.com/p{i}', parse_html(_page(i), parser='lxml')) for i in range(n_pages)]
+        learner = BoilerplateProfiles(root, 'learn')
+        for url, parsed in pages[:10]: learner.observe(url, _observe_blocks(parsed.root))
+        learner.learn()
+        learner.save()
+        print(learner.summary())
+        profile = BoilerplateProfiles(root).get(pages[0][0])
+        print(f'{len(profile.paths)} paths: ' + ', '.join(p.rsplit('/', 1)[-1] for p in sorted(profile.paths)))
+        visited, times = [0, 0], [0.0, 0.0]
+        for url, parsed in pages[10:]:
+            start = time.perf_counter()
+            plain = _render_with_state(parsed)
+            times[0] += time.perf_counter() - start
+            start = time.perf_counter()
+            text = _render_with_state(parsed, profile=profile)
+            times[1] += time.perf_counter() - start
+            visited[0] += len(_get_visibility(parsed.root))
+            visited[1] += len(_get_visibility(parsed.root, profile))
+            left = [c for c in _CHROME if c in text]
+            lost = [p for p in plain.split('\n') if p not in _CHROME and p not in text and not p.startswith('Category ')]  # category links are chrome too
+            if left or lost:
+                failed += 1
+                print(f'{url}: chrome left {left}, content lost {lost[:3]}')
+        print(f'{n_pages - 10} pages: elements visited {visited[0]:,} => {visited[1]:,}, render {times[0]:.3f}s => {times[1]:.3f}s, last page {len(plain)} => {len(text)} chars')
+    finally: shutil.rmtree(root)
+    print('profiles OK' if not failed else f'{failed} pages FAILED')
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 60))
@@ -0,0 +1,60 @@
+'''checks the Parquet/Arrow chunk export against the JSONL chunks and compares the load time
+
+usage: python -m benchmarks.check_chunk_tables [n_docs]
+Writes generated documents with the parquet and arrow outputs (small row groups/files so
+batches and file rotation are used), reads the tables back into chunk dicts and checks them
+against chunking(). Then loads the text + headings + domain of all chunks once from JSONL
+(json.loads per line) and once from the columns.
+'''
+from src import writers
+from src.writers import get_writer, _jsonl
+from benchmarks.bench_writers import _corpus
+from pathlib import Path
+import sys, json, time, tempfile, shutil, contextlib, io
+
+def _read(paths: list[Path], fmt: str):
+    import pyarrow as pa, pyarrow.parquet as pq
+    if fmt == 'parquet': return pa.concat_tables([pq.read_table(p) for p in paths])
+    return pa.concat_tables([pa.ipc.open_stream(p).read_all() for p in paths])
+
+def _unflatten(row: dict[str, any]) -> dict[str, any]:
+    '''table row => chunk dict like chunking() (for the comparison)'''
+    meta = {k: row[k] for k in writers._META_COLUMNS}
+    meta['fetched_at'] = meta['fetched_at'].isoformat() if meta['fetched_at'] else None
+    return {'id': row['id'], 'text': row['text'], 'metadata': meta}
+
+def _canonical(chunk: dict[str, any]) -> str:
+    return json.dumps({'id': chunk['id'], 'text': chunk['text'], 'metadata': {k: chunk['metadata'].get(k) for k in writers._META_COLUMNS}}, sort_keys=True, ensure_ascii=False)
+
+def main(n_docs: int = 200) -> int:
+    docs = _corpus(n_docs)
+    chunks = [c for *_, cs in docs for c in cs]
+    print(f'{n_docs} documents, {len(chunks):,} chunks')
+    writers.ROW_GROUP, writers.ROWS_PER_FILE = 500, 2000
+    failed = 0
+    for fmt in ('parquet', 'arrow'):
+        root = Path(tempfile.mkdtemp())
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                with get_writer(fmt, root) as writer:
+                    for doc in docs: writer.write_doc(*doc)
+            table = _read(writer.chunks.paths, fmt)
+            same = [_canonical(_unflatten(r)) for r in table.to_pylist()] == [_canonical(c) for c in chunks]
+            failed += not same
+            size = sum(p.stat().st_size for p in writer.chunks.paths)
+            print(f'{fmt:<8} {len(writer.chunks.paths)} files, {size / 1e6:.1f} MB, {table.schema.field("domain").type}: {"same chunks" if same else "CHUNKS DIFFER"}')
+            if fmt == 'parquet':
+                lines = _jsonl(chunks).splitlines()
+                start = time.perf_counter()
+                loaded = [(c['text'], [h['heading'] for h in c['metadata']['headings']], c['metadata']['domain']) for c in map(json.loads, lines)]
+                t_json = time.perf_counter() - start
+                start = time.perf_counter()
+                cols = _read(writer.chunks.paths, fmt).select(['text', 'headings', 'domain'])
+                t_cols = time.perf_counter() - start
+                print(f'load text/headings/domain: JSONL {t_json:.3f}s, parquet columns {t_cols:.3f}s ({len(loaded):,} / {cols.num_rows:,} rows)')
+        finally: shutil.rmtree(root)
+    print('all tables match' if not failed else f'{failed} tables differ')
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 200))
@@ -0,0 +1,61 @@
+'''checks the crawler on a generated site served locally (depth limit, patterns, visited set, resume)
+
+usage: python -m benchmarks.check_crawler [workers]
+The site is a tree of pages (3 children per page, 4 levels) with relative, absolute,
+fragment, tracking-parameter, excluded (.pdf, /login) and external links. A crawl limited to
+depth 2 must process exactly the pages up to depth 2, each once. A crawl stopped after 5
+pages must resume from its saved state and end with the same set of pages.
+'''
+from src.crawler import Crawler
+from benchmarks.local_server import serve, GzipHandler
+from benchmarks.synthetic import synthetic_page
+from pathlib import Path
+import sys, time, tempfile, shutil, contextlib, io, warnings
+
+_CHILDREN, _LEVELS = 3, 4
+
+def _site(folder: Path) -> dict[str, int]:
+    '''writes the pages, returns page path -> depth'''
+    depth = {'index.html': 0}
+    todo = ['index.html']
+    while todo:
+        name = todo.pop()
+        kids = [f'{name[:-5]}_{i}.html' if name != 'index.html' else f'p{i}.html' for i in range(_CHILDREN)] if depth[name] < _LEVELS - 1 else []
+        for k in kids: depth[k] = depth[name] + 1
+        todo += kids
+        links = ''.join(f'<a href="{k}">child</a><a href="/{k}#top">same</a><a href="{k}?utm_source=x">tracked</a>' for k in kids)
+        links += '<a href="/index.html">home</a><a href="doc.pdf">pdf</a><a href="/login">login</a><a href="https://example.org/x">external</a>'
+        html = synthetic_page(8, seed=len(depth)).replace('<main id="content">', f'<main id="content"><p>{links}</p>')
+        (folder / name).write_text(html.replace('Synthetic page - Wikipedia', name), encoding='utf-8')
+    return depth
+
+def _crawl(base: str, project: Path, workers: int, max_pages: int, resume: bool) -> list[str]:
+    seen = []
+    crawler = Crawler([base + 'index.html'], project, max_depth=2, max_pages=max_pages, workers=workers, resume=resume)
+    with contextlib.redirect_stdout(io.StringIO()): crawler.run(lambda res: seen.append(res.url))
+    return seen
+
+def main(workers: int = 2) -> int:
+    warnings.simplefilter('ignore')  # bs4 parser warning (inherited by forked workers)
+    project = Path(tempfile.mkdtemp())
+    (project / 'site').mkdir()
+    failed = 0
+    try:
+        depth = _site(project / 'site')
+        want = {f'/{n}' for n, d in depth.items() if d <= 2}
+        with serve(project / 'site', GzipHandler) as base:
+            start = time.perf_counter()
+            full = _crawl(base, project, workers, 500, resume=False)
+            print(f'full crawl: {len(full)} pages in {time.perf_counter() - start:.2f}s ({len(want)} expected, {len(depth)} on the site)')
+            got = {u[len(base) - 1:] for u in full}
+            failed += got != want or len(full) != len(set(full))
+            first = _crawl(base, project, workers, 5, resume=False)  # stopped early, state saved
+            rest = _crawl(base, project, workers, 500, resume=True)
+            print(f'resumed crawl: {len(first)} + {len(rest)} pages')
+            failed += set(first) & set(rest) != set() or {u[len(base) - 1:] for u in first + rest} != want
+    finally: shutil.rmtree(project)
+    print('crawl OK' if not failed else 'crawl FAILED')
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 2))
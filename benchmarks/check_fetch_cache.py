@@ -0,0 +1,61 @@
+'''checks the disk fetch cache against a local server (ETag + 304) and counts the network requests per run
+
+usage: python -m benchmarks.check_fetch_cache
+Runs download_many over the same URL list in a temporary project root:
+cold (everything fetched), warm (no requests), expired TTL (conditional requests answered
+with 304, no bodies), one page changed on the server (only that page downloaded again).
+'''
+from src.extract_text import download_many
+from src.fetch_cache import get_fetch_cache
+from benchmarks.check_parsers import _pages, ROOT
+from benchmarks.local_server import serve, GzipHandler
+from benchmarks.synthetic import synthetic_page
+from pathlib import Path
+import sys, time, tempfile, shutil
+
+def _fixtures(folder: Path) -> dict[str, str]:
+    out = {f'{p.name}.html': (p / f'{p.name}_raw.html').read_text(encoding='utf-8') for p in _pages(ROOT / 'data')}
+    for i in range(7): out[f'synthetic_{i}.html'] = synthetic_page(10 + i * 30, seed=i)
+    for name, html in out.items(): (folder / 'site' / name).write_text(html, encoding='utf-8')
+    return out
+
+def _run(label: str, urls: list[str], project: Path) -> list[tuple[str, str]]:
+    requests, not_modified = GzipHandler.requests, GzipHandler.not_modified
+    start = time.perf_counter()
+    out = download_many(urls, str(project))
+    seconds = time.perf_counter() - start
+    print(f'{label:<22} {seconds * 1000:7.1f}ms  {GzipHandler.requests - requests:3} requests ({GzipHandler.not_modified - not_modified} x 304)')
+    return out
+
+def main() -> int:
+    project = Path(tempfile.mkdtemp())  # no config/section_state.json => only the fetch cache is used
+    (project / 'site').mkdir()
+    failed = 0
+    try:
+        fixtures = _fixtures(project)
+        with serve(project / 'site', GzipHandler) as base:
+            urls = [base + n for n in fixtures]
+            want = list(fixtures.values())
+            cache = get_fetch_cache(project)
+            for label in ('cold', 'warm'):
+                got = [html for html, _ in _run(label, urls, project)]
+                failed += got != want
+            cache.ttl = 0  # every entry is stale => revalidate
+            got = [html for html, _ in _run('expired, unchanged', urls, project)]
+            failed += got != want
+            changed = synthetic_page(50, seed=99)
+            (project / 'site' / 'synthetic_0.html').write_text(changed, encoding='utf-8')
+            got = [html for html, _ in _run('expired, one changed', urls, project)]
+            failed += got != [changed if u.endswith('synthetic_0.html') else w for u, w in zip(urls, want)]
+            failed += len(cache.entries()) != len(urls)
+            failed += not cache.remove(urls[0]) or cache.get(urls[0]) is not None
+            cache.save()
+        bodies = sum(1 for _ in (project / 'cache').rglob('*.html.gz'))
+        print(f'{len(cache.entries())} cache entries, {bodies} body files (old body of the changed page removed)')
+        failed += bodies != len(cache.entries())
+    finally: shutil.rmtree(project)
+    print('cache OK' if not failed else f'{failed} checks FAILED')
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,97 @@
+'''fetches the saved pages in data/, generated pages and a page rendered by JavaScript from a local HTTP server with the pooled browser fetcher
+
+usage: python -m benchmarks.check_fetcher [channel | browser executable] [concurrency]
+The browser defaults to playwright's bundled chromium ("msedge" needs an installed Edge, a path
+launches that Chromium/Chrome/Edge executable, like fetcher.BROWSER_PATH).
+Checks that every page comes back with the title stored in the saved HTML, that a load which
+times out and a crashed page are replaced (the pool keeps `concurrency` pages and the same
+slot loads the next page), and compares the pooled/concurrent fetch with the previous fetcher
+(one browser launch per URL, fetcher.LaunchPerPageFetcher).
+'''
+from src.fetcher import BrowserFetcher, LaunchPerPageFetcher
+from src.extract_metadata import extract_metadata
+from benchmarks.check_parsers import _pages, ROOT
+from benchmarks.local_server import serve, SlowHandler
+from benchmarks.synthetic import synthetic_page
+from pathlib import Path
+import asyncio, os, sys, time, tempfile, shutil
+
+_JS_PAGE = '<html><head><title>before</title></head><body><script>setTimeout(() => {document.title = "rendered by js"; document.body.innerHTML = "<p>from js</p>"}, 200)</script></body></html>'
+
+def _site(folder: Path) -> dict[str, str]:
+    '''writes the pages to serve, returns file name -> expected title'''
+    expected = {}
+    for p in _pages(ROOT / 'data'):
+        html = (p / f'{p.name}_raw.html').read_text(encoding='utf-8')
+        (folder / f'saved{len(expected)}.html').write_text(html, encoding='utf-8')
+        expected[f'saved{len(expected)}.html'] = extract_metadata(html)['metadata']['title']
+    for i in range(12):
+        (folder / f'page{i}.html').write_text(synthetic_page(5, seed=i).replace('Synthetic page - Wikipedia', f'Page {i}'), encoding='utf-8')
+        expected[f'page{i}.html'] = f'Page {i}'
+    (folder / 'js.html').write_text(_JS_PAGE, encoding='utf-8')
+    expected['js.html'] = 'rendered by js'  # only after the script ran (networkidle)
+    return expected
+
+def _titles(urls: list[str], expected: list[str], results: list) -> int:
+    '''prints the pages that failed or came back with another title, returns their number'''
+    failed = 0
+    for url, want, res in zip(urls, expected, results):
+        ok = not isinstance(res, BaseException) and res[1] == want
+        failed += not ok
+        if not ok: print(f'FAIL {url}: {res if isinstance(res, BaseException) else res[1]!r} != {want!r}')
+    return failed
+
+def _browser(arg: str | None) -> dict[str, str | None]:
+    '''fetcher arguments of the command line browser: a channel name or the path of an executable'''
+    if arg and os.sep in arg: return {'channel': None, 'executable': arg}
+    return {'channel': arg, 'executable': None}
+
+async def _recycling(base: str, url: str, want: str, browser: dict[str, str | None]) -> int:
+    '''a load that times out and a crashed page must raise, the replaced page of the only slot loads the next URL'''
+    failed = 0
+    SlowHandler.delay = 5
+    async with BrowserFetcher(concurrency=1, timeout=2, **browser) as fetcher:
+        for bad in (base + 'slow/' + url[len(base):], 'chrome://crash'):
+            start = time.perf_counter()
+            try:
+                await fetcher.fetch(bad)
+                print(f'FAIL {bad}: no error')
+                failed += 1
+            except Exception as e: print(f'{bad[:60]}: {type(e).__name__} after {time.perf_counter() - start:.1f}s (expected)')
+            failed += _titles([url], [want], await fetcher.fetch_many([url]))
+            if fetcher._pages.qsize() != 1:
+                print(f'FAIL pool has {fetcher._pages.qsize()} idle pages after the failure, expected 1')
+                failed += 1
+    return failed
+
+async def main(browser: str | None = None, concurrency: int = 4) -> int:
+    browser = _browser(browser)
+    folder = Path(tempfile.mkdtemp())
+    site = _site(folder)
+    with serve(folder, SlowHandler) as base:
+        urls = [base + name for name in site] * 2  # every page twice
+        expected = list(site.values()) * 2
+        start = time.perf_counter()
+        async with BrowserFetcher(concurrency=concurrency, timeout=30, **browser) as fetcher:
+            results = await fetcher.fetch_many(urls)
+            failed = _titles(urls, expected, results)
+            if fetcher._pages.qsize() != concurrency:
+                print(f'FAIL pool has {fetcher._pages.qsize()} idle pages, expected {concurrency}')
+                failed += 1
+        pooled = time.perf_counter() - start
+        print(f'{len(urls)} pages, pooled browser x{concurrency}: {pooled:.2f}s')
+        failed += await _recycling(base, urls[0], expected[0], browser)
+        start = time.perf_counter()
+        legacy = await asyncio.to_thread(LaunchPerPageFetcher(**browser).fetch_many, urls)  # sync playwright must not run on this event loop
+        print(f'{len(urls)} pages, one browser per url: {time.perf_counter() - start:.2f}s')
+        failed += _titles(urls, expected, legacy)
+        same = [r[0] for r in results if not isinstance(r, BaseException)] == [r[0] for r in legacy if not isinstance(r, BaseException)]
+        print(f'pooled vs one browser per url: {"same" if same else "DIFFERENT"} HTML')
+        failed += not same
+    shutil.rmtree(folder)
+    print('all titles match' if not failed else f'{failed} pages failed')
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    sys.exit(asyncio.run(main(args[0] if args and args[0] != 'None' else None, int(args[1]) if len(args) > 1 else 4)))
@@ -0,0 +1,52 @@
+'''checks the plain HTTP fast path against a local server with static and JavaScript-only pages
+
+usage: python -m benchmarks.check_http_fetch
+Static fixtures (the saved pages in data/ and generated pages) must come back over plain
+HTTP with the exact served HTML; JavaScript-only shells and empty bodies must be handed to
+the browser (fetch_static returns None). Bodies are served gzip encoded.
+'''
+from src.fetcher import fetch_static, fetch_static_many
+from benchmarks.check_parsers import _pages, ROOT
+from benchmarks.local_server import serve, GzipHandler
+from benchmarks.synthetic import synthetic_page
+from pathlib import Path
+import sys, time, tempfile, shutil
+
+_JS_SHELL = ('<!DOCTYPE html><html><head><title>{title}</title><script src="/app.js"></script></head>'
+             '<body><noscript>You need to enable JavaScript to run this app.</noscript><div id="root"></div>'
+             '<script>document.getElementById("root").innerHTML = "<p>{text}</p>";</script></body></html>')
+
+def _fixtures(folder: Path) -> dict[str, tuple[str, bool]]:
+    '''file name -> (html, is_static)'''
+    out = {f'static_{p.name}.html': ((p / f'{p.name}_raw.html').read_text(encoding='utf-8'), True) for p in _pages(ROOT / 'data')}
+    for i in range(5): out[f'static_synthetic_{i}.html'] = (synthetic_page(10 + i * 20, seed=i), True)
+    for i in range(5): out[f'js_app_{i}.html'] = (_JS_SHELL.format(title=f'App {i}', text='rendered by javascript ' * 50), False)
+    out['empty.html'], out['blank.html'] = ('', False), (' \n\t\n', False)  # 200 with nothing to parse: the browser gets it
+    for name, (html, _) in out.items(): (folder / name).write_text(html, encoding='utf-8')
+    return out
+
+def main() -> int:
+    folder = Path(tempfile.mkdtemp())
+    failed = 0
+    try:
+        fixtures = _fixtures(folder)
+        with serve(folder, GzipHandler) as base:
+            names = list(fixtures)
+            start = time.perf_counter()
+            results = fetch_static_many([base + n for n in names])
+            seconds = time.perf_counter() - start
+            for name, res in zip(names, results):
+                html, static = fixtures[name]
+                ok = (res is not None and res.html == html) if static else res is None
+                failed += not ok
+                print(f'{"ok  " if ok else "FAIL"} {name}: {"plain HTTP" if res else "browser"}' + (f' (title {res.title!r})' if res else ''))
+            print(f'{len(names)} pages checked over plain HTTP in {seconds:.3f}s ({seconds / len(names) * 1000:.1f}ms per page)')
+            start = time.perf_counter()
+            for _ in range(3): fetch_static(base + names[0])
+            print(f'keep-alive refetch of {names[0]}: {(time.perf_counter() - start) / 3 * 1000:.1f}ms')
+    finally: shutil.rmtree(folder)
+    print('all pages routed correctly' if not failed else f'{failed} pages routed wrong')
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,110 @@
+'''checks the offline ingestion (src/ingest.py, main._run_ingest) on a generated folder of saved pages and WARC files
+
+usage: python -m benchmarks.check_ingest [workers]
+The folder has saved pages with and without the "saved from url=" comment (nested folders,
+a latin-1 page, files that are not pages). The WARC files hold the same pages as response
+records (plain, chunked, gzip and deflate encoded) between records that must be skipped
+(warcinfo, request, 404, 301, image, metadata), plain and gzipped (one member per record).
+Every page must come out with its URL, title and text, as a document of its own (pages with
+the same title get unique output names); all sources processed with 1 and with `workers`
+processes must write the same output.
+'''
+from benchmarks.synthetic import synthetic_page
+from src.ingest import iter_records
+from pathlib import Path
+import sys, re, gzip, zlib, tempfile, shutil, contextlib, io, warnings
+
+_FETCHED = re.compile(r'"fetched_at": "[^"]*"')
+
+def _pages(n: int) -> list[tuple[str, str]]:
+    return [(f'https://site.example.org/wiki/Page_{i}', synthetic_page(4, seed=i).replace('Synthetic page - Wikipedia', f'Page {i} &amp; more')) for i in range(n)]
+
+def _folder(folder: Path, pages: list[tuple[str, str]]) -> dict[str, str]:
+    '''writes the saved pages, returns expected url -> html'''
+    expected = {}
+    for i, (url, html) in enumerate(pages):
+        sub = folder / f'part{i % 2}'
+        sub.mkdir(parents=True, exist_ok=True)
+        if i % 3: html = f'<!-- saved from url=({len(url):04}){url} -->\n' + html
+        else: url = (sub / f'page{i}.html').resolve().as_uri()  # no comment: the file itself
+        (sub / f'page{i}.html').write_text(html, encoding='utf-8')
+        expected[url] = html
+    latin = pages[0][1].replace('charset="UTF-8"', 'charset="iso-8859-1"').replace('Page 0', 'Caf\xe9 0')
+    (folder / 'latin.htm').write_bytes(latin.encode('latin-1'))
+    expected[(folder / 'latin.htm').resolve().as_uri()] = latin
+    (folder / 'notes.txt').write_text('not a page', encoding='utf-8')
+    (folder / 'part0' / 'image.png').write_bytes(b'\x89PNG')
+    return expected
+
+def _warc_record(kind: str, url: str, block: bytes, ctype: str) -> bytes:
+    head = f'WARC/1.0\r\nWARC-Type: {kind}\r\nWARC-Target-URI: {url}\r\nWARC-Record-ID: <urn:uuid:{abs(hash((kind, url))):032x}>\r\nContent-Type: {ctype}\r\nContent-Length: {len(block)}\r\n\r\n'
+    return head.encode('utf-8') + block + b'\r\n\r\n'
+
+def _response(url: str, body: bytes, status: str = '200 OK', ctype: str = 'text/html; charset=utf-8', extra: str = '') -> bytes:
+    return _warc_record('response', url, f'HTTP/1.1 {status}\r\nContent-Type: {ctype}\r\n{extra}\r\n'.encode('latin-1') + body, 'application/http; msgtype=response')
+
+def _warc(path: Path, pages: list[tuple[str, str]], gz: bool) -> dict[str, str]:
+    '''writes the pages as WARC records (plus records that are no pages), returns expected url -> html'''
+    records = [_warc_record('warcinfo', '', b'software: check_ingest\r\n', 'application/warc-fields')]
+    for i, (url, html) in enumerate(pages):
+        body = html.encode('utf-8')
+        records.append(_warc_record('request', url, f'GET {url} HTTP/1.1\r\n\r\n'.encode(), 'application/http; msgtype=request'))
+        if i % 4 == 0: records.append(_response(url, body))
+        elif i % 4 == 1: records.append(_response(url, gzip.compress(body), extra='Content-Encoding: gzip\r\n'))
+        elif i % 4 == 2: records.append(_response(url, b''.join(b'%x\r\n%s\r\n' % (len(body[k:k + 5000]), body[k:k + 5000]) for k in range(0, len(body), 5000)) + b'0\r\n\r\n',
+                                                  extra='Transfer-Encoding: chunked\r\n'))
+        else: records.append(_response(url, zlib.compress(body), extra='Content-Encoding: deflate\r\n'))
+        records.append(_warc_record('metadata', url, b'outlinks: 3\r\n', 'application/warc-fields'))
+    records.append(_response('https://site.example.org/missing', b'<html>not found</html>', '404 Not Found'))
+    records.append(_response('https://site.example.org/old', b'', '301 Moved Permanently', extra='Location: /wiki/Page_0\r\n'))
+    records.append(_response('https://site.example.org/logo.png', b'\x89PNG', ctype='image/png'))
+    records.append(_warc_record('resource', 'https://site.example.org/resource', pages[0][1].encode('utf-8'), 'text/html'))
+    data = b''.join(gzip.compress(r) for r in records) if gz else b''.join(records)  # .warc.gz: one gzip member per record
+    path.write_bytes(data)
+    return {**dict(pages), 'https://site.example.org/resource': pages[0][1]}
+
+def _run(root: Path, source: Path, workers: int) -> Path:
+    '''main's ingest runner into a folder writer, returns the output folder'''
+    import main
+    from src.writers import get_writer
+    out = root / f'out_{source.name}_{workers}'
+    main.ROOT, main.INGEST, main.WORKERS = out, source, workers
+    with contextlib.redirect_stdout(io.StringIO()), get_writer('folder', out) as writer: main._run_ingest(writer, None)
+    return out
+
+def _same(a: Path, b: Path) -> bool:
+    '''same files with the same content (without fetched_at)'''
+    files = sorted(p.relative_to(a) for p in a.rglob('*') if p.is_file())
+    if files != sorted(p.relative_to(b) for p in b.rglob('*') if p.is_file()): return False
+    return all(_FETCHED.sub('', (a / f).read_text(encoding='utf-8')) == _FETCHED.sub('', (b / f).read_text(encoding='utf-8')) for f in files)
+
+def main(workers: int = 2) -> int:
+    warnings.simplefilter('ignore')  # bs4 parser warning (inherited by forked workers)
+    root = Path(tempfile.mkdtemp())
+    failed = 0
+    try:
+        pages = _pages(12)
+        sources = {root / 'saved': _folder(root / 'saved', pages), root / 'crawl.warc': _warc(root / 'crawl.warc', pages, False),
+                   root / 'crawl.warc.gz': _warc(root / 'crawl.warc.gz', pages, True)}
+        for source, expected in sources.items():
+            records = list(iter_records(source))
+            got = {rec.url: rec.html for rec in records}
+            titles = sorted({rec.title for rec in records})
+            ok = got == expected and len(records) == len(expected) and 'Page 1 & more' in titles
+            failed += not ok
+            print(f'{source.name}: {len(records)} records ({len(expected)} expected), titles {titles[:2]}..., {"OK" if ok else "WRONG"}')
+            outs = [_run(root, source, w) for w in (1, workers)]
+            docs = sorted(p.name for p in (outs[0] / 'data').iterdir() if not p.name.startswith('BS4 '))
+            same = _same(outs[0], outs[1])
+            failed += not same or len(docs) != len(records)
+            print(f'{source.name}: {len(docs)} documents written for {len(records)} records, workers 1 vs {workers}: {"same" if same else "DIFFERENT"} output')
+        text = (root / 'out_crawl.warc.gz_1' / 'data' / 'Page 1 & more' / 'Page 1 & more_output.txt').read_text(encoding='utf-8')
+        plain = (root / 'out_saved_1' / 'data' / 'Page 1 & more' / 'Page 1 & more_output.txt').read_text(encoding='utf-8')
+        failed += text != plain
+        print(f'saved page vs WARC record: {"same" if text == plain else "DIFFERENT"} text ({len(text)} chars)')
+    finally: shutil.rmtree(root)
+    print('ingest OK' if not failed else f'{failed} checks FAILED')
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 2))
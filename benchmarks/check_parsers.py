@@ -0,0 +1,81 @@
+'''runs every saved page in data/ through all parser backends and compares with the stored outputs
+
+usage: python -m benchmarks.check_parsers [data_dir]
+A backend is safe to switch to (src/parse_html.PARSER) only for pages where both the
+_output.txt text and the _chunks.jsonl lines are reproduced exactly.
+'''
+from src.parse_html import PARSERS, parse_html
+from src.extract_text import _render_with_state
+from src.extract_metadata import extract_metadata
+from src.chunking import chunking
+from pathlib import Path
+import sys, json, time
+
+ROOT = Path(__file__).resolve().parents[1]
+
+def check_page(folder: Path, parser: str) -> dict[str, any]:
+    '''renders one saved page with the given parser and compares it with the stored files'''
+    title = folder.name
+    raw = folder / f'{title}_raw.html'
+    if not raw.exists(): raw = folder / f'{title}_input.txt'
+    html = raw.read_text(encoding='utf-8')
+    start = time.perf_counter()
+    parsed = parse_html(html, parser=parser)
+    text = _render_with_state(parsed)
+    chunks = chunking(text, extract_metadata(parsed))
+    seconds = time.perf_counter() - start
+    out: dict[str, any] = {'page': title, 'parser': parser, 'parse_s': parsed.parse_time, 'total_s': seconds}
+    out_path = folder / f'{title}_output.txt'
+    if out_path.exists(): out['text'] = _first_diff(out_path.read_text(encoding='utf-8').splitlines(), text.splitlines())
+    chunk_path = folder / f'{title}_chunks.jsonl'
+    if chunk_path.exists():
+        expected = [json.loads(ln) for ln in chunk_path.read_text(encoding='utf-8').splitlines() if ln.strip()]
+        out['chunks'] = _first_diff([_comparable(c) for c in expected], [_comparable(c) for c in chunks])
+    return out
+
+def _comparable(chunk: dict[str, any]) -> str:
+    '''chunk as json without the fields that change on every run'''
+    md = {k: v for k, v in chunk.get('metadata', {}).items() if k != 'fetched_at'}
+    return json.dumps({**chunk, 'metadata': md}, ensure_ascii=False, sort_keys=True)
+
+def _first_diff(expected: list[str], actual: list[str]) -> str:
+    '''"same" or a short description of the first differing line'''
+    for i, (e, a) in enumerate(zip(expected, actual)):
+        if e != a: return f'line {i + 1}: expected {e[:80]!r} got {a[:80]!r}'
+    if len(expected) != len(actual): return f'{len(expected)} lines expected, got {len(actual)}'
+    return 'same'
+
+def _pages(data_dir: Path) -> list[Path]:
+    '''all data/ folders that contain a saved input page'''
+    return sorted(d for d in data_dir.iterdir() if d.is_dir() and ((d / f'{d.name}_raw.html').exists() or (d / f'{d.name}_input.txt').exists()))
+
+DEGENERATE = ('', '   \n', '<!-- c -->', '<!-- saved from url=(0019)https://example.org -->', '\x00', '<!DOCTYPE html>')  # inputs without any element
+
+def check_degenerate(parser: str) -> list[str]:
+    '''inputs from DEGENERATE where the backend does not build the same empty page (+ root comments) as html5lib'''
+    from lxml import etree as ET
+    shape = lambda root: (ET.tostring(root), [c.text for c in root.xpath('/comment()')])
+    return [html for html in DEGENERATE if shape(parse_html(html, parser=parser).root) != shape(parse_html(html, parser='html5lib').root)]
+
+def main(data_dir: Path) -> int:
+    failed = 0
+    for parser in PARSERS:
+        try: bad = check_degenerate(parser)
+        except ImportError: continue  # reported below
+        except Exception as e: bad = [f'{type(e).__name__}: {e}']
+        failed += bool(bad)
+        print(f'{parser:<13} empty/comment-only input: {"MATCH" if not bad else f"DIFF {bad!r}"}')
+    for folder in _pages(data_dir):
+        for parser in PARSERS:
+            try: res = check_page(folder, parser)
+            except ImportError as e:  # backend not installed here
+                print(f'{parser:<13} {folder.name}: skipped ({e})')
+                continue
+            ok = res.get('text', 'same') == 'same' and res.get('chunks', 'same') == 'same'
+            failed += not ok
+            print(f'{parser:<13} {folder.name}: {"MATCH" if ok else "DIFF"}  parse {res["parse_s"]:.3f}s  total {res["total_s"]:.3f}s')
+            if not ok: print(f'    text:   {res.get("text")}\n    chunks: {res.get("chunks")}')
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main(Path(sys.argv[1]) if len(sys.argv) > 1 else ROOT / 'data'))
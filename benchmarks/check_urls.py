@@ -0,0 +1,49 @@
+'''checks the link extraction: resolution against <base>, the page URL or the canonical URL, normalization, de-duplication and type filtering
+
+usage: python -m benchmarks.check_urls
+Builds a page with relative, root-relative, protocol-relative, fragment, tracking-parameter,
+trailing-slash, file and non-http links and compares extract_urls() with the expected
+(url, count) list, and normalize_url() with the expected keys (IPv6 hosts, query pairs that
+must not be re-encoded). Also prints how many candidates the saved pages in data/ yield.
+'''
+from src.parse_html import parse_html
+from src.extract_metadata import extract_metadata
+from src.extract_urls import extract_urls, normalize_url
+from benchmarks.check_parsers import _pages, ROOT
+import sys, warnings
+
+_PAGE = '''<html><head><title>t</title><link rel="canonical" href="https://Example.com/docs/page"></head><body>
+<a href="other">a</a> <a href="./other#part">b</a> <a href="/docs/other?utm_source=x&amp;gclid=1">c</a> <a href="//example.com:443/docs/other/">d</a>
+<a href="https://example.com/list?b=2&amp;a=1">e</a> <a href="https://example.com/list?a=1&amp;b=2">f</a> <a href="#top">g</a> <a href="page#x">self</a>
+<a href="img/logo.PNG">h</a> <a href="report.pdf?v=2">i</a> <a href="feed" type="application/rss+xml">j</a> <a href="next" type="text/html">k</a>
+<a href="mailto:a@example.com">l</a> <a href="javascript:void(0)">m</a> <a href=" https://other.org/x ">n</a><link href="style.css">
+</body></html>'''
+_WANT = [('https://example.com/docs/other', 4), ('https://example.com/list?a=1&b=2', 2), ('https://example.com/docs/next', 1), ('https://other.org/x', 1)]
+_NORMALIZED = {'HTTP://[2001:DB8::1]:80/a/': 'http://[2001:db8::1]/a', 'https://[::1]:8443/x?b=1&a=2': 'https://[::1]:8443/x?a=2&b=1',
+               'https://example.com/page?print': 'https://example.com/page?print', 'https://example.com/s?q=a%20b&x=1+2': 'https://example.com/s?q=a%20b&x=1+2',
+               'https://example.com/s?b=&a=1&&utm_medium=x': 'https://example.com/s?a=1&b=', 'https://user:pw@Example.com:443/': 'https://user:pw@example.com/'}
+_BASE_PAGE = '<html><head><base href="/root/"><link rel="canonical" href="https://example.com/a/b"></head><body><a href="c">c</a></body></html>'
+
+def main() -> int:
+    warnings.simplefilter('ignore')  # bs4/html5lib parser warnings
+    failed = 0
+    for page, page_url, want in ((_PAGE, None, _WANT), (_BASE_PAGE, None, [('https://example.com/root/c', 1)]),
+                                 (_PAGE.replace('<link rel="canonical" href="https://Example.com/docs/page">', ''), 'https://example.com/docs/page', _WANT)):
+        parsed = parse_html(page)
+        got = extract_urls(extract_metadata(parsed)['metadata'], parsed, page_url)
+        if got != want:
+            failed += 1
+            print(f'expected {want}\n     got {got}')
+    for url, want in _NORMALIZED.items():
+        if (got := normalize_url(url)) != want:
+            failed += 1
+            print(f'normalize_url({url!r}) = {got!r}, expected {want!r}')
+    for folder in _pages(ROOT / 'data'):
+        parsed = parse_html((folder / f'{folder.name}_raw.html').read_text(encoding='utf-8'), parser='lxml')
+        urls = extract_urls(extract_metadata(parsed)['metadata'], parsed)
+        print(f'{folder.name}: {len(parsed.anchors())} links => {len(urls)} unique document URLs')
+    print('links OK' if not failed else f'{failed} pages FAILED')
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
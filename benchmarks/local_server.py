@@ -0,0 +1,59 @@
+'''local HTTP server for the fetch checks (serves a directory, e.g. data/)'''
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from contextlib import contextmanager
+from functools import partial
+from pathlib import Path
+import threading
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args): pass  # keep the check output readable
+
+@contextmanager
+def serve(directory: Path, handler=_QuietHandler):
+    '''serves directory on a free localhost port, yields the base URL'''
+    server = ThreadingHTTPServer(('127.0.0.1', 0), partial(handler, directory=str(directory)))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try: yield f'http://127.0.0.1:{server.server_address[1]}/'
+    finally:
+        server.shutdown()
+        server.server_close()
+
+class GzipHandler(_QuietHandler):  # like a real web server: gzip encoded bodies when the client accepts them, ETag + 304
+    requests = 0  # GETs served (all handler instances)
+    not_modified = 0  # of these answered with 304
+
+    def do_GET(self):
+        import gzip, hashlib
+        GzipHandler.requests += 1
+        path = self.translate_path(self.path)
+        try:
+            with open(path, 'rb') as f: data = f.read()
+        except OSError: return self.send_error(404)
+        etag = '"' + hashlib.md5(data).hexdigest() + '"'
+        if self.headers.get('If-None-Match') == etag:
+            GzipHandler.not_modified += 1
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        use_gzip = 'gzip' in self.headers.get('Accept-Encoding', '')
+        body = gzip.compress(data) if use_gzip else data
+        self.send_response(200)
+        self.send_header('Content-Type', self.guess_type(path))
+        self.send_header('ETag', etag)
+        if use_gzip: self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+class SlowHandler(_QuietHandler):  # /slow/<path>: the file of <path> after `delay` seconds (load timeouts)
+    delay = 10.0
+
+    def do_GET(self):
+        if self.path.startswith('/slow/'):
+            import time
+            time.sleep(SlowHandler.delay)
+            self.path = self.path[5:]
+        try: super().do_GET()
+        except (BrokenPipeError, ConnectionResetError): pass  # the client gave up (timeout)
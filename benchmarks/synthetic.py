@@ -0,0 +1,45 @@
+'''generated test pages (Wikipedia-like structure, deterministic) for the benchmarks'''
+import random
+
+_WORDS = ('model', 'company', 'language', 'data', 'release', 'open', 'weights', 'training', 'parameters', 'license',
+          'benchmark', 'research', 'Paris', 'funding', 'round', 'investors', 'partnership', 'cloud', 'inference', 'context')
+
+def _sentence(rnd: random.Random) -> str:
+    words = [rnd.choice(_WORDS) for _ in range(rnd.randint(6, 18))]
+    return words[0].capitalize() + ' ' + ' '.join(words[1:]) + rnd.choice(('.', '.', '.', '!', '?'))
+
+def _paragraph(rnd: random.Random) -> str:
+    return ' '.join(_sentence(rnd) for _ in range(rnd.randint(2, 6)))
+
+def _section(rnd: random.Random, i: int, lvl: int) -> str:
+    parts = [f'<div class="mw-heading mw-heading{lvl}"><h{lvl} id="s{i}">Section {i}</h{lvl}>'
+             f'<span class="mw-editsection">[edit]</span></div>']
+    for _ in range(rnd.randint(1, 4)): parts.append(f'<p>{_paragraph(rnd)}<sup class="reference">[{i}]</sup></p>')
+    if rnd.random() < 0.3: parts.append('<ul>' + ''.join(f'<li>{_sentence(rnd)}</li>' for _ in range(rnd.randint(2, 6))) + '</ul>')
+    if rnd.random() < 0.1:
+        rows = ''.join(f'<tr><td>{rnd.choice(_WORDS)}</td><td>{rnd.randint(1, 999)}</td></tr>' for _ in range(rnd.randint(2, 8)))
+        parts.append(f'<table><thead><tr><th>Name</th><th>Value</th></tr></thead><tbody>{rows}</tbody></table>')
+    if rnd.random() < 0.2: parts.append(f'<div class="navbox"><a href="/wiki/x{i}">{_sentence(rnd)}</a></div>')
+    return ''.join(parts)
+
+def synthetic_page(n_sections: int, seed: int = 0) -> str:
+    '''page with n_sections h2/h3 sections, boilerplate that the filters remove and a few tables'''
+    rnd = random.Random(seed)
+    body = [f'<p>{_paragraph(rnd)}</p>']  # intro
+    for i in range(n_sections): body.append(_section(rnd, i, 2 if i % 4 == 0 else 3))
+    return ('<!DOCTYPE html><html lang="en"><head><meta charset="UTF-8"><title>Synthetic page - Wikipedia</title>'
+            '<link rel="canonical" href="https://en.wikipedia.org/wiki/Synthetic"><meta property="og:site_name" content="Wikipedia">'
+            '<style>.a{}</style><script>var x = 1;</script></head><body>'
+            '<nav id="nav"><a href="/">Main page</a></nav><div id="cookie-banner">We use cookies.</div>'
+            f'<main id="content"><h1>Synthetic page</h1>{"".join(body)}</main>'
+            '<footer>Footer text</footer></body></html>')
+
+def synthetic_page_of_size(size: int, seed: int = 0) -> str:
+    '''page of roughly size bytes (utf-8)'''
+    n = max(1, size // 700)  # ~700 bytes per generated section
+    html = synthetic_page(n, seed)
+    for _ in range(3):  # correct the estimate (section size depends on the random content)
+        if size * 0.9 <= len(html.encode('utf-8')) <= size * 1.1: break
+        n = int(n * size / len(html.encode('utf-8'))) + 1
+        html = synthetic_page(n, seed)
+    return html
@@ -1,62 +1,182 @@
-from src.extract_text import process_multiple_docs, download_html, Doc
+import sys
+if __name__ == '__main__' and len(sys.argv) > 1:  # subcommands and options (src/cli.py): dispatched before the pipeline imports below, `run` imports this module again
+    from src.cli import main as cli
+    sys.exit(cli(sys.argv[1:]))
+
+from src.extract_text import process_multiple_docs, download_html, download_many, Doc, _observe_blocks
 from src.extract_text_via_bs4 import extract_text_via_bs4
 from src.extract_metadata import extract_metadata
 from src.extract_urls import extract_urls
+from src.parse_html import parse_html
 from src.chunking import chunking
+from src.pipeline import PageResult, process_page, stream_page
+from src.fetcher import FETCH_CONCURRENCY
+from src.manifest import Manifest
+from src.dedup import NearDuplicates
+from src.boilerplate import BoilerplateProfiles
+from src.writers import OutputWriter, get_writer
+from src.crawler import Crawler
+from src.ingest import iter_records
+from src.stats import StatsLog, format_summary
+from src import stats
+from collections import deque
+from contextlib import nullcontext
 from pathlib import Path
-import json
+from typing import Iterable
 
 ROOT = Path(__file__).resolve().parents[0]
 SILENT = True
+URL_FILE = 'config/getURLs.txt'  # one URL per line (relative to ROOT or absolute)
+PARSE_STATS = False  # also measure peak memory of the shared parse (tracemalloc, slows parsing down)
+WORKERS = 1  # SILENT only: >1 parses/renders/chunks in a process pool while the next pages are fetched
+INGEST = None  # None | folder of saved pages or .warc/.warc.gz file (relative to ROOT or absolute): processed offline instead of getURLs.txt, headless (SILENT not needed)
+CRAWL = False  # headless crawl: getURLs.txt are the seeds, links are followed (limits and patterns in src/crawler.py)
+INCREMENTAL = False  # skip documents whose HTML, section state, filter/chunk config and OUTPUT/DEDUP/PROFILES did not change and whose outputs still exist (data/manifest.json)
+STATS = False  # per-stage wall/CPU time + counters: data/stats.jsonl (one line per document + summary)
+DEDUP = None  # None | 'tag' (metadata cluster_id) | 'drop': near-duplicate chunks across the run, MinHash + LSH (needs numpy, see src/dedup.py)
+PROFILES = None  # None | 'learn' (observe all pages, write per-domain boilerplate to data/boilerplate.json) | 'apply' (skip it on later runs), SILENT only
+STREAM_MIN_CHARS = 8_000_000  # SILENT only: pages this large are streamed in the main process (no tree, text/chunks written as produced, no BS4 output), None = never
+OUTPUT = 'folder'  # folder | gzip | zstd (data/<title>/ files), jsonl | jsonl.gz | jsonl.zst (one combined file per run) or parquet | arrow (chunk tables), see src/writers.py
+
+def run_pipeline():  # main pipeline runner (loops over getURLs.txt or the INGEST records)
+    manifest = Manifest(ROOT, {'OUTPUT': OUTPUT, 'DEDUP': DEDUP, 'PROFILES': PROFILES if SILENT else None}) if INCREMENTAL else None
+    stats.ENABLED = STATS
+    log = StatsLog(ROOT / 'data' / 'stats.jsonl') if STATS else None
+    dedup = NearDuplicates(DEDUP) if DEDUP else None
+    profiles = BoilerplateProfiles(ROOT, PROFILES) if PROFILES and SILENT else None
+    with get_writer(OUTPUT, ROOT) as writer:
+        if manifest: writer.reserve({d['title']: d['url'] for d in manifest.docs.values()})
+        if INGEST: _run_ingest(writer, manifest, log, dedup, profiles)
+        elif CRAWL: _run_crawl(writer, manifest, log, dedup, profiles)
+        elif SILENT and WORKERS > 1: _run_parallel(writer, manifest, log, dedup, profiles)
+        else: _run_sequential(writer, manifest, log, dedup, profiles)
+    if manifest:
+        manifest.save()  # data/manifest.json + data/changes.json (chunk ids to re-embed/delete)
+        print(manifest.summary())
+    if dedup: print(dedup.summary())
+    if profiles:
+        if profiles.learning:
+            profiles.learn()
+            profiles.save()
+        print(profiles.summary())
+    if log: print(format_summary(log.close()))
 
-def run_pipeline():  # main pipeline runner (loops over getURLs.txt)
+def _run_sequential(writer: OutputWriter, manifest: Manifest | None, log: StatsLog | None = None, dedup: NearDuplicates | None = None, profiles: BoilerplateProfiles | None = None):
     for url in _get_urls_to_process():  # process each line in getURLs.txt
         if not url: continue  # skip empty lines
-        html, title = download_html(url, ROOT)  # download base page (no disk writes; Abort safe)
-        chunk_template = extract_metadata(html)  # extract base metadata (canonical/url/domain/etc)
-        metadata = chunk_template.get('metadata')
-        extracted_urls = extract_urls(metadata, html)  # extract candidate URLs as list[(url,count)]
-        docs: list[Doc] = process_multiple_docs(url, html, title, extracted_urls, chunk_template, ROOT, SILENT)  # open GUI for THIS base URL and return chosen docs
-        for doc in docs:  # write only after OK (Abort returns empty list)
-            Path(f'{ROOT}/data/{doc.title}').mkdir(parents=True, exist_ok=True)  # create per-doc folder
-            _write_raw(doc.title, doc.html)
-            _write_input(doc.title, doc.html)  # write raw html input
-            _write_output(doc.title, doc.text)  # write rendered plaintext output
-            chunks = chunking(doc.text, doc.metadata)  # chunk the text for RAG (uses markers)
-            _write_chunks(doc.title, chunks)  # write jsonl chunks
-        text = extract_text_via_bs4(html)
-        Path(f'{ROOT}/data/BS4 {title}').mkdir(parents=True, exist_ok=True)  # create per-doc folder
-        _write_output(f'BS4 {title}', text)
+        stats.begin(url)
+        try: _process_url(url, writer, manifest, dedup, profiles)
+        finally:
+            if log: log.write(stats.end())
+
+def _process_url(url: str, writer: OutputWriter, manifest: Manifest | None, dedup: NearDuplicates | None = None, profiles: BoilerplateProfiles | None = None):  # one base URL: download, parse, GUI/render, chunk, write
+    html, title = download_html(url, ROOT)  # download base page (no disk writes; Abort safe)
+    if SILENT and _unchanged(manifest, profiles, url, html):  # headless => the base page is the only document
+        print(f'Unchanged: "{title}" skipped')
+        return
+    if SILENT and _streamed(html): return _process_streamed(url, html, title, writer, manifest, dedup, profiles)
+    stats.count('html_chars', len(html))  # input size, once per page (not per parse)
+    parsed = parse_html(html, measure=PARSE_STATS)  # parse once, shared by metadata, urls and rendering
+    _print_parse_stats(title, parsed)
+    profile = profiles.get(url) if profiles else None  # profiles only exist with SILENT
+    if profiles and profiles.learning: profiles.observe(url, _observe_blocks(parsed.root))
+    chunk_template = extract_metadata(parsed)  # extract base metadata (canonical/url/domain/etc)
+    metadata = chunk_template.get('metadata')
+    extracted_urls = extract_urls(metadata, parsed, url)  # extract candidate URLs as list[(url,count)] (absolute, normalized)
+    docs: list[Doc] = process_multiple_docs(url, parsed, title, extracted_urls, chunk_template, ROOT, SILENT, profile)  # open GUI for THIS base URL and return chosen docs
+    for doc in docs:  # write only after OK (Abort returns empty list)
+        if manifest and manifest.unchanged(doc.url, doc.html, doc.state, profile and profile.digest):
+            print(f'Unchanged: "{doc.title}" skipped')
+            continue
+        chunks = chunking(doc.text, doc.metadata)  # chunk the text for RAG (uses markers)
+        if dedup: chunks = dedup.filter(chunks)  # near-duplicates of earlier chunks: tagged or dropped
+        doc.title = writer.output_name(doc.title, doc.url)  # pages with the same title must not overwrite each other
+        writer.write_doc(doc.title, doc.html, doc.text, chunks)  # raw html (+ input link), plaintext output, jsonl chunks
+        if manifest: manifest.record(doc.url, doc.title, doc.html, doc.state, chunks, doc.metadata['metadata']['doc_id'], profile and profile.digest, writer.outputs(doc.title))
+    writer.write_text(f'BS4 {writer.output_name(title, url)}', extract_text_via_bs4(html))
+
+def _run_parallel(writer: OutputWriter, manifest: Manifest | None, log: StatsLog | None = None, dedup: NearDuplicates | None = None, profiles: BoilerplateProfiles | None = None):  # headless runner: fetch in this process, CPU stages in WORKERS processes, write in input order
+    urls = [url for url in _get_urls_to_process() if url]  # skip empty lines
+    def pages():
+        for i in range(0, len(urls), FETCH_CONCURRENCY):
+            batch = urls[i : i + FETCH_CONCURRENCY]
+            for url, (html, title) in zip(batch, download_many(batch, ROOT)): yield url, html, title  # concurrent fetches overlap with the workers
+    _process_pages(pages(), writer, manifest, log, dedup, profiles)
+
+def _run_ingest(writer: OutputWriter, manifest: Manifest | None, log: StatsLog | None = None, dedup: NearDuplicates | None = None, profiles: BoilerplateProfiles | None = None):  # offline runner: saved pages / WARC records of INGEST instead of getURLs.txt
+    records = iter_records(ROOT / INGEST)  # read lazily while the workers process the pages before
+    _process_pages(((rec.url, rec.html, rec.title) for rec in records), writer, manifest, log, dedup, profiles)
+
+def _process_pages(pages: Iterable[tuple[str, str, str]], writer: OutputWriter, manifest: Manifest | None, log: StatsLog | None = None, dedup: NearDuplicates | None = None,
+                   profiles: BoilerplateProfiles | None = None):  # (url, html, title) pages: CPU stages in WORKERS processes (in this one if WORKERS = 1), written in input order
+    from concurrent.futures import ProcessPoolExecutor
+    pending = deque()  # futures in input order
+    with ProcessPoolExecutor(max_workers=WORKERS) if WORKERS > 1 else nullcontext() as pool:
+        for url, html, title in pages:
+            if _unchanged(manifest, profiles, url, html):
+                print(f'Unchanged: "{title}" skipped')
+                continue
+            if _streamed(html):  # too large for a tree in a worker: written here, after the pages before it
+                while pending: _write_result(pending.popleft().result(), writer, manifest, log, dedup, profiles)
+                stats.begin(url)
+                _process_streamed(url, html, title, writer, manifest, dedup, profiles)
+                if log: log.write(stats.end())
+                continue
+            args = (url, html, title, PARSE_STATS, STATS, False, *_profile_args(profiles, url))
+            if pool is None:
+                _write_result(process_page(*args), writer, manifest, log, dedup, profiles)
+                continue
+            pending.append(pool.submit(process_page, *args))
+            while pending and (pending[0].done() or len(pending) >= 2 * WORKERS): _write_result(pending.popleft().result(), writer, manifest, log, dedup, profiles)  # bounded in-flight pages
+        while pending: _write_result(pending.popleft().result(), writer, manifest, log, dedup, profiles)
+
+def _run_crawl(writer: OutputWriter, manifest: Manifest | None, log: StatsLog | None = None, dedup: NearDuplicates | None = None, profiles: BoilerplateProfiles | None = None):  # crawl from the seeds, pages are written as they finish
+    crawler = Crawler([url for url in _get_urls_to_process() if url], ROOT, workers=WORKERS)  # resumes data/crawl_state.json of the same seeds
+    crawler.run(lambda res: _write_result(res, writer, manifest, log, dedup, profiles), lambda url, html: _unchanged(manifest, profiles, url, html), PARSE_STATS,
+                lambda url: _profile_args(profiles, url))
+
+def _write_result(res: PageResult, writer: OutputWriter, manifest: Manifest | None = None, log: StatsLog | None = None, dedup: NearDuplicates | None = None,
+                  profiles: BoilerplateProfiles | None = None):  # write one headless page exactly like the sequential loop
+    _print_parse_stats(res.title, res)
+    if profiles: profiles.observe(res.url, res.blocks)  # blocks only exist while learning
+    profile = profiles.get(res.url) if profiles else None
+    stats.begin(res.url)
+    for doc, chunks in zip(res.docs, res.chunks):
+        if dedup: chunks = dedup.filter(chunks)  # in the main process: the index spans all pages
+        doc.title = writer.output_name(doc.title, doc.url)
+        writer.write_doc(doc.title, doc.html, doc.text, chunks)
+        if manifest: manifest.record(doc.url, doc.title, doc.html, doc.state, chunks, doc.metadata['metadata']['doc_id'], profile and profile.digest, writer.outputs(doc.title))
+    writer.write_text(f'BS4 {writer.output_name(res.title, res.url)}', res.bs4_text)
+    rec = stats.end()
+    if log: log.write(stats.merge(rec, res.stats))  # worker stages + write
             
+def _streamed(html: str) -> bool: return STREAM_MIN_CHARS is not None and len(html) >= STREAM_MIN_CHARS
+
+def _process_streamed(url: str, html: str, title: str, writer: OutputWriter, manifest: Manifest | None, dedup: NearDuplicates | None = None, profiles: BoilerplateProfiles | None = None):  # one very large headless page (while learning profiles it is not observed)
+    profile = profiles.get(url) if profiles else None
+    title = writer.output_name(title, url)
+    chunk_template, chunks = stream_page(url, html, title, writer, profile, dedup, hashes=manifest is not None)
+    if manifest: manifest.record(url, title, html, None, chunks, chunk_template['metadata']['doc_id'], profile and profile.digest, writer.outputs(title))
+
+def _unchanged(manifest: Manifest | None, profiles: BoilerplateProfiles | None, url: str, html: str) -> bool:  # incremental skip (learning needs every page)
+    if not manifest or (profiles and profiles.learning): return False
+    profile = profiles.get(url) if profiles else None
+    return manifest.unchanged(url, html, profile=profile and profile.digest)
+
+def _profile_args(profiles: BoilerplateProfiles | None, url: str) -> tuple:  # (profile, observe) arguments of process_page
+    if not profiles: return None, False
+    return profiles.get(url), profiles.learning
+
 def _get_urls_to_process() -> list[str]:
-        url_path = f'{ROOT}/config/getURLs.txt'
+        url_path = Path(ROOT) / URL_FILE
         urls: list[str] = []
         with open(url_path, 'r', encoding='utf-8') as f:
             for ln in f.read().split('\n'): urls.append(ln.strip())
         return urls
 
-def _write_raw(title: str, html: str):
-    raw_path = f'{ROOT}/data/{title}/{title}_raw.html'
-    with open(raw_path, 'w', encoding='utf-8') as f:
-        f.write(html)
-        print(f'RAW: "{title}" has been written')
-
-def _write_input(title: str, html: str):
-    input_path = f'{ROOT}/data/{title}/{title}_input.txt'
-    with open(input_path, 'w', encoding='utf-8') as f:
-        f.write(html)
-        print(f'Input: "{title}" has been written')
-
-def _write_output(title, text: str):
-    output_path = f'{ROOT}/data/{title}/{title}_output.txt'
-    with open(output_path, 'w', encoding='utf-8') as f:
-        f.write(text)
-        print(f'Output: "{title}" has been written')
-    
-def _write_chunks(title: str, text: list[dict[str, any]]):
-    chunk_path = f'{ROOT}/data/{title}/{title}_chunks.jsonl'
-    with open(chunk_path, 'w', encoding='utf-8') as f:
-        for txt in text: f.write(json.dumps(txt, ensure_ascii=False) + '\n')
-        print(f'Chunks: "{title}" has been written')
-        
-run_pipeline()
\ No newline at end of file
+def _print_parse_stats(title: str, parsed) -> None:  # parsed: ParsedHTML or PageResult
+    mem = f', peak {parsed.peak_mem / 1e6:.1f} MB' if parsed.peak_mem >= 0 else ''
+    print(f'Parse: "{title}" took {parsed.parse_time:.3f}s{mem}')
+
+if __name__ == '__main__':  # guard: pool workers must not start the pipeline again
+    run_pipeline()
\ No newline at end of file
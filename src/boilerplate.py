@@ -0,0 +1,135 @@
+'''per-domain boilerplate profiles: element paths and text blocks that repeat on most pages of a site are learned and skipped on later pages
+
+usage: python -m src.boilerplate list
+       python -m src.boilerplate show <domain>
+       python -m src.boilerplate remove <domain>...
+'''
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from urllib.parse import urlsplit
+import hashlib, json, os, sys
+
+PROFILE_FILE = 'data/boilerplate.json'  # relative to the project root
+MIN_PAGES = 5  # pages of a domain needed before a profile is learned
+MIN_SHARE = 0.8  # share of the pages a path/text must appear on (with the same text) to count as boilerplate
+
+def text_key(text: str) -> str:
+    '''short hash of a text block (profiles store hashes, not texts)'''
+    return hashlib.blake2b(' '.join(text.split()).encode('utf-8'), digest_size=8).hexdigest()
+
+def domain_of(url: str) -> str | None: return (urlsplit(url).hostname or '').lower() or None
+
+@dataclass(frozen=True)
+class Profile:  # skip profile of one domain (small + picklable, sent to the pool workers with each page)
+    paths: frozenset[str]  # element paths ('html/body/div#id.cls/...') whose subtrees are not visited
+    texts: frozenset[str]  # text_key() of blocks that are dropped wherever they appear
+    prefixes: frozenset[str] = field(init=False, repr=False)  # proper prefixes of paths: only below them paths are built at all
+    digest: str = field(init=False, repr=False)  # changes when the profile changes (manifest)
+
+    def __post_init__(self):
+        prefixes = {p[:i] for p in self.paths for i, ch in enumerate(p) if ch == '/'}
+        object.__setattr__(self, 'prefixes', frozenset(prefixes))
+        object.__setattr__(self, 'digest', hashlib.sha256(json.dumps([sorted(self.paths), sorted(self.texts)]).encode('utf-8')).hexdigest()[:16])
+
+    def skip_text(self, text: str) -> bool: return bool(self.texts) and text_key(text) in self.texts
+
+class _Observed:  # what one domain looked like on the pages seen while learning
+    def __init__(self):
+        self.pages = 0
+        self.path_pages: Counter[str] = Counter()  # path -> pages it has a block on
+        self.path_texts: dict[str, Counter[str]] = {}  # path -> text of its blocks per page -> pages
+        self.text_pages: Counter[str] = Counter()  # text_key -> pages
+        self.fixed: set[str] = set()  # paths that must stay (headings, tail text of a parent)
+
+    def add(self, blocks: list[tuple[str, str, bool]]) -> None:
+        self.pages += 1
+        texts: dict[str, list[str]] = {}
+        for path, key, eligible in blocks:
+            texts.setdefault(path, []).append(key)
+            if not eligible: self.fixed.add(path)
+        for path, keys in texts.items():
+            self.path_pages[path] += 1
+            self.path_texts.setdefault(path, Counter())['|'.join(keys)] += 1
+        self.text_pages.update({key for _, key, eligible in blocks if eligible})  # heading texts (References, See also) stay
+
+    def profile(self, min_share: float) -> dict[str, list[str]]:
+        '''paths that appear on most pages with the same text, lifted to the highest ancestor that holds nothing else'''
+        need = min_share * self.pages
+        boiler = {p for p, n in self.path_pages.items() if n >= need and p not in self.fixed and self.path_texts[p].most_common(1)[0][1] >= min_share * n}
+        content = {a for p in self.path_pages if p not in boiler for a in _ancestors(p)}  # observed paths with content and their ancestors
+        lifted = {next((a for a in _ancestors(p)[1:] if a not in content), None) for p in boiler} - {None}  # shortest ancestor without content (never the root element)
+        paths = sorted(p for p in lifted if not any(a in lifted for a in _ancestors(p)[:-1]))  # drop paths below another skipped path
+        texts = sorted(k for k, n in self.text_pages.items() if n >= need)
+        return {'pages': self.pages, 'paths': paths, 'texts': texts}
+
+def _ancestors(path: str) -> list[str]:
+    '''the path and all its ancestor paths, shortest first'''
+    parts = path.split('/')
+    return ['/'.join(parts[:i]) for i in range(1, len(parts) + 1)]
+
+class BoilerplateProfiles:  # data/boilerplate.json: domain -> {pages, paths, texts}; mode 'apply' uses the profiles, 'learn' rebuilds them
+    def __init__(self, ROOT: str | Path, mode: str = 'apply'):
+        if mode not in ('apply', 'learn'): raise ValueError(f'unknown profile mode "{mode}", choose apply or learn')
+        self.mode = mode
+        self._path = Path(ROOT) / PROFILE_FILE
+        self.domains: dict[str, dict[str, any]] = json.loads(self._path.read_text(encoding='utf-8')) if self._path.exists() else {}
+        self._profiles: dict[str, Profile | None] = {}
+        self._observed: dict[str, _Observed] = {}
+        self._learned: list[str] = []
+
+    @property
+    def learning(self) -> bool: return self.mode == 'learn'
+
+    def get(self, url: str) -> Profile | None:
+        '''profile of the URL's domain (None while learning or if the domain has none)'''
+        if self.learning: return None
+        domain = domain_of(url)
+        if domain not in self._profiles:
+            entry = self.domains.get(domain)
+            self._profiles[domain] = Profile(frozenset(entry['paths']), frozenset(entry['texts'])) if entry and (entry['paths'] or entry['texts']) else None
+        return self._profiles[domain]
+
+    def observe(self, url: str, blocks: list[tuple[str, str, bool]] | None) -> None:
+        '''adds the blocks of one page (from extract_text._observe_blocks)'''
+        if blocks is None or not (domain := domain_of(url)): return
+        self._observed.setdefault(domain, _Observed()).add(blocks)
+
+    def learn(self, min_pages: int = MIN_PAGES, min_share: float = MIN_SHARE) -> list[str]:
+        '''builds the profiles of all observed domains with enough pages, returns the learned domains'''
+        self._learned = [d for d, obs in self._observed.items() if obs.pages >= min_pages]
+        for domain in self._learned: self.domains[domain] = self._observed[domain].profile(min_share)
+        self._profiles.clear()
+        return self._learned
+
+    def save(self) -> None:
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self._path.with_name(self._path.name + '.tmp')
+        tmp.write_text(json.dumps(self.domains, ensure_ascii=False, indent=1), encoding='utf-8')
+        os.replace(tmp, self._path)
+
+    def summary(self) -> str:
+        if not self.learning: return f'boilerplate profiles: {sum(p is not None for p in self._profiles.values())} domains applied'
+        rest = [f'{d} ({o.pages} pages)' for d, o in self._observed.items() if d not in self._learned]
+        lines = [f"boilerplate profile {d}: {len(self.domains[d]['paths'])} paths, {len(self.domains[d]['texts'])} texts from {self.domains[d]['pages']} pages" for d in self._learned]
+        if rest: lines.append(f'not enough pages (< {MIN_PAGES}): ' + ', '.join(rest))
+        return '\n'.join(lines) or 'boilerplate profiles: no pages observed'
+
+def main(args: list[str]) -> int:
+    profiles = BoilerplateProfiles(Path(__file__).resolve().parents[1])
+    cmd, rest = (args[0], args[1:]) if args else ('list', [])
+    if cmd == 'list':
+        for d, e in sorted(profiles.domains.items()): print(f"{d:<40} {e['pages']:6} pages {len(e['paths']):5} paths {len(e['texts']):5} texts")
+    elif cmd == 'show' and rest:
+        entry = profiles.domains.get(rest[0])
+        print('\n'.join(entry['paths']) if entry else f'no profile for {rest[0]}')
+    elif cmd == 'remove':
+        for d in rest: print(f'{d}: ' + ('removed' if profiles.domains.pop(d, None) else 'no profile'))
+        profiles.save()
+    else:
+        print(__doc__)
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -1,9 +1,13 @@
-import re, copy
+import re
 from dataclasses import dataclass
-from colorama import Fore, Style
+from functools import lru_cache
+from itertools import islice
+from typing import Callable, Iterable, Iterator
+from src import stats
 MARKER_PREFIX = '<<<SECTION: '
 MARKER_SUFFIX = '>>>'
-MAX_CHUNK_LENGTH = 200
+MAX_CHUNK_LENGTH = 200  # in units of CHUNK_LENGTH
+CHUNK_LENGTH = 'words'  # 'words' | 'chars' | path to a tokenizer.json of the embedding model (HF tokenizers)
 _SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+(?=[A-ZÄÖÜ0-9"„“‚‘(])')
 
 @dataclass
@@ -12,105 +16,175 @@ class Section:
     lvl : int = -1
     text : str = ''
     got_split : bool = False
+    length : int = 0  # word count of text
 
-def chunking(text: str, chunk_template: dict[str, any]):
+LengthFn = Callable[[list[str]], list[int]]  # batched: lengths of many texts in one call
+
+class TokenizerLength:  # length in tokens of a local tokenizer file, batched and cached per text
+    def __init__(self, path: str, cache_size: int = 1 << 18):
+        from tokenizers import Tokenizer  # optional dependency, only needed for token based sizing
+        self.tokenizer = Tokenizer.from_file(str(path))
+        self.cache: dict[str, int] = {}  # sentence -> token count (sentences repeat across chunks and documents), in insertion order
+        self.cache_size = cache_size
+
+    def __call__(self, texts: list[str]) -> list[int]:
+        missing = list(dict.fromkeys(t for t in texts if t not in self.cache))  # unique, not yet counted
+        if missing:
+            encoded = self.tokenizer.encode_batch(missing, add_special_tokens=False)  # one batch for the whole document
+            self.cache.update(zip(missing, (len(e.ids) for e in encoded)))
+        res = [self.cache[t] for t in texts]
+        if len(self.cache) > self.cache_size:  # FIFO: drop the oldest sentences, the recent ones stay counted
+            for t in list(islice(self.cache, len(self.cache) - self.cache_size)): del self.cache[t]
+        return res
+
+def word_length(texts: list[str]) -> list[int]: return [len(t.split()) for t in texts]
+def char_length(texts: list[str]) -> list[int]: return [len(t.strip()) for t in texts]
+
+@lru_cache(maxsize=8)
+def get_length_function(spec: str) -> LengthFn:
+    '''resolves CHUNK_LENGTH ('words', 'chars' or a tokenizer file) to a batched length function (loaded once)'''
+    if spec == 'words': return word_length
+    if spec == 'chars': return char_length
+    return TokenizerLength(spec)
+
+def _get_content_hash(text: str) -> str:
+    import hashlib
+    norm = ' '.join(text.split())
+    return hashlib.sha256(norm.encode('utf-8')).hexdigest()
+
+@stats.timed('chunk')
+def chunking(text: str, chunk_template: dict[str, any], length: str | LengthFn = None, max_length: int = None):
     '''chunks the text into sections based on markers and writes to JSONL'''
-    def _get_content_hash(text: str) -> str:
-        import hashlib
-        norm = ' '.join(text.split())
-        return hashlib.sha256(norm.encode('utf-8')).hexdigest()
-    
-    chunk_txt = ['']
-    sects_in_chunk: list[list[Section]] = [[]]
-    chunk_length = 0
+    return list(iter_chunks(text.splitlines(), chunk_template, length, max_length, whole=True))
+
+def iter_chunks(lines: Iterable[str], chunk_template: dict[str, any], length: str | LengthFn = None, max_length: int = None, whole: bool = False) -> Iterator[dict[str, any]]:
+    '''chunking() over a stream of lines: every chunk is yielded as soon as it is complete (only the current section is held in memory);
+    whole => lines is the whole document: one batched length call for all its sentences instead of one per section'''
+    count = length if callable(length) else get_length_function(length or CHUNK_LENGTH)
+    max_length = MAX_CHUNK_LENGTH if max_length is None else max_length
+    sep = 1 if count is char_length else 0  # the ' ' joining two parts of a chunk (a length in chars, no word or token of its own)
+    metadata = chunk_template['metadata']
+    parts: list[str] = []  # text pieces of the current chunk (joined once when it is complete)
+    sects_in_chunk: list[Section] = []
+    chunk_length = index = 0  # length + index of the current chunk
+    char_pos = overlap = 0
     prev2 = prev1 = ''
-    
-    for sect in _get_sections(text):
-        sect_length = _count_words(sect.text)
-        if chunk_length + sect_length <= MAX_CHUNK_LENGTH:  # next section can be added completly
-            chunk_txt[-1] += sect.text + ' '  # add whole section
-            sects_in_chunk[-1].append(sect)
+    lengths: dict[str, int] = {}
+    n_sections = n_sentences = n_chunks = 0
+
+    def finish() -> dict[str, any] | None:
+        '''chunk dict of the completed current chunk (None if it is empty)'''
+        nonlocal char_pos, overlap, n_chunks
+        if not parts: return None
+        n_chunks += 1
+        txt = ' '.join(parts).strip()  # join once per chunk
+        last_two = _get_last_sentences(parts)
+        start_char = char_pos
+        char_pos += len(txt)
+        nxt_line = {**chunk_template, 'id': chunk_template['id'] + str(index), 'text': txt, 'metadata': {  # shallow template + per-chunk fields
+            **metadata,
+            'headings': [{'heading': s.heading, 'lvl': s.lvl, 'got_split': s.got_split} for s in sects_in_chunk],
+            'chunk_index': index,
+            'word_count': chunk_length if count is word_length else _count_words(txt),
+            'start_char': start_char,
+            'end_char': char_pos,
+            'overlap_char': overlap,
+            'content_hash': _get_content_hash(txt),
+        }}
+        if last_two: 
+            overlap = len(last_two[0] + ' ' + last_two[1])
+            char_pos -= overlap
+        else:
+            from colorama import Fore, Style
+            print(Fore.YELLOW + 'WARNING: Overlap is not possible. Probably because MAX_CHUNK_LENGTH is too low or text is too short' + Style.RESET_ALL)  # colorama only loads for the warning
+        return nxt_line
+
+    def measured() -> Iterator[tuple[Section, list[str]]]:
+        '''sections with their sentences (split once), lengths counted for the document (whole) or per section (+ the overlap candidates)'''
+        nonlocal lengths
+        sections = ((sect, _get_sentences(sect.text)) for sect in _get_sections(lines))
+        for batch in ([list(sections)] if whole else ([s] for s in sections)):
+            kept = {p: lengths[p] for p in (prev2, prev1) if p}
+            texts = list(dict.fromkeys(s for _, sentences in batch for s in sentences if s not in kept))
+            lengths = kept | dict(zip(texts, count(texts)))
+            yield from batch
+
+    for sect, sentences in measured():
+        n_sections += 1
+        n_sentences += len(sentences)
+        sect_length = sum(lengths[s] for s in sentences) + sep * (len(sentences) - 1) + (sep if parts else 0)  # its sentences + the spaces joining them (the section text is not counted again)
+        if chunk_length + sect_length <= max_length:  # next section can be added completly
+            parts.append(sect.text)  # add whole section
+            sects_in_chunk.append(sect)
             chunk_length += sect_length  # new chunk length
-            tail = _get_sentences(sect.text)
-            if tail: prev2, prev1 = (tail[-2] if len(tail) > 1 else prev1), tail[-1]
+            if sentences: prev2, prev1 = (sentences[-2] if len(sentences) > 1 else prev1), sentences[-1]
         else:  # next section needs to be splitted
-            sentences = _get_sentences(sect.text)
             added_to_current = False
             for s in sentences:  # iterate over all sentence
-                sentence_length = _count_words(s)
-                if chunk_length + sentence_length <= MAX_CHUNK_LENGTH:  # sentence can be added
+                sentence_length = lengths[s]  # counted once
+                if chunk_length + sentence_length + (sep if parts else 0) <= max_length:  # sentence can be added
                     if not added_to_current:
-                        sects_in_chunk[-1].append(sect)
+                        sects_in_chunk.append(sect)
                         sect.got_split = True
                         added_to_current = True
-                    chunk_txt[-1] += s + ' '  # add sentence to chunk
+                    parts.append(s)  # add sentence to chunk
                     prev2, prev1 = prev1, s
-                    chunk_length += sentence_length  # update chunk length
+                    chunk_length += sentence_length + (sep if len(parts) > 1 else 0)  # update chunk length
                 else:  # sentence needs to go in next chunk
-                    overlap = (prev2 + ' ' + prev1).strip()
-                    chunk_txt.append(((overlap + ' ' + s).strip() + ' '))  # add overlap and sentence to new chunk
-                    sects_in_chunk.append([sect])
-                    if added_to_current: sect.got_split = True
+                    if added_to_current: sect.got_split = True  # before the chunk is built: it holds this section too
+                    if (chunk := finish()): yield chunk
+                    overlap_parts = [p for p in (prev2, prev1) if p]
+                    parts = overlap_parts + [s]  # add overlap and sentence to new chunk
+                    sects_in_chunk = [sect]
+                    index += 1
                     added_to_current = True
-                    chunk_length = _count_words(chunk_txt[-1])  # update chunk length
+                    chunk_length = sum(lengths[p] for p in overlap_parts) + sentence_length + sep * len(overlap_parts)  # overlap sentences are already counted
                     prev2, prev1 = prev1, s
-    
-    out = []
-    char_pos = 0
-    overlap = 0
-    for i, txt in enumerate(chunk_txt):
-        if not txt: continue
-        content_hash = _get_content_hash(txt)
-        nxt_line = copy.deepcopy(chunk_template)  # new default line
-        nxt_line['id'] = chunk_template['id'] + str(i)
-        nxt_line['text'] = txt.strip()
-        nxt_line['metadata']['headings'] = [{'heading': s.heading, 'lvl': s.lvl, 'got_split': s.got_split} for s in sects_in_chunk[i]]
-        nxt_line['metadata']['chunk_index'] = i
-        nxt_line['metadata']['word_count'] = _count_words(txt)
-        nxt_line['metadata']['start_char'] = char_pos
-        char_pos += len(txt.strip())
-        nxt_line['metadata']['end_char'] = char_pos
-        nxt_line['metadata']['overlap_char'] = overlap
-        if len(_get_sentences(txt)) >= 2: 
-            overlap = len(_get_sentences(txt)[-2] + ' ' + _get_sentences(txt)[-1])
-            char_pos -= overlap
-        else: print(Fore.YELLOW + 'WARNING: Overlap is not possible. Probably because MAX_CHUNK_LENGTH is too low or text is too short' + Style.RESET_ALL)
-        nxt_line['metadata']['content_hash'] = content_hash
-        out.append(nxt_line)
-    return out
+    if (chunk := finish()): yield chunk
+    if stats.ENABLED:
+        stats.count('sections', n_sections)
+        stats.count('sentences', n_sentences)
+        stats.count('chunks', n_chunks)
+
+def _get_last_sentences(parts: list[str]) -> list[str]:
+    '''last two sentences of ' '.join(parts) (empty if it has less than two), splitting only the needed tail'''
+    for k in range(1, len(parts) + 1):
+        sentences = _get_sentences(' '.join(parts[-k:]))  # split points only depend on their neighbouring chars
+        if len(sentences) >= 3 or k == len(parts): break  # two split points inside the tail => last two sentences are complete
+    return sentences[-2:] if len(sentences) >= 2 else []
 
 def _get_sentences(text: str) -> list[str]:
     text = text.strip()
     if not text: return []
     return [s.strip() for s in _SENTENCE_SPLIT.split(text) if s.strip()]
 
-def _get_sections(text: str):
+def _get_sections(text: str | Iterable[str]):
     def make_output(heading: str, lvl: int, txt: str):
         length = _count_words(txt)
         if length < 5: return None  # kill very short lines
-        return Section(heading, lvl, txt, False)    
+        return Section(heading, lvl, txt, False, length)    
     def parse_marker(line: str):
         '''parses a section marker line'''
         end_idx = line.find(MARKER_SUFFIX)
         inner = line[len(MARKER_PREFIX) : end_idx]  # extract inner content
         heading, lvl = inner.split('; level: ')
         return heading.strip(), int(lvl.strip())
-    sect_txt = ''
+    sect_txt: list[str] = []  # lines of the current section (joined once)
     heading = None
     first = True
-    for ln in text.splitlines():  # process each line
+    for ln in (text.splitlines() if isinstance(text, str) else text):  # process each line (or a stream of lines)
         ln = ln.strip()
         if ln.startswith(MARKER_PREFIX):  # found a section marker
             if not first:  # not the first marker
-                out = make_output(heading, lvl, sect_txt.strip())
+                out = make_output(heading, lvl, ' '.join(sect_txt).strip())
                 if out: yield out
-                sect_txt = ''
+                sect_txt = []
             first = False
             heading, lvl = parse_marker(ln)  # parse marker
             continue
-        sect_txt += ln + ' '
+        sect_txt.append(ln)
 
-    out = make_output(heading, lvl, sect_txt.strip())
+    out = make_output(heading, lvl, ' '.join(sect_txt).strip())
     if out: yield out
 
 def _count_words(text: str) -> int: return len(text.strip().split())
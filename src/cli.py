@@ -0,0 +1,112 @@
+'''headless command line: the whole pipeline (run, crawl) and its single stages (fetch, extract, chunk)
+
+usage: python -m src.cli <command> -h
+Every command imports only the modules it needs: extract and chunk on saved input never load
+the browser, the GUI, bs4, html5lib or the pipeline runner (benchmarks/bench_startup.py).
+'''
+from pathlib import Path
+import argparse, sys
+
+PROJECT = Path(__file__).resolve().parents[1]  # default project folder (config/, data/, cache/)
+
+def main(args: list[str] | None = None) -> int:
+    opts = _parser().parse_args(args)
+    return opts.command(opts)
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='python -m src.cli', description=__doc__.split('\n')[0])
+    commands = parser.add_subparsers(required=True, metavar='command')
+    fetch = commands.add_parser('fetch', help='download pages (fetch cache, plain HTTP, browser) and save them as <title>.html')
+    fetch.add_argument('urls', nargs='*', metavar='URL', help='pages to fetch (default: the URL file)')
+    fetch.add_argument('--urls', dest='url_file', metavar='FILE', help='one URL per line (default: config/getURLs.txt)')
+    fetch.add_argument('--out', metavar='DIR', default='.', help='folder for the saved pages (default: .)')
+    fetch.set_defaults(command=_fetch)
+    extract = commands.add_parser('extract', help='saved pages -> text with section markers (all sections)')
+    extract.add_argument('pages', nargs='+', metavar='PAGE', help='saved .html files')
+    extract.add_argument('--out', metavar='DIR', help='write <name>.txt here (default: stdout)')
+    extract.add_argument('--parser', help='parse_html backend (default: parse_html.PARSER)')
+    extract.set_defaults(command=_extract)
+    chunk = commands.add_parser('chunk', help='texts with section markers -> chunks (JSON lines)')
+    chunk.add_argument('texts', nargs='+', metavar='TEXT', help='text files as written by extract')
+    chunk.add_argument('--out', metavar='DIR', help='write <name>_chunks.jsonl here (default: stdout)')
+    chunk.add_argument('--page', metavar='PAGE', help='saved page the metadata is read from (default: the file name is the title)')
+    chunk.set_defaults(command=_chunk)
+    for name, text in (('run', 'the pipeline over the URL file (or --ingest)'), ('crawl', 'headless crawl, the URL file holds the seeds (limits in src/crawler.py)')):
+        cmd = commands.add_parser(name, help=text)
+        cmd.add_argument('--urls', dest='url_file', metavar='FILE', help='one URL per line (default: config/getURLs.txt)')
+        cmd.add_argument('--out', metavar='DIR', help='project folder for data/, cache/ and config/section_state.json (default: this repository)')
+        cmd.add_argument('--workers', type=int, help='processes for parse/render/chunk (default: main.WORKERS)')
+        cmd.add_argument('--output', metavar='KIND', help='writer: folder, gzip, zstd, jsonl, jsonl.gz, jsonl.zst, parquet or arrow (default: main.OUTPUT)')
+        cmd.add_argument('--stats', action=argparse.BooleanOptionalAction, help='per-stage times and counters in data/stats.jsonl')
+        if name == 'run':
+            cmd.add_argument('--silent', action=argparse.BooleanOptionalAction, help='headless (--no-silent opens the section GUI, default: main.SILENT)')
+            cmd.add_argument('--ingest', metavar='PATH', help='folder of saved pages or .warc/.warc.gz file instead of the URL file')
+        cmd.set_defaults(command=_run, crawl=name == 'crawl')
+    return parser
+
+def _url_list(opts: argparse.Namespace) -> list[str]:
+    if opts.urls: return opts.urls
+    path = Path(opts.url_file) if opts.url_file else PROJECT / 'config' / 'getURLs.txt'
+    return [ln.strip() for ln in path.read_text(encoding='utf-8').split('\n') if ln.strip()]
+
+def _emit(text: str, path: Path, suffix: str, out: str | None) -> None:
+    '''writes <out>/<name><suffix>, or to stdout without --out'''
+    if out is None:
+        sys.stdout.write(text if text.endswith('\n') else text + '\n')
+        return
+    target = Path(out) / (path.stem + suffix)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    target.write_text(text, encoding='utf-8')
+
+def _fetch(opts: argparse.Namespace) -> int:
+    from src.extract_text import download_many
+    from src.extract_metadata import saved_from_url
+    urls = _url_list(opts)
+    out = Path(opts.out)
+    out.mkdir(parents=True, exist_ok=True)
+    failed = 0
+    for url, (html, title) in zip(urls, download_many(urls, PROJECT, skip_errors=True)):
+        if not html:
+            print(f'Failed: {url}', file=sys.stderr)
+            failed += 1
+            continue
+        if not saved_from_url(html): html = f'<!-- saved from url=({len(url):04}){url} -->\n' + html  # extract/ingest read the URL from it
+        (out / f'{title}.html').write_text(html, encoding='utf-8')
+        print(f'Fetched: "{title}" ({len(html) / 1e3:.1f} KB)')
+    return 1 if failed else 0
+
+def _extract(opts: argparse.Namespace) -> int:
+    from src.parse_html import parse_html
+    from src.extract_text import _render_with_state
+    for path in map(Path, opts.pages):
+        text = _render_with_state(parse_html(path.read_text(encoding='utf-8'), parser=opts.parser))  # headless: all sections
+        _emit(text, path, '.txt', opts.out)
+    return 0
+
+def _chunk(opts: argparse.Namespace) -> int:
+    from src.chunking import chunking
+    from src.extract_metadata import extract_metadata
+    import html, json
+    page = Path(opts.page).read_text(encoding='utf-8') if opts.page else None
+    for path in map(Path, opts.texts):
+        template = extract_metadata(page if page is not None else f'<title>{html.escape(path.stem)}</title>')  # only the head is parsed
+        chunks = chunking(path.read_text(encoding='utf-8'), template)
+        _emit(''.join(json.dumps(c, ensure_ascii=False) + '\n' for c in chunks), path, '_chunks.jsonl', opts.out)
+    return 0
+
+def _run(opts: argparse.Namespace) -> int:
+    import main as pipeline  # the runner and everything it needs
+    pipeline.URL_FILE = str(Path(opts.url_file).resolve()) if opts.url_file else str(Path(pipeline.ROOT) / pipeline.URL_FILE)  # before ROOT moves
+    if opts.out: pipeline.ROOT = Path(opts.out).resolve()
+    if opts.workers is not None: pipeline.WORKERS = opts.workers
+    if opts.output is not None: pipeline.OUTPUT = opts.output
+    if opts.stats is not None: pipeline.STATS = opts.stats
+    if opts.crawl: pipeline.CRAWL = True
+    else:
+        if opts.silent is not None: pipeline.SILENT = opts.silent
+        if opts.ingest is not None: pipeline.INGEST = str(Path(opts.ingest).resolve())
+    pipeline.run_pipeline()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
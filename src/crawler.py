@@ -0,0 +1,132 @@
+'''headless crawl: follows the links of processed pages (frontier with depth, domain and URL pattern limits, resumable)'''
+from src.extract_text import download_many
+from src.extract_metadata import extract_metadata
+from src.extract_urls import extract_urls, normalize_url
+from src.parse_html import parse_html
+from src.pipeline import PageResult, process_page
+from src.fetcher import FETCH_CONCURRENCY
+from src import stats
+from collections import deque
+from urllib.parse import urljoin, urlparse
+from pathlib import Path
+from typing import Callable
+import json, os, re
+
+CRAWL_MAX_DEPTH = 2  # links followed from the seed pages (0 = only the seeds)
+CRAWL_MAX_PAGES = 500  # pages processed per crawl (unchanged pages included)
+CRAWL_SAME_DOMAIN = True  # only hosts of the seeds (and their subdomains)
+CRAWL_INCLUDE: list[str] = []  # regexes, a URL must match one of them (empty = all)
+CRAWL_EXCLUDE = [r'/(?:login|signin|logout|search)\b', r'[?&](?:action|oldid|diff)=',
+                 r'/wiki/(?:Special|Talk|User|User_talk|Help|File|Template|Template_talk|Category|Portal|Wikipedia):']  # regexes, a matching URL is never queued (file types are dropped by extract_urls)
+CRAWL_STATE = 'data/crawl_state.json'  # relative to the project root, written after every batch
+
+class Crawler:  # frontier (breadth first) + visited set of normalized URLs, pages processed in WORKERS processes
+    def __init__(self, seeds: list[str], ROOT: str | Path, max_depth: int = CRAWL_MAX_DEPTH, max_pages: int = CRAWL_MAX_PAGES, same_domain: bool = CRAWL_SAME_DOMAIN,
+                 include: list[str] = None, exclude: list[str] = None, workers: int = 1, resume: bool = True):
+        self.ROOT = ROOT
+        self.seeds = [normalize_url(s) for s in seeds]
+        self.max_depth, self.max_pages, self.workers = max_depth, max_pages, workers
+        self.hosts = {urlparse(s).hostname for s in self.seeds} if same_domain else None
+        self._include = [re.compile(p) for p in (CRAWL_INCLUDE if include is None else include)]
+        self._exclude = [re.compile(p) for p in (CRAWL_EXCLUDE if exclude is None else exclude)]
+        self._state_path = Path(ROOT) / CRAWL_STATE
+        self.frontier: deque[tuple[str, int]] = deque()  # (url, depth) waiting for a fetch
+        self.visited: set[str] = set()  # every URL that was ever queued (normalized)
+        self.done = self.failed = 0
+        self._in_flight: dict[str, int] = {}  # taken from the frontier but not finished yet (re-queued on save)
+        if not (resume and self._load()):
+            for s in self.seeds: self._push(s, 0)
+
+    def allowed(self, url: str) -> bool:
+        '''same domain + include/exclude patterns'''
+        p = urlparse(url)
+        if p.scheme not in ('http', 'https'): return False
+        if self.hosts is not None and not any(p.hostname == h or (p.hostname or '').endswith('.' + h) for h in self.hosts): return False
+        if self._include and not any(r.search(url) for r in self._include): return False
+        return not any(r.search(url) for r in self._exclude)
+
+    def add_links(self, page_url: str, links: list[str], depth: int) -> int:
+        '''queues the allowed, not yet visited links of a page at depth (returns how many were new)'''
+        if depth > self.max_depth: return 0
+        before = len(self.frontier)
+        for link in links:
+            url = normalize_url(urljoin(page_url, link))  # relative hrefs, fragments, tracking parameters
+            if url not in self.visited and self.allowed(url): self._push(url, depth)
+        return len(self.frontier) - before
+
+    def run(self, on_result: Callable[[PageResult], None], unchanged: Callable[[str, str], bool] | None = None, parse_stats: bool = False,
+            page_args: Callable[[str], tuple] | None = None) -> None:
+        '''crawls until the frontier is empty or max_pages are processed; on_result writes each finished page (in fetch order); page_args(url) => extra process_page arguments'''
+        from concurrent.futures import ProcessPoolExecutor
+        pool = ProcessPoolExecutor(max_workers=self.workers) if self.workers > 1 else None
+        pending: deque = deque()  # (future, depth) in fetch order
+        try:
+            while (self.frontier or pending) and self.done < self.max_pages:
+                batch = []
+                while self.frontier and self.done + len(self._in_flight) + len(batch) < self.max_pages and len(batch) < FETCH_CONCURRENCY: batch.append(self.frontier.popleft())
+                self._in_flight.update(batch)
+                for (url, depth), (html, title) in zip(batch, download_many([u for u, _ in batch], self.ROOT, skip_errors=True) if batch else []):  # concurrent fetches
+                    if not html:
+                        self.failed += 1
+                        del self._in_flight[url]
+                        print(f'Crawl: "{url}" could not be fetched')
+                        continue
+                    if unchanged and unchanged(url, html):  # nothing to write, but its links are still needed
+                        self.add_links(url, _links(url, html), depth + 1)
+                        self._finish(url)
+                        print(f'Unchanged: "{title}" skipped')
+                        continue
+                    args = (url, html, title, parse_stats, stats.ENABLED, True, *(page_args(url) if page_args else ()))
+                    pending.append((pool.submit(process_page, *args) if pool else _Done(process_page(*args)), depth))
+                    while pending and (pending[0][0].done() or len(pending) >= 2 * self.workers): self._collect(pending.popleft(), on_result)  # bounded in-flight pages
+                if not batch and pending: self._collect(pending.popleft(), on_result)  # frontier empty => wait for links of the oldest page
+                self.save()
+            while pending: self._collect(pending.popleft(), on_result)  # max_pages reached
+        finally:
+            if pool: pool.shutdown(cancel_futures=True)
+            self.save()  # also on Ctrl+C: unfinished pages go back to the frontier
+        print(f'Crawl: {self.done} pages processed, {self.failed} failed, {len(self.frontier)} left in the frontier')
+
+    def _collect(self, item: tuple[any, int], on_result: Callable[[PageResult], None]) -> None:
+        future, depth = item
+        res: PageResult = future.result()
+        on_result(res)
+        self.add_links(res.url, res.links or [], depth + 1)
+        self._finish(res.url)
+
+    def _finish(self, url: str) -> None:
+        self._in_flight.pop(url, None)
+        self.done += 1
+
+    def _push(self, url: str, depth: int) -> None:
+        self.visited.add(url)
+        self.frontier.append((url, depth))
+
+    def save(self) -> None:
+        '''crawl state (frontier incl. unfinished pages, visited set, counters) => a stopped crawl can resume'''
+        state = {'seeds': self.seeds, 'frontier': [*self._in_flight.items(), *self.frontier], 'visited': sorted(self.visited), 'done': self.done, 'failed': self.failed}
+        self._state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self._state_path.with_name(self._state_path.name + '.tmp')
+        tmp.write_text(json.dumps(state, ensure_ascii=False), encoding='utf-8')
+        os.replace(tmp, self._state_path)
+
+    def _load(self) -> bool:
+        '''continues a saved crawl of the same seeds that still has a frontier'''
+        if not self._state_path.exists(): return False
+        state = json.loads(self._state_path.read_text(encoding='utf-8'))
+        if state.get('seeds') != self.seeds or not state.get('frontier'): return False  # other crawl or finished => start over
+        self.frontier = deque((u, d) for u, d in state['frontier'])
+        self.visited = set(state['visited'])
+        self.done, self.failed = state['done'], state['failed']
+        print(f'Crawl: resuming with {len(self.frontier)} queued, {self.done} done')
+        return True
+
+class _Done:  # finished result with the Future interface used above (no pool)
+    def __init__(self, value): self._value = value
+    def done(self) -> bool: return True
+    def result(self): return self._value
+
+def _links(url: str, html: str) -> list[str]:
+    '''links of a page that is not processed again (fast lxml parse)'''
+    parsed = parse_html(html, parser='lxml')
+    return [u for u, _ in extract_urls(extract_metadata(parsed)['metadata'], parsed, url)]
@@ -0,0 +1,104 @@
+'''near-duplicate chunks across the corpus: MinHash signatures (numpy), LSH banding for candidates, first chunk of a cluster is kept'''
+from src import stats
+import re, zlib
+
+NUM_PERM = 128  # MinHash permutations (signature length, 4 bytes each per indexed chunk)
+BANDS = 16  # LSH bands of NUM_PERM // BANDS rows => pairs above ~(1/BANDS)**(BANDS/NUM_PERM) = 0.71 similarity become candidates
+THRESHOLD = 0.8  # estimated Jaccard similarity of the shingle sets from which a chunk is a near-duplicate
+SHINGLE = 5  # words per shingle (chunks with fewer words use single words)
+DEDUP_MODES = ('tag', 'drop')  # tag: metadata['cluster_id'] = id of the first chunk of the cluster | drop: near-duplicates are not written
+
+_WORD = re.compile(r'\w+')
+_SHINGLE_MULT = 0x9E3779B97F4A7C15  # odd 64 bit multiplier combining the word hashes of a shingle
+_BATCH_COLUMNS = 1 << 16  # shingles hashed per numpy batch (NUM_PERM x columns uint64 matrix, ~64 MB)
+
+class NearDuplicates:  # streaming index: chunks are checked against all earlier chunks of the run, then added
+    def __init__(self, mode: str = 'tag', num_perm: int = NUM_PERM, bands: int = BANDS, threshold: float = THRESHOLD, seed: int = 1):
+        import numpy as np  # optional dependency, only needed with DEDUP
+        if mode not in DEDUP_MODES: raise ValueError(f'unknown dedup mode "{mode}", choose one of {DEDUP_MODES}')
+        if num_perm % bands: raise ValueError(f'num_perm ({num_perm}) must be a multiple of bands ({bands})')
+        self.mode, self.bands, self.rows, self.threshold = mode, bands, num_perm // bands, threshold
+        rng = np.random.default_rng(seed)  # fixed seed => same signatures in every run
+        self._a = (rng.integers(0, 1 << 63, num_perm, dtype=np.uint64) * 2 + 1)[:, None]  # odd multipliers of the multiply-shift hashes
+        self._b = rng.integers(0, 1 << 63, num_perm, dtype=np.uint64)[:, None]
+        self._band_mult = rng.integers(1, 1 << 63, self.rows, dtype=np.uint64)  # band rows => one 64 bit bucket key
+        self._sigs = np.empty((1024, num_perm), dtype=np.uint32)  # signatures of the indexed chunks (grows by doubling)
+        self._clusters: list[str] = []  # cluster id per indexed chunk (same row as _sigs)
+        self._buckets: list[dict[int, list[int]]] = [{} for _ in range(bands)]  # per band: bucket key -> rows
+        self._exact: dict[str, int] = {}  # content_hash -> row (identical text needs no signature comparison)
+        self.chunks = self.duplicates = 0
+
+    def signatures(self, texts: list[str]):
+        '''MinHash signature per text as a (len(texts), num_perm) uint32 array (all shingles of a batch hashed in one numpy call)'''
+        import numpy as np
+        shingles = [_shingles(t) for t in texts]
+        out = np.full((len(texts), len(self._a)), 0xFFFFFFFF, dtype=np.uint32)  # no shingles => never matches (see _query)
+        i = 0
+        while i < len(texts):
+            j, cols = i, 0
+            while j < len(texts) and (j == i or cols + len(shingles[j]) <= _BATCH_COLUMNS): cols, j = cols + len(shingles[j]), j + 1
+            rows = [k for k in range(i, j) if len(shingles[k])]
+            if rows:
+                hashed = (self._a * np.concatenate([shingles[k] for k in rows]) + self._b) >> 32  # num_perm x shingles, multiply-shift hashing (wraps at 2^64)
+                starts = np.cumsum([0] + [len(shingles[k]) for k in rows[:-1]])
+                out[rows] = np.minimum.reduceat(hashed, starts, axis=1).T
+            i = j
+        return out
+
+    def filter(self, chunks: list[dict[str, any]]) -> list[dict[str, any]]:
+        '''checks the chunks of one document (in order) against the index and adds them; returns the chunks to write'''
+        if not chunks: return chunks
+        with stats.stage('dedup'):
+            sigs = self.signatures([c['text'] for c in chunks])
+            keys = self._band_keys(sigs)
+            out, dups = [], 0
+            for chunk, sig, key in zip(chunks, sigs, keys):
+                cluster = self._query(chunk['metadata'].get('content_hash'), sig, key)
+                self._add(chunk, sig, key, cluster or chunk['id'])
+                dups += cluster is not None
+                if self.mode == 'tag': chunk['metadata']['cluster_id'] = cluster or chunk['id']
+                if not (cluster and self.mode == 'drop'): out.append(chunk)
+        self.chunks += len(chunks)
+        self.duplicates += dups
+        stats.count('near_duplicates', dups)
+        return out
+
+    def summary(self) -> str:
+        action = 'dropped' if self.mode == 'drop' else 'tagged'
+        return f'near-duplicates: {self.duplicates} of {self.chunks} chunks {action} ({len(self._clusters)} indexed)'
+
+    def _band_keys(self, sigs):
+        '''(chunks, bands) uint64 bucket keys: the rows of each band combined with random multipliers (wrapping sum)'''
+        import numpy as np
+        return (sigs.reshape(len(sigs), self.bands, self.rows).astype(np.uint64) * self._band_mult).sum(axis=2, dtype=np.uint64)
+
+    def _query(self, content_hash: str | None, sig, key) -> str | None:
+        '''cluster id of the most similar indexed chunk above the threshold (None = new cluster)'''
+        if content_hash and content_hash in self._exact: return self._clusters[self._exact[content_hash]]
+        if sig[0] == 0xFFFFFFFF and (sig == 0xFFFFFFFF).all(): return None  # no words
+        rows = {r for band, k in enumerate(key.tolist()) for r in self._buckets[band].get(k, ())}
+        if not rows: return None
+        rows = sorted(rows)
+        sim = (self._sigs[rows] == sig).mean(axis=1)  # estimated Jaccard similarity per candidate
+        best = int(sim.argmax())
+        return self._clusters[rows[best]] if sim[best] >= self.threshold else None
+
+    def _add(self, chunk: dict[str, any], sig, key, cluster: str) -> None:
+        import numpy as np
+        row = len(self._clusters)
+        if row == len(self._sigs): self._sigs = np.concatenate([self._sigs, np.empty_like(self._sigs)])
+        self._sigs[row] = sig
+        self._clusters.append(cluster)
+        for band, k in enumerate(key.tolist()): self._buckets[band].setdefault(k, []).append(row)
+        if chunk['metadata'].get('content_hash'): self._exact.setdefault(chunk['metadata']['content_hash'], row)
+
+def _shingles(text: str):
+    '''uint64 hashes of the lowercase word n-grams of a text (word crc32s combined in numpy, repeated shingles do not change a MinHash)'''
+    import numpy as np
+    words = _WORD.findall(text.lower())
+    h = np.fromiter((zlib.crc32(w.encode('utf-8')) for w in words), dtype=np.uint64, count=len(words))
+    n = min(SHINGLE, len(words))
+    if not n: return h
+    out = h[:len(h) - n + 1].copy()
+    for k in range(1, n): out = out * _SHINGLE_MULT + h[k:len(h) - n + 1 + k]  # polynomial hash of the n words (wraps at 2^64)
+    return out
@@ -1,19 +1,28 @@
+from src.parse_html import ParsedHTML, parse_html
 from lxml import etree as ET
+from src import stats
+from itertools import islice
+from typing import Iterable, Iterator
 import re
 
-ROOT: ET.Element = None
-def extract_metadata(html: ET.Element):
-    global ROOT; ROOT = _html_to_ET(html)
-    canonical_url = language = site = content_type = None
-    title = _get_title()
-    url = _get_url() or _get_og_url()
-    language = _get_language()
-    site = _get_site()
-    canonical_url = _get_canonical_url(url)
+HEAD_PARSER = 'lxml'  # raw HTML: only the part before <body> is parsed, with this backend (see parse_html.PARSERS)
+HEAD_CHARS = 1 << 20  # the part before <body> is looked for in this many characters (at most this many are parsed)
+_SAVED_FROM = re.compile(r'saved from url=\(\d+\)(\S+)')  # comment browsers put before <html> when saving a page
+_BODY = re.compile(r'<body[\s>/]', re.IGNORECASE)
+_OG = ('og:title', 'og:url', 'og:site_name')  # meta properties read from the head
+@stats.timed('metadata')
+def extract_metadata(html: str | ParsedHTML):
+    root = html.root if isinstance(html, ParsedHTML) else _parse_head(html)  # reuse the shared tree, raw HTML: the head is parsed, not the page
+    head = _read_head(root)  # all title/meta/link facts in one pass (reentrant: no module state)
+    title = head.get('title') or head.get('og:title')
+    url = _get_url(root) or head.get('og:url')
+    language = root.attrib.get('lang')
+    site = head.get('og:site_name') if 'og:site_name' in head else head.get('search')
+    canonical_url = _get_canonical_url(url, head.get('canonical'))
     doc_id = _make_doc_id(canonical_url) if canonical_url else _make_doc_id(title)
     domain = _get_domain(canonical_url)
     fetched_at = _get_fetched_at()
-    content_type = _get_content_type()
+    content_type = head.get('content_type')
     
     out: dict[str, any] = {
         'id': f'{doc_id}::c',
@@ -39,33 +48,49 @@ def extract_metadata(html: ET.Element):
 
     return out
 
-def _html_to_ET(html: str) -> ET.Element:
-    '''creates a correct working lxml tree'''
-    import html5lib
-    doc = html5lib.parse(html, treebuilder='lxml', namespaceHTMLElements=False)  # parse HTML
-    return doc.getroot()
-
-def _get_title() -> str | None:
-    for title in ROOT.iter('title'):
-        if title.text and title.text.strip(): return title.text.strip()
-    for meta in ROOT.iter('meta'):
-        if (meta.attrib.get('property') or '').lower() == 'og:title': return meta.attrib.get('content')
-def _get_url() -> str | None:
-    for child in ROOT.xpath('/comment()'):
+def extract_metadata_many(pages: Iterable[str | ParsedHTML], executor: 'concurrent.futures.Executor | None' = None, batch: int = 256) -> Iterator[dict[str, any]]:
+    '''metadata templates of many pages in input order; with an executor (thread or process pool) the raw pages go there in batches'''
+    if executor is None:
+        yield from map(extract_metadata, pages)
+        return
+    pages = iter(pages)
+    batches = iter(lambda: [p.html if isinstance(p, ParsedHTML) else p for p in islice(pages, batch)], [])  # trees are not sent (heads parse in microseconds)
+    for out in executor.map(_metadata_batch, batches): yield from out
+def _metadata_batch(pages: list[str]) -> list[dict[str, any]]: return [extract_metadata(html) for html in pages]
+def head_html(html: str) -> str:
+    '''the part of the page before <body> (title, meta and link tags without the page)'''
+    m = _BODY.search(html, 0, HEAD_CHARS)
+    return html[:m.start()] if m else html[:HEAD_CHARS]
+def _parse_head(html: str) -> ET.Element: return parse_html(head_html(html), parser=HEAD_PARSER).root
+def _read_head(root: ET.Element) -> dict[str, str | None]:
+    '''first title text, og:* meta, content type, canonical and search link of <head> (the whole tree if there is none), one pass'''
+    head = next((el for el in root if el.tag == 'head'), root)
+    facts: dict[str, str | None] = {}
+    for el in head.iter('title', 'meta', 'link'):
+        if el.tag == 'title':
+            if 'title' not in facts and el.text and el.text.strip(): facts['title'] = el.text.strip()
+        elif el.tag == 'meta':
+            prop = (el.attrib.get('property') or '').lower()
+            if prop in _OG: facts.setdefault(prop, el.attrib.get('content'))
+            if 'content_type' in facts: continue
+            if 'charset' in el.attrib: facts['content_type'] = f'charset={el.attrib.get("charset")}'
+            elif (el.attrib.get('http-equiv') or '').lower() == 'content-type': facts['content_type'] = el.attrib.get('content')
+        else:
+            rel = (el.attrib.get('rel') or '').lower().split()
+            if 'canonical' in rel: facts.setdefault('canonical', el.attrib.get('href'))
+            if 'search' in rel: facts.setdefault('search', el.attrib.get('title'))
+    return facts
+def _get_url(root: ET.Element) -> str | None:
+    for child in (*reversed([*root.itersiblings(ET.Comment, preceding=True)]), *root.itersiblings(ET.Comment)):  # comments around the root element (like xpath('/comment()'), without compiling it)
         comment_text = (child.text or '').strip()
-        m = re.search(r'saved from url=\(\d+\)(\S+)', comment_text)
+        m = _SAVED_FROM.search(comment_text)
         if m: return m.group(1)
-def _get_og_url() -> str | None:
-    for meta in ROOT.iter('meta'):
-        if (meta.attrib.get('property') or '').lower() == 'og:url': return meta.attrib.get('content')
-def _get_canonical_url(url: str) -> str | None:
+def saved_from_url(html: str) -> str | None:
+    '''URL of the "saved from url=" comment of a saved page (without parsing it)'''
+    m = re.search(r'<!--\s*' + _SAVED_FROM.pattern, html[:4096])  # the comment comes before <html>
+    return m.group(1) if m else None
+def _get_canonical_url(url: str, canonical_url: str | None) -> str | None:
     from urllib.parse import urljoin
-    canonical_url = None
-    for link in ROOT.iter('link'):
-        rel = (link.attrib.get('rel') or '').lower().split()
-        if 'canonical' in rel: 
-            canonical_url = link.attrib.get('href')
-            break
     if canonical_url: 
         return urljoin(url, canonical_url) if url else canonical_url
     return url
@@ -75,23 +100,11 @@ def _make_doc_id(url: str) -> str | None:
     url = url.lower().strip()
     if url.endswith('/') and url != '/': url = url[:-1]
     return hashlib.sha256(url.encode('utf-8')).hexdigest()[:16]  # creates deterministic hash-id from URL
-def _get_language() -> str | None:
-    return ROOT.attrib.get('lang')
 def _get_domain(url: str) -> str | None:
     if not url: return None
     from urllib.parse import urlparse
     host = urlparse(url).hostname
     return host.lower() if host else None
-def _get_site() -> str | None:
-    for meta in ROOT.iter('meta'):
-        if (meta.attrib.get('property') or '').lower() == 'og:site_name': return meta.attrib.get('content')
-    for link in ROOT.iter('link'):
-        rel = (link.attrib.get("rel") or "").lower().split()
-        if 'search' in rel: return link.attrib.get('title')
 def _get_fetched_at() -> str | None:
     from datetime import datetime, timezone
     return datetime.now(timezone.utc).isoformat()
-def _get_content_type() -> str | None:
-    for meta in ROOT.iter('meta'):
-        if 'charset' in meta.attrib: return f'charset={meta.attrib.get("charset")}'
-        if (meta.attrib.get('http-equiv') or '').lower() == "content-type": return meta.attrib.get('content')
\ No newline at end of file
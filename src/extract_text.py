@@ -2,17 +2,20 @@ from src.filters.filter_attribute import *  # Attribute-based filters
 from src.filters.filter_class import *  # Class-based filters
 from src.filters.filter_id import *  # ID-based filters
 from src.filters.filter_tag import *  # Tag-based filters
+from src.filters.matcher import skip_class, skip_id, skip_attr_name, skip_attr_value  # compiled SKIP_* matchers
 from src.extract_metadata import extract_metadata  # reuse existing metadata extractor (no reimplementation)
+from src.parse_html import ParsedHTML, parse_html, as_parsed  # one shared parse per page
 from dataclasses import dataclass
-from playwright.sync_api import sync_playwright
-from tkinter.scrolledtext import ScrolledText  # preview textbox with scroll
-from tkinter import ttk  # ttk widgets for nicer UI
+from src import stats  # optional timing/counters
+from src.fetch_cache import FETCH_CACHE, FetchCache, get_fetch_cache  # fetched pages on disk (TTL + revalidation)
+from src.boilerplate import Profile, text_key  # learned per-domain skip profiles
 from pathlib import Path  # path utilities
 from lxml import etree as ET
 from typing import Iterable
-import re, webbrowser, sys, json, tkinter as tk
+import re, sys, json
 
 _WHITESPACE = re.compile(r'\s+')  # regex to match whitespace sequences
+_MARKER_PREFIX = '<<<SECTION: '  # start of a section marker line (parsed again by src/chunking.py)
 
 @dataclass  # simple container for one processed website (what the pipeline will write + chunk)
 class Doc:  # returned objects from the GUI flow into process_html_files.py
@@ -29,31 +32,26 @@ class Node:
     text : str  # extracted text
     lvl : int = 0  # heading level, 0 if not a heading
 
-def _html_to_ET(html: str) -> ET.Element:
-    '''creates a correct working lxml tree'''
-    import html5lib
-    doc = html5lib.parse(html, treebuilder='lxml', namespaceHTMLElements=False)  # parse HTML
-    return doc.getroot()
-
-def _get_blocks(node: ET.Element) -> Iterable[Node]:
+def _get_blocks(node: ET.Element, vis: dict[ET.Element, bool] = None) -> Iterable[Node]:
     '''recursive into lxml tree and extracts text blocks'''
-    if _should_skip_node(node): return
+    if vis is None: vis = _get_visibility(node)  # one filter pass for the whole subtree
+    if not _is_visible(node, vis): return
     tag = _get_tag(node)
     
     if tag == 'table': 
-        table = _get_table(node)
+        table = _get_table(node, vis)
         yield Node(node=node, text=table)
         return  # table already added
                 
     if tag in BLOCK_TAG:  # block-level element
-        if (t := _clear_text(node)): yield Node(node=node, text=t)  # extract cleaned text
+        if (t := _clear_text(node, vis)): yield Node(node=node, text=t)  # extract cleaned text
         return
 
     if node.text and (t := _normalize_whitespace(node.text)):  # text before children
         yield Node(node=node, text=t)  # yield text block
 
     for child in node:  # iterate children
-        yield from _get_blocks(child)  # recursive call
+        yield from _get_blocks(child, vis)  # recursive call
         if child.tail and (t := _normalize_whitespace(child.tail)):  # text after child
             yield Node(node=child, text=t)  # yield text block
 
@@ -62,7 +60,7 @@ def _get_tag(node: ET.Element) -> str:
     if isinstance(node.tag, str): return node.tag.lower()
     else: return ''  # node has no valid tag
 
-def _get_table(node: ET.Element) -> str:
+def _get_table(node: ET.Element, vis: dict[ET.Element, bool] = None) -> str:
     i = 0
     row_txt = ''
     thead = []
@@ -71,18 +69,19 @@ def _get_table(node: ET.Element) -> str:
         if _get_tag(tble_elem) == 'thead':  # get table head
             thead = []
             for t in tble_elem.iter():
-                if _get_tag(t) == 'th' and _clear_text(t): thead.append(t.text.strip())
+                if _get_tag(t) == 'th' and _clear_text(t, vis): thead.append(t.text.strip())
             continue
         if not thead: continue
 
         if _get_tag(tble_elem) == 'tr':
             for t in tble_elem.iter():
                 if _get_tag(t) == 'td':
-                    if not _clear_text(t) or _clear_text(t) == '?': 
+                    cell = _clear_text(t, vis)  # clean the cell once
+                    if not cell or cell == '?': 
                         i += 1
                         continue
                     if i < len(thead): row_txt += thead[i] + ': '
-                    row_txt += _clear_text(t)
+                    row_txt += cell
                     row_txt += '; '
                     i += 1
             if not row_txt: continue
@@ -93,59 +92,124 @@ def _get_table(node: ET.Element) -> str:
             i = 0
     return table.strip()
 
+def _skip_by_tag(tag: str) -> bool: return tag in SKIP_TAG
+def _skip_by_class(attr: dict[str, str]) -> bool:
+    '''checks if any of the classes match the skip criteria'''
+    classes = attr.get('class')
+    return isinstance(classes, str) and skip_class(classes)  # exact / prefix / substring match (cached per value)
+def _skip_by_attr(attr: dict[str, str]) -> bool:
+    '''checks all attributes for skip criteria'''
+    for name, value in attr.items():
+        if isinstance(name, str) and skip_attr_name(name): return True  # exact / prefix / substring match of name
+        if isinstance(value, str) and skip_attr_value(value): return True  # substring match of value
+    hidden = attr.get('aria-hidden')  # special case: aria-hidden = true
+    if isinstance(hidden, str) and hidden.strip().lower() == 'true': return True
+    return False  # no match found
+def _skip_by_id(attr: dict[str, str]) -> bool:
+    '''checks the ID attribute for skip criteria'''
+    id_val = attr.get('id')
+    return bool(id_val) and isinstance(id_val, str) and skip_id(id_val)  # exact / prefix / substring match (cached per value)
+
 def _should_skip_node(node: ET.Element) -> bool:
-    '''determines if a node should be skipped based on filters'''
-    def _skip_by_tag(tag: str) -> bool: return tag in SKIP_TAG
-    def _skip_by_class(attr: dict[str, str]) -> bool:
-        '''checks if any of the classes match the skip criteria'''
-        classes = attr.get('class')
-        if isinstance(classes, str):
-            for c in classes.strip().lower().split():
-                if c in SKIP_CLASS: return True  # exact match
-                if any(c.startswith(p) for p in SKIP_CLASS_PREFIX): return True  # prefix match
-                if any(substr in c for substr in SKIP_CLASS_CONTAINS): return True  # substring match
-        return False  # no match found
-    def _skip_by_attr(attr: dict[str, str]) -> bool:
-        '''checks all attributes for skip criteria'''
-        for name, value in attr.items():
-            if isinstance(name, str): 
-                name = name.strip().lower()
-                if name in SKIP_ATTR: return True  # exact match
-                if any(name.startswith(p) for p in SKIP_ATTR_PREFIX): return True  # prefix match
-                if any(substr in name for substr in SKIP_ATTR_NAME_CONTAINS): return True  # substring match of name
-            if isinstance(value, str):
-                value = value.strip().lower()
-                if any(substr in value for substr in SKIP_ATTR_VALUE_CONTAINS): return True  # substring match of value
-        hidden = attr.get('aria-hidden')  # special case: aria-hidden = true
-        if isinstance(hidden, str) and hidden.strip().lower() == 'true': return True
-        return False  # no match found
-    def _skip_by_id(attr: dict[str, str]) -> bool:
-        '''checks the ID attribute for skip criteria'''
-        id_val = attr.get('id')
-        if id_val and isinstance(id_val, str):
-            id_val = id_val.strip().lower()
-            if id_val in SKIP_ID: return True  # exact match
-            if any(id_val.startswith(p) for p in SKIP_ID_PREFIX): return True  # prefix match
-            if any(substr in id_val for substr in SKIP_ID_CONTAINS): return True  # substring match
-        return False  # no match found
-    
+    '''determines if a node should be skipped based on filters (tables compiled in src/filters/matcher.py)'''
     if not (tag := _get_tag(node)): return  True  # no valid tag found
     attr = node.attrib  # dict of all atrribs
     return (_skip_by_tag(tag) or _skip_by_class(attr) or _skip_by_attr(attr) or _skip_by_id(attr))  # any skip criteria met
 
-def _clear_text(node: ET.Element) -> str:
+def _skip_reason(node: ET.Element) -> str | None:
+    '''which filter table skips the node (same order as _should_skip_node), None if it is kept'''
+    if not (tag := _get_tag(node)): return 'no_tag'  # comments, processing instructions
+    attr = node.attrib
+    if _skip_by_tag(tag): return 'tag'
+    if _skip_by_class(attr): return 'class'
+    if _skip_by_attr(attr): return 'attr'
+    if _skip_by_id(attr): return 'id'
+    return None
+
+def _count_filtered(vis: dict[ET.Element, bool]) -> None:
+    '''stats counters of one visibility pass: elements visited and pruned subtrees per filter table (only if stats are on)'''
+    stats.count('elements_visited', len(vis))
+    for node, visible in vis.items():
+        if not visible: stats.count(f'skipped_{_skip_reason(node) or "profile"}')
+
+def _get_visibility(root: ET.Element, profile: Profile | None = None, parent: str | None = '') -> dict[ET.Element, bool]:
+    '''single pre-pass over the tree: element -> visible, subtrees of pruned elements are not entered (parent: profile path above root)'''
+    vis: dict[ET.Element, bool] = {}
+    if profile is not None and profile.paths and parent is not None: return _get_visibility_profile(root, profile, vis, parent)
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        vis[node] = visible = not _should_skip_node(node)  # the only place the filters run for this tree
+        if visible: stack.extend(node)  # children of pruned nodes are never looked at
+    return vis
+
+def _get_visibility_profile(root: ET.Element, profile: Profile, vis: dict[ET.Element, bool], parent: str = '') -> dict[ET.Element, bool]:
+    '''_get_visibility that also prunes the element paths of a boilerplate profile (paths are only built below profile prefixes)'''
+    stack: list[tuple[ET.Element, str | None]] = [(root, parent)]
+    while stack:
+        node, parent = stack.pop()
+        path = _child_path(parent, node)
+        vis[node] = visible = path not in profile.paths and not _should_skip_node(node)
+        if visible:
+            below = path if path in profile.prefixes else None  # outside every profile path => children need no path
+            stack.extend((child, below) for child in node)
+    return vis
+
+def _child_path(parent: str | None, node: ET.Element) -> str | None:
+    '''profile path of node below the path of its parent ('' = node is the root, None = no profile path can match here)'''
+    if parent is None: return None
+    return f'{parent}/{_path_step(node)}' if parent else _path_step(node)
+
+def _path_step(node: ET.Element) -> str:
+    '''one element of a profile path: tag#id.classes (tokens with digits left out, html/body only by tag: they carry page names)'''
+    tag = _get_tag(node)
+    if tag in ('html', 'body') or not tag: return tag
+    step = tag
+    if (id_val := node.get('id')) and not any(ch.isdigit() for ch in id_val): step += '#' + id_val.strip()
+    classes = sorted(c for c in (node.get('class') or '').split() if not any(ch.isdigit() for ch in c))
+    return step + ''.join('.' + c for c in classes)
+
+def _get_path(node: ET.Element, memo: dict[ET.Element, str]) -> str:
+    '''profile path of any element (memo: element -> path, shared for one tree)'''
+    if node not in memo:
+        parent = node.getparent()
+        memo[node] = f'{_get_path(parent, memo)}/{_path_step(node)}' if parent is not None else _path_step(node)
+    return memo[node]
+
+def _observe_blocks(root: ET.Element) -> list[tuple[str, str, bool]]:
+    '''(element path, text_key, eligible) of every text block of a page, for learning boilerplate profiles (the tree is not modified)'''
+    vis = _get_visibility(root)
+    memo: dict[ET.Element, str] = {}
+    out = []
+    for b in _get_blocks(root, vis):
+        node, eligible = b.node, _get_lvl(b.node) is None  # headings are never boilerplate (they define the sections)
+        own = node.text if _get_tag(node) not in BLOCK_TAG and _get_tag(node) != 'table' else None
+        if own is None and node.tail and _normalize_whitespace(node.tail) == b.text or own is not None and _normalize_whitespace(own) != b.text:
+            node, eligible = node.getparent(), False  # tail text belongs to the parent, which holds other content too
+        if node is None: continue
+        out.append((_get_path(node, memo), text_key(b.text), eligible))
+    return out
+
+def _is_visible(node: ET.Element, vis: dict[ET.Element, bool] | None) -> bool:
+    '''reads the pre-computed visibility (falls back to the filters for nodes below pruned subtrees)'''
+    visible = vis.get(node) if vis is not None else None
+    if visible is None:
+        visible = not _should_skip_node(node)
+        if vis is not None: vis[node] = visible
+    return visible
+
+def _clear_text(node: ET.Element, vis: dict[ET.Element, bool] = None) -> str:
     '''cleans up the text'''
     def _has_linebreak_child(node: ET.Element) -> bool:
         '''checks if there is a linebreak that should be considered'''
-        return any((not _should_skip_node(child)) and (_get_tag(child) in BREAK_TAGS) for child in node)  # any linebreak child
+        return any(_is_visible(child, vis) and (_get_tag(child) in BREAK_TAGS) for child in node)  # any linebreak child
     def _extract_only_text(node: ET.Element) -> Iterable[str]:
         '''extracts only text'''
-        if _should_skip_node(node): return  # skip node
+        if not _is_visible(node, vis): return  # skip node
 
         if node.text: yield node.text  # yield text before children
         for child in node:
-            skip = _should_skip_node(child)  # check if child should be skipped
-            if not skip: yield from _extract_only_text(child)  # recursive call
+            if _is_visible(child, vis): yield from _extract_only_text(child)  # recursive call
             if child.tail: yield child.tail  # yield tail text after child
 
     if not (tag := _get_tag(node)): return ''
@@ -166,18 +230,19 @@ def _normalize_whitespace(text: str, multiline: bool = False) -> str:
         return '\n'.join(line for line in lines if line)  # join non-empty lines
 
 
-def _get_headings(root: ET.Element) -> list[Node]:
+def _get_headings(root: ET.Element, vis: dict[ET.Element, bool] = None) -> list[Node]:
     '''iterates over whole tree and returns all headings'''
+    if vis is None: vis = _get_visibility(root)
     def _iter_visible(node):
         '''yields all visible nodes in the tree'''
-        if _should_skip_node(node): return
+        if not _is_visible(node, vis): return
         yield node
         for child in node: yield from _iter_visible(child)
     headings: list[Node] = []
     for node in _iter_visible(root):  # iterate over all visible nodes
         lvl = _get_lvl(node)
         if lvl is None: continue  # not a heading
-        txt = _clear_text(node)
+        txt = _clear_text(node, vis)
         if not txt: continue  # empty heading
         headings.append(Node(node, txt, lvl))  # add heading
     sect_one_lvl = headings[0].lvl if len(headings) > 0 else 99  # level of first heading
@@ -196,8 +261,8 @@ def _get_lvl(node: ET.Element) -> int | None:
             return int(aria_level.strip())  # return level
     return None  # not a heading
 
-def _get_removal_ranges(all_headings: list[Node], to_remove: list[Node]) -> list[tuple[ET.Element, ET.Element | None]]:
-    '''determines ranges of headings to remove'''
+def _get_removal_ranges(all_headings: list[Node], to_remove: set[Node]) -> list[tuple[ET.Element, ET.Element | None]]:
+    '''determines ranges of headings to remove (sorted, non-overlapping)'''
     ranges: list[tuple[ET.Element, ET.Element | None]] = []  # list of (start, end) tuples
     converted_until = -1 
 
@@ -213,109 +278,201 @@ def _get_removal_ranges(all_headings: list[Node], to_remove: list[Node]) -> list
                 converted_until = j
                 break
         ranges.append((start.node, end))  # add range to list
+        if end is None: break  # rest of the document is removed anyway
 
     return ranges
 
-def _remove_between(start: ET.Element, end: ET.Element | None) -> None:
-    '''removes all nodes between start and end (exclusive)'''
-    root = start.getroottree().getroot()  # get root of the tree
-    nodes = list(root.iter())  # list of all nodes in document order
-
-    if start not in nodes or (end is not None and end not in nodes): return  # nodes not found
-
-    start_idx = nodes.index(start)  # find start index
-    end_idx = nodes.index(end) if end is not None else len(nodes)  # find end index (or end of document)
-    if end is not None and end_idx <= start_idx: return  # invalid range
-
-    protected = set(end.iterancestors()) | {end} if end is not None else set()  # protect end and its ancestors
-
-    for n in reversed(nodes[start_idx:end_idx]):  # iterate in reverse order
-        if n in protected: continue  # skip protected nodes
+def _remove_ranges(root: ET.Element, ranges: list[tuple[ET.Element, ET.Element | None]]) -> None:
+    '''removes all nodes between start and end (exclusive) of every range in one pass over the tree'''
+    nodes = list(root.iter())  # all nodes in document order
+    order = {n: i for i, n in enumerate(nodes)}  # document-order index: element -> position
+    marked: set[ET.Element] = set()  # nodes to remove
+    for start, end in ranges:
+        start_idx = order.get(start)
+        end_idx = order.get(end) if end is not None else len(nodes)  # find end index (or end of document)
+        if start_idx is None or end_idx is None: continue  # nodes not found
+        if end is not None and end_idx <= start_idx: continue  # invalid range
+        protected = set(end.iterancestors()) | {end} if end is not None else set()  # protect end and its ancestors
+        marked.update(n for n in nodes[start_idx:end_idx] if n not in protected)
+
+    for n in reversed(nodes):  # reverse document order, same as removing the ranges back-to-front
+        if n not in marked: continue
         p = n.getparent()
         if p is not None: p.remove(n)  # remove node from parent
 
+_OPEN = ('(', '[', '{')  # opening brackets
+_CLOSE = (')', ']', '}')  # closing brackets
+_SYMBOLS_ONLY = re.compile(r'^[\W_]+$')
+_SPACE_BEFORE_CLOSE = re.compile(r'\s+(?=[)\]},;.:])')
+_SPACE_AFTER_OPEN = re.compile(r'([([{])\s+')
 
 def _merge_lines(text: str) -> str:
     '''merges lines based on simple rules'''
-    _OPEN = ('(', '[', '{')  # opening brackets
-    _CLOSE = (')', ']', '}')  # closing brackets
-    _SYMBOLS_ONLY = re.compile(r'^[\W_]+$')
-    out = []
+    return '\n'.join(_merge_lines_iter(text.splitlines()))
+
+def _merge_lines_iter(lines: Iterable[str]) -> Iterable[str]:
+    '''streaming _merge_lines: yields each merged line as soon as no later line can change it'''
+    pending = None  # lines the punctuation rules may still join (they remove whitespace, newlines included)
+    for ln in _merge_raw_lines(lines):
+        if pending is not None and (pending[-1].isspace() or pending[-1] in '([{' or ln[0].isspace() or ln[0] in ')]},;.:'): pending += '\n' + ln
+        else:
+            if pending is not None: yield from _fix_punctuation(pending).split('\n')
+            pending = ln
+    if pending is not None: yield from _fix_punctuation(pending).split('\n')
+
+def _fix_punctuation(line: str) -> str:
+    line = _SPACE_BEFORE_CLOSE.sub('', line)  # remove space before closing punctuation
+    return _SPACE_AFTER_OPEN.sub(r'\1', line)  # remove space after opening punctuation
+
+def _merge_raw_lines(lines: Iterable[str]) -> Iterable[str]:
+    '''bracket, colon and symbol-only merging; the last line is held back because the next lines may still be appended to it'''
+    last = None  # out[-1] of the list based version
     in_br = False
     br = ''
     add_nxt = False
-    for ln in text.splitlines():  # process line by line
+    for ln in lines:  # process line by line
         if not ln: continue  # skip empty lines
         if in_br:  # inside brackets
             br += ln  # append line to bracket content
-            if ln.endswith(_CLOSE): 
-                out.append(br)
+            if ln.endswith(_CLOSE):
+                if last is not None: yield last
+                last = br
                 in_br = False
                 br = ''  # reset bracket content
             continue
         if ln.endswith(_OPEN):  # line ends with opening bracket
-            prev = out.pop() if out else ''  # get previous line
+            prev, last = last or '', None  # take the previous line into the bracket
             br = (prev + ' ' if prev else '') + ln  # start new bracket content
             in_br = True
-            continue            
+            continue
         if add_nxt:  # append to previous line
-            out[-1] += ' ' + ln
+            last += ' ' + ln
             add_nxt = False
             continue
-        if _SYMBOLS_ONLY.match(ln) and out:  # line with only symbols
-            out[-1] += ln
+        if _SYMBOLS_ONLY.match(ln) and last is not None:  # line with only symbols
+            last += ln
             add_nxt = True
-        else: out.append(ln)  # normal line
+        else:  # normal line
+            if last is not None: yield last
+            last = ln
         if ln.endswith(':'): add_nxt = True
-        
-    if in_br: out.append(br)
-    merged = '\n'.join(out)  # join lines
-    merged = re.sub(r'\s+(?=[)\]},;.:])', '', merged)  # remove space before closing punctuation
-    merged = re.sub(r'([([{])\s+', r'\1', merged)  # remove space after opening punctuation
-    return merged
+    if last is not None: yield last
+    if in_br: yield br
 
 
-def _insert_section_markers(root: ET.Element) -> None:
+def _insert_section_markers(root: ET.Element, vis: dict[ET.Element, bool] = None, headings: list[Node] = None) -> None:
     '''inserts section markers into the tree'''
-    headings = _get_headings(root)
+    if headings is None: headings = _get_headings(root, vis)
     for h in headings:
-        h.node.text = f'<<<SECTION: {h.text}; level: {h.lvl}>>>'  # insert marker
-
-
-
+        h.node.text = f'{_MARKER_PREFIX}{h.text}; level: {h.lvl}>>>'  # insert marker
+
+def _section_keys(heads: list[Node]) -> list[str]:
+    '''stable checkbox labels/keys (also the keys of section_state.json)'''
+    return [f"{i+1}. {h.text.strip()} (lvl: {h.lvl})" for i, h in enumerate(heads)]
+
+def _get_section_blocks(html: str | ParsedHTML) -> tuple[list[Node], list[list[str]] | None]:
+    '''renders every section once and groups the block texts by section (None if blocks can't be mapped to sections)'''
+    root = as_parsed(html).clone()
+    vis = _get_visibility(root)
+    heads = _get_headings(root, vis)
+    _insert_section_markers(root, vis, heads)
+    wrappers = {a for h in heads[1:] for a in h.node.iterancestors()}  # their text/tail is kept or removed with the wrapper (protected ancestors), not with its section
+    sections: list[list[str]] = []
+    for block in _get_blocks(root, vis):
+        if block.text.startswith(_MARKER_PREFIX): sections.append([])  # heading block opens the next section
+        elif not sections or block.node in wrappers: return heads, None  # text before the intro marker or loose text around a heading
+        sections[-1].append(block.text)
+    return heads, (sections if len(sections) == len(heads) else None)  # e.g. heading nested in a <p> => no clean split
+
+def _render_sections(heads: list[Node], sections: list[list[str]], state: dict[str, bool] = None) -> str:
+    '''assembles the text of the kept sections from _get_section_blocks (same removal rules, no tree work)'''
+    keys = _section_keys(heads)
+    pos = {h.node: i for i, h in enumerate(heads)}  # heading element -> section index
+    to_remove = {heads[i] for i, k in enumerate(keys) if not (state or {}).get(k, True)}
+    removed: set[int] = set()
+    for start, end in _get_removal_ranges(heads, to_remove): removed.update(range(pos[start], pos[end] if end is not None else len(heads)))
+    kept = [i for i in range(1, len(sections)) if i not in removed]
+    lvl = heads[kept[0]].lvl if kept else 99  # the Intro marker sits on the root and always gets the level of the first kept heading
+    lines = [f'{_MARKER_PREFIX}{heads[0].text}; level: {lvl}>>>']
+    if 0 not in removed: lines += sections[0][1:]  # intro text without its old marker
+    lines += [b for i in kept for b in sections[i]]
+    return _merge_lines('\n'.join(lines))
+
+
+
+
+_WIN_RESERVED = {  # these stuff cant be in name for dictionary or file on windows
+    "CON","PRN","AUX","NUL",
+    *(f"COM{i}" for i in range(1,10)),
+    *(f"LPT{i}" for i in range(1,10)),
+}
+def _safe_windows_name(name: str, fallback: str = "untitled") -> str:
+    name = re.sub(r'[<>:"/\\|?*\x00-\x1F]', "_", name)  # remove forbidden chars
+    name = name.strip().strip(" .")  # remove dot at end
+    name = re.sub(r"\s+", " ", name)  # remove whitespace
+    if name.upper() in _WIN_RESERVED: name = "_" + name  # avoid reserved names
+    name = name[:80].rstrip(" .")  # shorten if too long
+    return name or fallback
 
 def download_html(url: str, ROOT: str):  # download a page without writing anything to disk (Abort must not write)
-    _WIN_RESERVED = {  # these stuff cant be in name for dictionary or file on windows
-        "CON","PRN","AUX","NUL",
-        *(f"COM{i}" for i in range(1,10)),
-        *(f"LPT{i}" for i in range(1,10)),
-    }
-    def safe_windows_name(name: str, fallback: str = "untitled") -> str:
-        name = re.sub(r'[<>:"/\\|?*\x00-\x1F]', "_", name)  # remove forbidden chars
-        name = name.strip().strip(" .")  # remove dot at end
-        name = re.sub(r"\s+", " ", name)  # remove whitespace
-        if name.upper() in _WIN_RESERVED: name = "_" + name  # avoid reserved names
-        name = name[:80].rstrip(" .")  # shorten if too long
-        return name or fallback
-    
-    html, title = _load_cached_raw(url, ROOT)
-    if html: return html, title
-    
+    return download_many([url], ROOT)[0]
+
+@stats.timed('fetch')
+def download_many(urls: list[str], ROOT: str, skip_errors: bool = False) -> list[tuple[str, str]]:  # exported pages, fetch cache, plain HTTP, then browser loads (concurrently)
+    from src.fetcher import HTTP_FIRST, get_fetcher, fetch_static_many  # plain HTTP first, one shared browser per run (asyncio/ssl only load when pages are downloaded)
     global _PROJECT_ROOT; _PROJECT_ROOT = ROOT  # store project root for this module (paths/state)
-    with sync_playwright() as p:  # open playwright session
-        browser = p.chromium.launch(channel="msedge", headless=True)  # start headless browser (same as before)
-        page = browser.new_page()  # create a new page/tab
-        page.goto(url, wait_until="networkidle")  # load URL and wait until network is idle
-        title = safe_windows_name(page.title())  # use document title
-        html = page.content()  # get full HTML
-        browser.close()  # close browser to free resources
-    return html, title  # return in-memory only (no disk write here)
+    cache = get_fetch_cache(ROOT) if FETCH_CACHE else None
+    out = [_load_cached(url, ROOT, cache) for url in urls]
+    stale = {i: e for i, url in enumerate(urls) if not out[i][0] and cache and (e := cache.get(url)) and (e['etag'] or e['last_modified'])}  # ask the server if they changed
+    try:
+        missing = [i for i, (html, _) in enumerate(out) if not html]
+        stats.count('pages_cached', len(urls) - len(missing))
+        if missing and HTTP_FIRST:
+            validators = [(stale[i]['etag'], stale[i]['last_modified']) if i in stale else (None, None) for i in missing]
+            for i, page in zip(missing, fetch_static_many([urls[i] for i in missing], validators)):  # cheap keep-alive GETs, None if the page needs JavaScript
+                if page is None: continue
+                if page.not_modified:  # 304 => reuse the cached body
+                    if (html := cache.load(stale[i])) is None: continue
+                    cache.touch(urls[i], page.etag, page.last_modified)
+                    out[i] = (html, stale[i]['title'])
+                    stats.count('pages_not_modified')
+                    continue
+                out[i] = (page.html, _safe_windows_name(page.title))
+                stats.count('pages_http')
+                if cache: cache.put(urls[i], page.html, out[i][1], 'http', page.etag, page.last_modified)
+            missing = [i for i in missing if not out[i][0]]  # only these need the browser
+        if not missing: return out
+        stats.count('pages_browser', len(missing))
+        try: results = get_fetcher().fetch_many([urls[i] for i in missing])  # browser (shared pool or one launch per page, see fetcher.BROWSER_POOL), waits until network is idle
+        except Exception:
+            if not skip_errors: raise
+            results = [RuntimeError('browser not available')] * len(missing)
+        for i, res in zip(missing, results):
+            if isinstance(res, BaseException):
+                if skip_errors: continue  # crawl: the page stays ('', '')
+                raise res  # a failed download stops the run (pages fetched so far stay cached)
+            out[i] = (res[0], _safe_windows_name(res[1]))
+            if cache: cache.put(urls[i], res[0], out[i][1], 'browser')
+        return out
+    finally:
+        if cache: cache.save()  # one index write per batch
+
+def _load_cached(url: str, ROOT: str, cache: FetchCache | None = None) -> tuple[str, str]:  # no download: exported raw page, else a fresh fetch cache entry
+    html, title = _load_cached_raw(url, ROOT)
+    if html or cache is None: return html, title
+    entry = cache.get(url)
+    if entry and cache.is_fresh(entry) and (html := cache.load(entry)) is not None: return html, entry['title']
+    return '', ''
+
+_STATE_CACHE: dict[Path, tuple[int, dict]] = {}  # section_state.json path -> (mtime_ns, parsed JSON)
 
 def _load_cached_raw(url: str, ROOT: str) -> tuple[str, str]:
     state_path = Path(ROOT) / "config/section_state.json"
-    if not state_path.exists(): return "", ""
-    data = json.loads(state_path.read_text(encoding="utf-8") or "{}")
-    entry = data.get(url, {})
+    try: mtime = state_path.stat().st_mtime_ns
+    except OSError: return "", ""
+    if _STATE_CACHE.get(state_path, (None,))[0] != mtime:  # parse the JSON only when the file changed (not per URL)
+        _STATE_CACHE[state_path] = (mtime, json.loads(state_path.read_text(encoding="utf-8") or "{}"))
+    entry = _STATE_CACHE[state_path][1].get(url, {})
     if not isinstance(entry, dict): return "", ""
     title = entry.get("title", "")
     if title:
@@ -324,22 +481,33 @@ def _load_cached_raw(url: str, ROOT: str) -> tuple[str, str]:
         else: return '', ''
     return '', ''
 
-def _render_with_state(html: str, state: dict[str, bool] = None) -> str:  # render plaintext while removing unchecked sections
-    root = _html_to_ET(html)  # parse HTML to lxml tree (fresh tree each time so we can safely modify)
-    heads = _get_headings(root)  # compute headings list
-    keys = [f"{i+1}. {h.text.strip()} (lvl: {h.lvl})" for i, h in enumerate(heads)]  # stable checkbox labels/keys
-    if state is not None: 
-        to_remove = [heads[i] for i, k in enumerate(keys) if not state.get(k, True)]  # collect headings that are unchecked => remove
-        ranges = _get_removal_ranges(heads, to_remove)  # convert headings to (start,end) removal ranges
-        for start, end in reversed(ranges): _remove_between(start, end)  # remove ranges back-to-front to keep indices stable
-        if keys and not state.get(keys[0], True): root.text = ''  # Intro unchecked => remove marker stored on root element
-    _insert_section_markers(root)  # insert SECTION markers AFTER removal so chunking sees only kept sections
-    raw = '\n'.join(block.text for block in _get_blocks(root))  # extract blocks from modified tree
-    return _merge_lines(raw)  # merge/clean lines like in your normal pipeline
-
-
-def process_multiple_docs(base_url: str, base_html: str, title: str, extracted_urls: list[tuple[str, int]], chunk_template, ROOT: str, SILENT: bool) -> list[Doc]:  # GUI that selects websites + sections and returns Docs
-    if SILENT: return [Doc(base_url, title, base_html, _render_with_state(base_html), chunk_template, state=None)]
+def _render_with_state(html: str | ParsedHTML, state: dict[str, bool] = None, profile: Profile | None = None) -> str:  # render plaintext while removing unchecked sections
+    with stats.stage('clone'): root = as_parsed(html).clone()  # private copy of the shared tree (no re-parse) so we can safely modify it
+    with stats.stage('filter'): vis = _get_visibility(root, profile)  # filters (+ boilerplate profile paths) run once here, every traversal below reads the result
+    if stats.ENABLED: _count_filtered(vis)
+    with stats.stage('sections'):
+        heads = _get_headings(root, vis)  # compute headings list
+        keys = _section_keys(heads)  # stable checkbox labels/keys
+        if state is not None: 
+            to_remove = {heads[i] for i, k in enumerate(keys) if not state.get(k, True)}  # collect headings that are unchecked => remove
+            ranges = _get_removal_ranges(heads, to_remove)  # convert headings to (start,end) removal ranges
+            _remove_ranges(root, ranges)  # remove all ranges in one pass over the tree
+            if keys and not state.get(keys[0], True): root.text = ''  # Intro unchecked => remove marker stored on root element
+        _insert_section_markers(root, vis)  # insert SECTION markers AFTER removal so chunking sees only kept sections
+    with stats.stage('blocks'):
+        blocks = [block.text for block in _get_blocks(root, vis)]  # extract blocks from modified tree
+        if profile is not None and profile.texts: blocks = [b for b in blocks if not profile.skip_text(b)]  # repeated texts of the site
+    stats.count('headings', len(heads))
+    stats.count('blocks', len(blocks))
+    with stats.stage('merge'): return _merge_lines('\n'.join(blocks))  # merge/clean lines like in your normal pipeline
+
+
+def process_multiple_docs(base_url: str, base_html: str | ParsedHTML, title: str, extracted_urls: list[tuple[str, int]], chunk_template, ROOT: str, SILENT: bool, profile: Profile | None = None) -> list[Doc]:  # GUI that selects websites + sections and returns Docs (profile: SILENT only)
+    base_html = as_parsed(base_html)  # base page is parsed once and shared with every render below
+    if SILENT: return [Doc(base_url, title, base_html.html, _render_with_state(base_html, profile=profile), chunk_template, state=None)]
+    from tkinter.scrolledtext import ScrolledText  # preview textbox with scroll (GUI modules only load when the GUI opens)
+    from tkinter import ttk  # ttk widgets for nicer UI
+    import tkinter as tk, webbrowser
     win = tk.Tk()  # Root-Fenster sofort erstellen, damit tk.*Var später erlaubt ist
     win.title(f"Websites & Sections - {title}")  # Titel setzen
     win.geometry("1400x800")  # Startgröße setzen
@@ -368,17 +536,17 @@ def process_multiple_docs(base_url: str, base_html: str, title: str, extracted_u
         md = meta.get("metadata", {}) if isinstance(meta, dict) else {}  # metadata sub-dict
         return (md.get("canonical_url") or md.get("url") or url)  # canonical best, url fallback
 
-    def init_site(url: str, html: str, title: str, meta: dict) -> None:  # initialize one site entry after download
-        root = _html_to_ET(html)  # parse HTML so we can compute headings for the checkbox list
-        heads = _get_headings(root)  # compute headings list for this HTML
-        keys = [f"{i+1}. {h.text.strip()} (lvl: {h.lvl})" for i, h in enumerate(heads)]  # make the same keys used in the old dialog
+    def init_site(url: str, html: str | ParsedHTML, title: str, meta: dict) -> None:  # initialize one site entry after download
+        html = as_parsed(html)  # parse once, the OK render clones this tree
+        heads, sections = _get_section_blocks(html)  # render once and group blocks by section => toggles only re-assemble text
+        keys = _section_keys(heads)  # make the same keys used in the old dialog
         key = state_key(meta, url)  # compute stable JSON key for this page
         init = load_state(url, keys)  # load old state or default to all True
         vars_ = {k: tk.IntVar(master=win, value=(1 if init[k] else 0)) for k in keys}  # 1=checked, 0=unchecked (kein mixed state)
-        sites[url] = {"dl": True, "save": True, "html": html, "title": title, "meta": meta, "key": key, "vars": vars_, "keys": keys}  # store everything for this site
+        sites[url] = {"dl": True, "save": True, "html": html.html, "parsed": html, "heads": heads, "sections": sections, "title": title, "meta": meta, "key": key, "vars": vars_, "keys": keys}  # store everything for this site
 
     urls = list(dict.fromkeys([base_url] + [u for u, _ in extracted_urls]))  # unique URL list: base first, then extracted (keep order)
-    sites = {u: {"dl": False, "save": False, "html": "", "title": "", "meta": None, "key": u, "vars": {}, "keys": []} for u in urls}  # in-memory cache per URL
+    sites = {u: {"dl": False, "save": False, "html": "", "parsed": None, "heads": [], "sections": None, "title": "", "meta": None, "key": u, "vars": {}, "keys": []} for u in urls}  # in-memory cache per URL
     init_site(base_url, base_html, title, chunk_template)  # base site is already downloaded by pipeline => init now (loads old state)
 
     main = ttk.PanedWindow(win, orient="horizontal")  # 3-column layout: websites | sections | preview
@@ -458,7 +626,9 @@ def process_multiple_docs(base_url: str, base_html: str, title: str, extracted_u
     def render_preview(*_) -> None:  # recompute preview text for current URL whenever something changes
         url = current_url()  # which URL is active in the UI
         if not sites[url]["dl"]: return set_preview("")  # not downloaded => empty preview
-        return set_preview(_render_with_state(sites[url]["html"], current_state(url)))  # render text after removing unchecked sections
+        info = sites[url]
+        if info["sections"] is not None: return set_preview(_render_sections(info["heads"], info["sections"], current_state(url)))  # join kept sections (ms)
+        return set_preview(_render_with_state(info["parsed"], current_state(url)))  # fallback: render text after removing unchecked sections
 
     def rebuild_sections() -> None:  # rebuild the middle pane (section checkbox list) for the current URL
         for w in sect_frame.winfo_children(): w.destroy()  # clear old checkboxes
@@ -475,8 +645,10 @@ def process_multiple_docs(base_url: str, base_html: str, title: str, extracted_u
         url = urls[sel[0]]  # map listbox index back to URL (same order as insertion)
         selected.set(url)  # update selected URL variable
         if not sites[url]["dl"]:  # not loaded in RAM yet
-            html, title = _load_cached_raw(url, ROOT)  # try disk cache ONLY (no download)
-            if html: init_site(url, html, title, extract_metadata(html))  # if cached => load + build section vars
+            html, title = _load_cached(url, ROOT, get_fetch_cache(ROOT) if FETCH_CACHE else None)  # try disk caches ONLY (no download)
+            if html: 
+                parsed = parse_html(html)  # parse once for metadata + sections + preview
+                init_site(url, parsed, title, extract_metadata(parsed))  # if cached => load + build section vars
             save_var.set(False)  # optional: beim Nicht-Download Häkchen rausnehmen
         save_cb.configure(state=("normal" if sites[url]["dl"] else "disabled"))  # grau wenn nicht downloaded
 
@@ -491,7 +663,8 @@ def process_multiple_docs(base_url: str, base_html: str, title: str, extracted_u
         url = current_url()  # current website URL
         if sites[url]["dl"]: return  # already downloaded => do nothing
         html, title = download_html(url, ROOT)  # download (no disk write)
-        init_site(url, html, title, extract_metadata(html))  # compute headings, load old state, mark save=True
+        parsed = parse_html(html)  # parse once for metadata + sections + preview
+        init_site(url, parsed, title, extract_metadata(parsed))  # compute headings, load old state, mark save=True
         save_var.set(True)  # requirement: downloading auto-enables saving for this website
         save_cb.configure(state="normal")  # nach Download wieder aktiv
         recolor_sites()
@@ -502,15 +675,15 @@ def process_multiple_docs(base_url: str, base_html: str, title: str, extracted_u
         if sel: webbrowser.open_new_tab(urls[sel[0]])
 
     def on_ok() -> None:  # OK button: for all marked websites -> save state + return docs
+        todo = [url for url, info in sites.items() if info["save"] and not info["dl"]]  # marked but never downloaded manually
+        for url, (html, title) in zip(todo, download_many(todo, ROOT)):  # download them now, concurrently
+            parsed = parse_html(html)  # parse once for metadata + rendering
+            init_site(url, parsed, title, extract_metadata(parsed))  # initialize cache (state loaded, save forced true)
         for url, info in sites.items():  # iterate through all known URLs
             if not info["save"]: continue  # only process websites that are marked for saving
-            if not info["dl"]:  # if user marked a site but never downloaded it manually
-                html, title = download_html(url, ROOT)  # download it now so we can process it
-                init_site(url, html, title, extract_metadata(html))  # initialize cache (state loaded, save forced true)
-                info = sites[url]  # refresh local reference after init_site overwrote the dict
             state = current_state(url)  # grab final section checkbox state from UI vars
             save_state(url, info['title'], state)  # requirement: store state on OK per marked website
-            txt = _render_with_state(info["html"], state)  # render final text for this website with selected sections
+            txt = _render_with_state(info["parsed"], state)  # render final text for this website with selected sections
             result_docs.append(Doc(url=url, title=info["title"], html=info["html"], text=txt, metadata=info["meta"], state=state))  # create output object for pipeline
         win.destroy()  # close window and return to pipeline (next getURLs.txt window opens)
 
@@ -1,5 +1,7 @@
-from bs4 import BeautifulSoup
+from src import stats
 
+@stats.timed('bs4')
 def extract_text_via_bs4(html: str) -> str:
+    from bs4 import BeautifulSoup  # heavy import (soupsieve, html5lib builder), only when the BS4 text is made
     soup = BeautifulSoup(html)
     return soup.get_text(" ", strip=True)
\ No newline at end of file
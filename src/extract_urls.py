@@ -1,15 +1,54 @@
+from src.parse_html import ParsedHTML, as_parsed
+from src import stats
 from collections import Counter
-import re
+from urllib.parse import urljoin, urlsplit, urlunsplit
+import posixpath, re
 
-def extract_urls(metadata: dict[dict[str]], html: str) -> list[tuple[str, int]]:
-    hrefs: list[str] = re.findall(r'href=["\']([^"\']+)["\']', html, flags=re.I)
-    domain = metadata.get('domain')
+_DEFAULT_PORTS = {'http': 80, 'https': 443}
+_TRACKING_PARAM = re.compile(r'utm_\w+|gclid|fbclid|mc_eid', re.I)  # query parameters that never change the page
+_PCT_ESCAPE = re.compile(r'%[0-9a-fA-F]{2}')
+
+SKIP_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif', '.svg', '.webp', '.ico', '.bmp', '.tif', '.tiff', '.css', '.pdf', '.zip', '.gz', '.tgz', '.bz2', '.xz', '.7z', '.rar',
+                   '.mp3', '.mp4', '.m4a', '.ogg', '.oga', '.ogv', '.webm', '.wav', '.avi', '.mov', '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx', '.exe', '.dmg',
+                   '.woff', '.woff2', '.ttf', '.xml', '.rss', '.json'}  # link targets that are not HTML documents (.js is missing on purpose: article names like Node.js)
+DOCUMENT_TYPES = ('text/html', 'application/xhtml+xml')  # <a type="..."> hints that still lead to a document
+
+def normalize_url(url: str) -> str:
+    '''canonical form of an absolute URL (cache keys, visited sets): lowercase scheme/host, no default port, no trailing slash, no fragment, sorted query without tracking parameters'''
+    p = urlsplit(url.strip())
+    scheme, host = p.scheme.lower(), (p.hostname or '').lower()
+    if ':' in host: host = f'[{host}]'  # IPv6 literal: hostname drops the brackets
+    try: port = p.port
+    except ValueError: port = None  # invalid port => drop it
+    netloc = host if port in (None, _DEFAULT_PORTS.get(scheme)) else f'{host}:{port}'
+    if p.username: netloc = p.netloc.rpartition('@')[0] + '@' + netloc  # keep credentials as they are
+    path = _PCT_ESCAPE.sub(lambda m: m.group(0).upper(), p.path).rstrip('/') or '/'  # /a/ and /a are one page
+    query = '&'.join(sorted((q for q in p.query.split('&') if q and not _TRACKING_PARAM.fullmatch(q.partition('=')[0])), key=lambda q: q.partition('=')))  # raw pairs, not re-encoded: ?print stays ?print, %20 stays %20
+    return urlunsplit((scheme, netloc, path, query, ''))
+
+@stats.timed('urls')
+def extract_urls(metadata: dict[dict[str]], html: str | ParsedHTML, page_url: str | None = None) -> list[tuple[str, int]]:
+    '''document links of the page (a[href]) as absolute normalized URLs with their count, most frequent first'''
+    parsed = as_parsed(html)
+    anchors = parsed.anchors()  # (href, type) from the shared tree (entities already decoded)
+    stats.count('links', len(anchors))
+    base = _base_url(parsed, page_url or metadata.get('canonical_url'))  # the fetched URL, canonical for saved pages
+    own = normalize_url(base) if base else None
     out = []
-    for h in hrefs:
-        if h.startswith('#'): continue
-        if h.endswith('png') or h.endswith('css'): continue
-        
-        if h.startswith('//'): h = 'https:' + h
-        if h.startswith('/'): h = 'https://' + domain + h
-        out.append(h)
-    return Counter(out).most_common()
\ No newline at end of file
+    for href, mime in anchors:
+        if href.startswith('#'): continue  # same page
+        if mime and not mime.lower().startswith(DOCUMENT_TYPES): continue
+        url = urljoin(base, href) if base else href  # no base => only absolute links can be resolved
+        p = urlsplit(url)
+        if p.scheme not in ('http', 'https') or not p.hostname: continue  # mailto:, javascript:, relative without base
+        if posixpath.splitext(p.path)[1].lower() in SKIP_EXTENSIONS: continue
+        url = normalize_url(url)
+        if url != own: out.append(url)
+    return Counter(out).most_common()
+
+def _base_url(parsed: ParsedHTML, doc_url: str | None) -> str | None:
+    '''<base href> (resolved against the document URL) or the document URL itself'''
+    for base in parsed.root.iter('base'):
+        href = (base.get('href') or '').strip()
+        if href: return urljoin(doc_url, href) if doc_url else href
+    return doc_url
@@ -0,0 +1,124 @@
+'''disk cache of fetched pages: an index keyed by normalized URL plus gzip compressed bodies stored by content hash
+
+usage: python -m src.fetch_cache list [substring]
+       python -m src.fetch_cache remove <url or substring>...
+       python -m src.fetch_cache expire      (drop entries older than CACHE_TTL)
+       python -m src.fetch_cache clear
+'''
+from src.extract_urls import normalize_url
+from pathlib import Path
+import gzip, hashlib, json, os, sys, threading, time
+
+FETCH_CACHE = True  # False => always fetch (the exported data/<title>/<title>_raw.html pages are still reused)
+CACHE_DIR = 'cache/fetch'  # relative to the project root
+CACHE_TTL = 24 * 3600  # seconds a cached page is used without asking the server again
+
+class FetchCache:  # index.json (normalized URL -> entry) + bodies/<hash[:2]>/<hash>.html.gz
+    def __init__(self, folder: str | Path, ttl: float = CACHE_TTL):
+        self.folder = Path(folder)
+        self.ttl = ttl
+        self._index_path = self.folder / 'index.json'
+        self._index: dict[str, dict[str, any]] = json.loads(self._index_path.read_text(encoding='utf-8')) if self._index_path.exists() else {}  # read once
+        self._lock = threading.Lock()
+        self._dirty = False
+
+    def get(self, url: str) -> dict[str, any] | None:
+        '''index entry of url (url, title, hash, fetched, etag, last_modified, source) or None'''
+        return self._index.get(normalize_url(url))
+
+    def is_fresh(self, entry: dict[str, any]) -> bool: return time.time() - entry['fetched'] < self.ttl
+
+    def load(self, entry: dict[str, any]) -> str | None:
+        '''cached HTML of an entry, None if the body file is gone'''
+        try: return gzip.decompress(self._body_path(entry['hash']).read_bytes()).decode('utf-8')
+        except (OSError, EOFError): return None
+
+    def put(self, url: str, html: str, title: str, source: str, etag: str | None = None, last_modified: str | None = None) -> None:
+        '''stores a fetched page (same body => same file, only the index entry is new)'''
+        data = html.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._body_path(digest)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            _write_atomic(path, gzip.compress(data, compresslevel=6))
+        with self._lock:
+            old = self._index.get(key := normalize_url(url))
+            self._index[key] = {'url': url, 'title': title, 'hash': digest, 'size': len(data), 'fetched': time.time(), 'etag': etag, 'last_modified': last_modified, 'source': source}
+            self._dirty = True
+        if old and old['hash'] != digest: self._drop_body(old['hash'])
+
+    def touch(self, url: str, etag: str | None = None, last_modified: str | None = None) -> None:
+        '''marks an entry as fetched now (the server answered 304 Not Modified)'''
+        with self._lock:
+            entry = self._index[normalize_url(url)]
+            entry['fetched'] = time.time()
+            entry['etag'] = etag or entry.get('etag')
+            entry['last_modified'] = last_modified or entry.get('last_modified')
+            self._dirty = True
+
+    def entries(self, pattern: str = '') -> list[dict[str, any]]: return [e for k, e in self._index.items() if pattern in k or pattern in e['url']]
+
+    def remove(self, url: str) -> bool:
+        with self._lock:
+            entry = self._index.pop(normalize_url(url), None)
+            self._dirty |= entry is not None
+        if entry: self._drop_body(entry['hash'])
+        return entry is not None
+
+    def expire(self) -> int:
+        '''removes all entries older than the TTL'''
+        stale = [e['url'] for e in self._index.values() if not self.is_fresh(e)]
+        for url in stale: self.remove(url)
+        return len(stale)
+
+    def save(self) -> None:
+        '''writes the index (once per batch, not per page)'''
+        with self._lock:
+            if not self._dirty: return
+            self.folder.mkdir(parents=True, exist_ok=True)
+            _write_atomic(self._index_path, json.dumps(self._index, ensure_ascii=False, indent=1).encode('utf-8'))
+            self._dirty = False
+
+    def _body_path(self, digest: str) -> Path: return self.folder / 'bodies' / digest[:2] / f'{digest}.html.gz'
+
+    def _drop_body(self, digest: str) -> None:
+        if any(e['hash'] == digest for e in self._index.values()): return  # still used by another URL
+        self._body_path(digest).unlink(missing_ok=True)
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    '''write to a temp file + rename, so an interrupted run never leaves a half written file'''
+    tmp = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+_CACHES: dict[Path, FetchCache] = {}
+
+def get_fetch_cache(ROOT: str | Path) -> FetchCache:
+    '''one cache object per project root (the index is read once per process)'''
+    folder = Path(ROOT) / CACHE_DIR
+    if folder not in _CACHES: _CACHES[folder] = FetchCache(folder)
+    return _CACHES[folder]
+
+def main(args: list[str]) -> int:
+    cache = get_fetch_cache(Path(__file__).resolve().parents[1])
+    cmd, rest = (args[0], args[1:]) if args else ('list', [])
+    if cmd == 'list':
+        entries = cache.entries(rest[0] if rest else '')
+        for e in sorted(entries, key=lambda e: e['fetched']):
+            age = (time.time() - e['fetched']) / 3600
+            print(f"{'fresh' if cache.is_fresh(e) else 'stale'} {age:7.1f}h {e['size'] / 1e3:8.1f} KB {e['source']:<7} {e['url']}")
+        print(f'{len(entries)} entries')
+    elif cmd == 'remove':
+        urls = [e['url'] for pattern in rest for e in cache.entries(pattern)]
+        for url in urls: cache.remove(url)
+        print(f'{len(urls)} entries removed')
+    elif cmd == 'expire': print(f'{cache.expire()} stale entries removed')
+    elif cmd == 'clear': print(f"{sum(cache.remove(e['url']) for e in cache.entries())} entries removed")
+    else:
+        print(__doc__)
+        return 1
+    cache.save()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
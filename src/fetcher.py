@@ -0,0 +1,205 @@
+from src.parse_html import _html_to_ET
+from urllib.parse import urlparse
+from dataclasses import dataclass
+import asyncio, atexit, threading, re
+
+BROWSER_CHANNEL = 'msedge'  # installed browser channel (None => playwright's bundled chromium)
+BROWSER_PATH = None  # executable of an installed Chromium/Chrome/Edge, used instead of BROWSER_CHANNEL (None => channel)
+FETCH_CONCURRENCY = 4  # pages loaded at the same time (= size of the page pool)
+FETCH_TIMEOUT = 60.0  # seconds per page load
+BROWSER_POOL = True  # True: one shared browser with a pool of pages, loads run concurrently (BrowserFetcher) | False: one browser launch per page (the previous sync fetcher)
+HTTP_FIRST = True  # try a plain HTTP GET first, only pages that fail is_complete_page() go to the browser
+MIN_STATIC_WORDS = 150  # visible words (after the filters) a plain HTTP page needs to skip the browser
+STATIC_DOMAINS = {'wikipedia.org'}  # always plain HTTP (host or parent domain)
+BROWSER_DOMAINS: set[str] = set()  # always the browser (host or parent domain)
+_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36 Edg/126.0.0.0'
+_META_CHARSET = re.compile(rb'<meta[^>]+charset=["\']?([\w-]+)', re.I)
+
+class BrowserFetcher:  # launches the browser once and reuses contexts/pages from a pool (asyncio)
+    def __init__(self, concurrency: int = FETCH_CONCURRENCY, timeout: float = FETCH_TIMEOUT, channel: str | None = BROWSER_CHANNEL, wait_until: str = 'networkidle',
+                 executable: str | None = BROWSER_PATH):
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.channel = channel
+        self.executable = executable
+        self.wait_until = wait_until
+        self._pw = self._browser = self._pages = None
+
+    async def start(self) -> 'BrowserFetcher':
+        from playwright.async_api import async_playwright  # heavy import, only when a browser is really needed
+        self._pw = await async_playwright().start()
+        self._browser = await self._pw.chromium.launch(**_launch_args(self.channel, self.executable))  # the only browser start of the run
+        self._pages = asyncio.Queue()  # idle pages; the queue also limits the concurrency
+        for _ in range(self.concurrency):
+            context = await self._browser.new_context()  # own cookies/cache per pool slot
+            self._pages.put_nowait(await context.new_page())
+        return self
+
+    async def close(self) -> None:
+        if self._browser: await self._browser.close()
+        if self._pw: await self._pw.stop()
+        self._pw = self._browser = self._pages = None
+
+    async def fetch(self, url: str) -> tuple[str, str]:
+        '''loads one URL on a pooled page and returns (html, document title)'''
+        page = await self._pages.get()  # waits while all pages are busy
+        try:
+            await asyncio.wait_for(page.goto(url, wait_until=self.wait_until, timeout=self.timeout * 1000), self.timeout + 5)
+            title = await page.title()
+            return await page.content(), title
+        except BaseException:
+            page = await self._fresh_page(page)  # never reuse a page that is stuck in a failed load
+            raise
+        finally: self._pages.put_nowait(page)
+
+    async def fetch_many(self, urls: list[str]) -> list[tuple[str, str] | Exception]:
+        '''fetches all URLs concurrently (at most `concurrency` at once), results in input order'''
+        return await asyncio.gather(*(self.fetch(u) for u in urls), return_exceptions=True)
+
+    async def _fresh_page(self, page):
+        context = page.context
+        try: await page.close()
+        except Exception: pass
+        return await context.new_page()
+
+    async def __aenter__(self): return await self.start()
+    async def __aexit__(self, *exc): await self.close()
+
+def _launch_args(channel: str | None, executable: str | None) -> dict[str, any]:
+    return {'executable_path': executable, 'headless': True} if executable else {'channel': channel, 'headless': True}
+
+class SyncBrowserFetcher:  # BrowserFetcher on a background event loop, so the sync pipeline/GUI can share one browser
+    def __init__(self, **kwargs):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='browser-fetcher', daemon=True)
+        self._thread.start()
+        self._fetcher = BrowserFetcher(**kwargs)
+        self._run(self._fetcher.start(), None)
+
+    def _run(self, coro, timeout: float | None):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result(timeout)
+
+    def fetch(self, url: str) -> tuple[str, str]: return self._run(self._fetcher.fetch(url), None)
+    def fetch_many(self, urls: list[str]) -> list[tuple[str, str] | Exception]: return self._run(self._fetcher.fetch_many(urls), None)
+
+    def close(self) -> None:
+        if not self._thread.is_alive(): return
+        try: self._run(self._fetcher.close(), 30)
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+
+class LaunchPerPageFetcher:  # the previous download path: a fresh browser per URL, one page after the other (sync playwright)
+    def __init__(self, channel: str | None = BROWSER_CHANNEL, executable: str | None = BROWSER_PATH):
+        self.channel = channel
+        self.executable = executable
+
+    def fetch(self, url: str) -> tuple[str, str]:
+        from playwright.sync_api import sync_playwright
+        with sync_playwright() as p:  # open playwright session
+            browser = p.chromium.launch(**_launch_args(self.channel, self.executable))
+            try:
+                page = browser.new_page()
+                page.goto(url, wait_until='networkidle')  # load URL and wait until network is idle
+                title = page.title()
+                return page.content(), title
+            finally: browser.close()
+
+    def fetch_many(self, urls: list[str]) -> list[tuple[str, str] | Exception]:
+        '''same result list as SyncBrowserFetcher.fetch_many (failed loads as exceptions), sequential'''
+        out = []
+        for url in urls:
+            try: out.append(self.fetch(url))
+            except Exception as e: out.append(e)
+        return out
+
+    def close(self) -> None: pass
+
+_SHARED: SyncBrowserFetcher | LaunchPerPageFetcher | None = None
+_SHARED_LOCK = threading.Lock()
+
+def get_fetcher() -> SyncBrowserFetcher | LaunchPerPageFetcher:
+    '''process wide fetcher (pooled browser started on first use and closed at exit, see BROWSER_POOL)'''
+    global _SHARED
+    with _SHARED_LOCK:
+        if _SHARED is None:
+            browser = {'channel': BROWSER_CHANNEL, 'executable': BROWSER_PATH}  # the settings at first use, not at import (defaults are bound then)
+            _SHARED = SyncBrowserFetcher(concurrency=FETCH_CONCURRENCY, timeout=FETCH_TIMEOUT, **browser) if BROWSER_POOL else LaunchPerPageFetcher(**browser)
+            atexit.register(_SHARED.close)
+        return _SHARED
+
+@dataclass
+class StaticPage:  # result of a plain HTTP fetch
+    html: str  # '' if not_modified
+    title: str
+    etag: str | None = None  # validators for the next conditional request
+    last_modified: str | None = None
+    not_modified: bool = False  # 304 => the cached copy is still current
+
+class HttpFetcher:  # pooled keep-alive HTTP client (gzip/deflate, brotli if the brotli package is installed)
+    def __init__(self, timeout: float = FETCH_TIMEOUT, connections: int = FETCH_CONCURRENCY):
+        import httpx  # optional dependency, only needed for the plain HTTP path
+        limits = httpx.Limits(max_connections=connections * 2, max_keepalive_connections=connections * 2)
+        self._client = httpx.Client(follow_redirects=True, timeout=timeout, limits=limits, headers={'User-Agent': _USER_AGENT})
+
+    def get(self, url: str, etag: str | None = None, last_modified: str | None = None) -> 'StaticPage | None':
+        '''decoded HTML of url (conditional request if validators are given), None if the response is no 200/304 HTML page'''
+        headers = {k: v for k, v in (('If-None-Match', etag), ('If-Modified-Since', last_modified)) if v}
+        res = self._client.get(url, headers=headers)
+        if res.status_code == 304 and headers: return StaticPage('', '', res.headers.get('etag', etag), res.headers.get('last-modified', last_modified), not_modified=True)
+        ctype = res.headers.get('content-type', '')
+        if res.status_code != 200 or (ctype and 'html' not in ctype.lower()): return None
+        return StaticPage(_decode(res.content, ctype), '', res.headers.get('etag'), res.headers.get('last-modified'))
+
+    def close(self) -> None: self._client.close()
+
+def _decode(body: bytes, ctype: str) -> str:
+    '''charset from the Content-Type header, then <meta charset>, then utf-8'''
+    m = re.search(r'charset=["\']?([\w-]+)', ctype, re.I) or _META_CHARSET.search(body[:4096])
+    charset = m.group(1) if m else 'utf-8'
+    if isinstance(charset, bytes): charset = charset.decode('ascii')
+    try: return body.decode(charset, errors='replace')
+    except LookupError: return body.decode('utf-8', errors='replace')  # unknown charset name
+
+def _domain_in(url: str, domains: set[str]) -> bool:
+    host = (urlparse(url).hostname or '').lower()
+    return any(host == d or host.endswith('.' + d) for d in domains)
+
+def is_complete_page(url: str, root) -> bool:
+    '''quick check if a plain HTTP page already has its content (no JavaScript rendering needed)'''
+    if _domain_in(url, STATIC_DOMAINS): return True
+    from src.extract_text import _get_blocks  # lazy: extract_text imports this module
+    words = 0
+    for block in _get_blocks(root):  # same filters as the real extraction, stops as soon as there is enough text
+        words += len(block.text.split())
+        if words >= MIN_STATIC_WORDS: return True
+    return False
+
+def fetch_static(url: str, etag: str | None = None, last_modified: str | None = None) -> StaticPage | None:
+    '''the page via plain HTTP (not_modified if the validators still match), None if the page needs the browser'''
+    if _domain_in(url, BROWSER_DOMAINS): return None
+    try:
+        page = get_http_fetcher().get(url, etag, last_modified)
+        if page is None or page.not_modified: return page
+        root = _html_to_ET(page.html, 'lxml')  # fast parse, only for the check and the title (part of the fetch stage, not a parse of the pipeline)
+        if not is_complete_page(url, root): return None
+        page.title = next((' '.join(''.join(t.itertext()).split()) for t in root.iter('title')), '')  # like document.title
+        return page
+    except Exception: return None  # network/protocol error or a body that does not parse => let the browser try
+
+def fetch_static_many(urls: list[str], validators: list[tuple[str | None, str | None]] | None = None) -> list[StaticPage | None]:
+    '''fetch_static for many URLs on FETCH_CONCURRENCY threads (one shared connection pool), validators = (etag, last_modified) per URL'''
+    from concurrent.futures import ThreadPoolExecutor
+    validators = validators or [(None, None)] * len(urls)
+    with ThreadPoolExecutor(max_workers=FETCH_CONCURRENCY) as pool: return list(pool.map(fetch_static, urls, *zip(*validators))) if urls else []
+
+_SHARED_HTTP: HttpFetcher | None = None
+
+def get_http_fetcher() -> HttpFetcher:
+    '''process wide HTTP client (created on first use, closed at exit)'''
+    global _SHARED_HTTP
+    with _SHARED_LOCK:
+        if _SHARED_HTTP is None:
+            _SHARED_HTTP = HttpFetcher()
+            atexit.register(_SHARED_HTTP.close)
+        return _SHARED_HTTP
@@ -0,0 +1,43 @@
+from src.filters.filter_attribute import SKIP_ATTR, SKIP_ATTR_PREFIX, SKIP_ATTR_NAME_CONTAINS, SKIP_ATTR_VALUE_CONTAINS
+from src.filters.filter_class import SKIP_CLASS, SKIP_CLASS_PREFIX, SKIP_CLASS_CONTAINS
+from src.filters.filter_id import SKIP_ID, SKIP_ID_PREFIX, SKIP_ID_CONTAINS
+from functools import lru_cache
+import re
+
+# The SKIP_* tables are compiled once at import into one regex per table (exact | prefix | substring),
+# so a token is checked in a single C-level scan instead of Python any(...) loops over every entry.
+# Changing the tables at runtime needs a reload of this module.
+_CACHE_SIZE = 1 << 16  # class/id values repeat thousands of times per page, keep the seen ones
+
+def _compile(exact: set[str] = (), prefix: set[str] = (), contains: set[str] = ()) -> re.Pattern:
+    '''compiles exact, prefix and substring entries of one table into a single regex (use .search)'''
+    alt = lambda words: '|'.join(re.escape(w) for w in sorted(words, key=len, reverse=True))
+    parts = []
+    if exact: parts.append(rf'^(?:{alt(exact)})\Z')  # whole token
+    if prefix: parts.append(rf'^(?:{alt(prefix)})')  # token start
+    if contains: parts.append(f'(?:{alt(contains)})')  # anywhere in token
+    return re.compile('|'.join(parts) or r'(?!)')  # (?!) never matches (empty table)
+
+_CLASS_RE = _compile(SKIP_CLASS, SKIP_CLASS_PREFIX, SKIP_CLASS_CONTAINS)
+_ID_RE = _compile(SKIP_ID, SKIP_ID_PREFIX, SKIP_ID_CONTAINS)
+_ATTR_NAME_RE = _compile(SKIP_ATTR, SKIP_ATTR_PREFIX, SKIP_ATTR_NAME_CONTAINS)
+_ATTR_VALUE_RE = _compile(contains=SKIP_ATTR_VALUE_CONTAINS)
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def skip_class(classes: str) -> bool:
+    '''True if any class token of a class attribute matches SKIP_CLASS*'''
+    return any(_CLASS_RE.search(c) for c in classes.strip().lower().split())
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def skip_id(id_val: str) -> bool:
+    '''True if the id attribute matches SKIP_ID*'''
+    return bool(_ID_RE.search(id_val.strip().lower()))
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def skip_attr_name(name: str) -> bool:
+    '''True if an attribute name matches SKIP_ATTR*'''
+    return bool(_ATTR_NAME_RE.search(name.strip().lower()))
+
+def skip_attr_value(value: str) -> bool:
+    '''True if an attribute value contains one of SKIP_ATTR_VALUE_CONTAINS (not cached, values are mostly unique)'''
+    return bool(_ATTR_VALUE_RE.search(value.strip().lower()))
@@ -0,0 +1,112 @@
+'''offline ingestion: saved HTML pages of a folder tree or the HTML responses of a WARC archive (.warc / .warc.gz) as pages, read one at a time
+
+usage: python -m src.ingest <folder | file.warc | file.warc.gz | page.html>   (lists the records: size, title, url)
+'''
+from src.fetcher import _decode
+from src.extract_metadata import saved_from_url
+from src.extract_text import _safe_windows_name
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Iterator
+import gzip, html as htmllib, os, re, sys, zlib
+
+HTML_SUFFIXES = ('.html', '.htm', '.xhtml')  # files of a folder that are read as pages
+WARC_TYPES = ('response', 'resource')  # WARC records with page content (request, metadata, revisit, warcinfo are skipped)
+
+_TITLE = re.compile(r'<title[^>]*>(.*?)</title', re.IGNORECASE | re.DOTALL)
+
+@dataclass
+class Record:  # one page of the archive
+    url: str
+    html: str
+    title: str
+
+def iter_records(path: str | Path) -> Iterator[Record]:
+    '''pages of a folder tree (sorted), a WARC file or a single HTML file; lazy: one page in memory at a time'''
+    path = Path(path)
+    if path.is_dir():
+        for folder, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith(HTML_SUFFIXES): yield _file_record(Path(folder) / name)
+    elif path.name.lower().endswith(('.warc', '.warc.gz')): yield from _iter_warc(path)
+    elif path.exists(): yield _file_record(path)
+    else: raise FileNotFoundError(f'nothing to ingest at {path}')
+
+def _file_record(path: Path) -> Record:
+    html = _decode(path.read_bytes(), '')
+    return Record(saved_from_url(html) or path.resolve().as_uri(), html, _title(html, path.stem))  # URL of the "saved from url=" comment
+
+def _title(html: str, fallback: str) -> str:
+    m = _TITLE.search(html, 0, 1 << 20)
+    title = ' '.join(htmllib.unescape(m.group(1)).split()) if m else ''  # like document.title
+    return _safe_windows_name(title or fallback)
+
+def _iter_warc(path: Path) -> Iterator[Record]:
+    '''HTML records of a WARC file (gzip: one member per record or the whole file, both read as one stream)'''
+    with (gzip.open(path, 'rb') if path.name.lower().endswith('.gz') else open(path, 'rb')) as f:
+        while line := f.readline():
+            if not line.strip(): continue  # blank lines between records
+            if not line.startswith(b'WARC/'): raise ValueError(f'{path}: no WARC record header at byte {f.tell() - len(line)}')
+            headers = _read_headers(f)
+            block = f.read(int(headers.get('content-length', 0)))
+            if headers.get('warc-type') in WARC_TYPES and (rec := _warc_page(headers, block)): yield rec
+
+def _read_headers(f: BinaryIO) -> dict[str, str]:
+    '''header lines up to the blank line, names lower case'''
+    headers = {}
+    while (line := f.readline()).strip():
+        name, _, value = line.decode('utf-8', errors='replace').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    return headers
+
+def _warc_page(headers: dict[str, str], block: bytes) -> Record | None:
+    '''page of a response (HTTP 200 with an HTML body) or resource record (HTML content type), None otherwise'''
+    url = headers.get('warc-target-uri', '').strip('<>')
+    ctype = headers.get('content-type', '')
+    if headers['warc-type'] == 'response' and 'application/http' in ctype:
+        head, _, body = block.partition(b'\r\n\r\n')
+        status, *lines = head.decode('latin-1').split('\r\n')
+        http = {name.strip().lower(): value.strip() for name, _, value in (ln.partition(':') for ln in lines)}
+        if status.split()[1:2] != ['200']: return None  # redirects, errors
+        ctype = http.get('content-type', '')
+        if 'chunked' in http.get('transfer-encoding', '').lower(): body = _dechunk(body)
+        if (body := _decompress(body, http.get('content-encoding', '').lower())) is None: return None
+    else: body = block
+    if not url or 'html' not in ctype.lower(): return None
+    html = _decode(body, ctype)
+    return Record(url, html, _title(html, url.rstrip('/').rsplit('/', 1)[-1] or url))
+
+def _dechunk(body: bytes) -> bytes:
+    '''body of a chunked transfer encoding (as stored by some crawlers), unchanged if it is not chunked'''
+    out, i = [], 0
+    try:
+        while (j := body.find(b'\r\n', i)) >= 0 and (size := int(body[i:j].split(b';')[0], 16)):
+            out.append(body[j + 2 : j + 2 + size])
+            i = j + 4 + size
+    except ValueError: return body
+    return b''.join(out)
+
+def _decompress(body: bytes, encoding: str) -> bytes | None:
+    if encoding in ('', 'identity'): return body
+    try:
+        if encoding in ('gzip', 'x-gzip'): return gzip.decompress(body)
+        if encoding == 'deflate': return zlib.decompress(body, -zlib.MAX_WBITS) if body[:1] != b'\x78' else zlib.decompress(body)  # raw or zlib wrapped
+        if encoding == 'br':
+            import brotli  # optional: pip install brotli
+            return brotli.decompress(body)
+    except ImportError: print('Ingest: brotli not installed, "br" encoded record skipped')
+    except (OSError, zlib.error, EOFError): pass  # truncated record
+    return None
+
+def main(args: list[str]) -> int:
+    if len(args) != 1:
+        print(__doc__)
+        return 1
+    n = 0
+    for n, rec in enumerate(iter_records(args[0]), 1): print(f'{len(rec.html) / 1e3:9.1f} KB  {rec.title[:50]:<50}  {rec.url}')
+    print(f'{n} records')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
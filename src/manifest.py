@@ -0,0 +1,98 @@
+'''run manifest: per doc_id the hashes of the inputs (HTML, section state, filter/chunk config) and of every written chunk'''
+from src.extract_urls import normalize_url
+from dataclasses import dataclass, field, asdict
+from functools import lru_cache
+from pathlib import Path
+import hashlib, json, os
+
+MANIFEST_FILE = 'data/manifest.json'  # relative to the project root
+CHANGES_FILE = 'data/changes.json'  # chunk ids added/removed/moved by the last run (input for the vector store update)
+
+@dataclass
+class DocChanges:  # what one run changed for one document
+    doc_id: str
+    title: str
+    url: str
+    status: str  # 'new' | 'changed' | 'unchanged' (skipped, nothing written)
+    added: list[str] = field(default_factory=list)  # new chunk ids whose content_hash the last run did not write
+    removed: list[str] = field(default_factory=list)  # old chunk ids whose content_hash is gone
+    moved: dict[str, str] = field(default_factory=dict)  # old id -> new id: same content_hash at another index (one inserted sentence shifts the ids)
+    unchanged: int = 0  # chunks with a content_hash of the last run (moved included)
+
+def _diff(old: dict[str, str], new: dict[str, str]) -> tuple[list[str], list[str], dict[str, str], int]:
+    '''compares the chunks of two runs ({chunk id: content_hash}) by content: a hash matches the same id first, else any old id with it'''
+    left = {}  # content_hash -> old ids not matched yet
+    for i, h in old.items():
+        if new.get(i) != h: left.setdefault(h, []).append(i)
+    added, moved = [], {}
+    for i, h in new.items():
+        if old.get(i) == h: continue
+        if left.get(h): moved[left[h].pop(0)] = i
+        else: added.append(i)
+    removed = [i for ids in left.values() for i in ids]
+    return added, removed, moved, len(new) - len(added)
+
+def _sha(text: str) -> str:
+    h = hashlib.sha256()
+    for i in range(0, len(text), 1 << 20): h.update(text[i:i + (1 << 20)].encode('utf-8'))  # no encoded copy of a whole (very large) page
+    return h.hexdigest()
+
+def state_hash(state: dict[str, bool] | None) -> str: return _sha(json.dumps(state, sort_keys=True, ensure_ascii=False))
+
+@lru_cache(maxsize=1)
+def config_hash() -> str:
+    '''hash of everything besides HTML + state that changes the output: SKIP_*/tag lists, parser and chunk settings'''
+    from src.filters import filter_attribute, filter_class, filter_id, filter_tag
+    from src import chunking, parse_html
+    config = {f'{m.__name__}.{k}': sorted(v) if isinstance(v, (set, frozenset)) else v
+              for m in (filter_attribute, filter_class, filter_id, filter_tag) for k, v in vars(m).items() if k.isupper()}
+    config.update(MAX_CHUNK_LENGTH=chunking.MAX_CHUNK_LENGTH, CHUNK_LENGTH=chunking.CHUNK_LENGTH, PARSER=parse_html.PARSER)
+    return _sha(json.dumps(config, sort_keys=True, ensure_ascii=False, default=repr))
+
+class Manifest:  # data/manifest.json: doc_id -> {url, title, html_hash, state_hash, config_hash, chunks: {chunk id: content_hash}, outputs: [files]}
+    def __init__(self, ROOT: str | Path, settings: dict[str, any] | None = None):
+        self.root = Path(ROOT)
+        self.config = _sha(config_hash() + json.dumps(settings, sort_keys=True, default=repr))  # + run settings that change what is written (writer format, dedup, profiles)
+        self._path = Path(ROOT) / MANIFEST_FILE
+        self._changes_path = Path(ROOT) / CHANGES_FILE
+        self.docs: dict[str, dict[str, any]] = json.loads(self._path.read_text(encoding='utf-8')) if self._path.exists() else {}
+        self._by_url = {normalize_url(d['url']): doc_id for doc_id, d in self.docs.items()}  # the doc_id is only known after parsing
+        self.changes: list[DocChanges] = []
+
+    def unchanged(self, url: str, html: str, state: dict[str, bool] | None = None, profile: str | None = None) -> bool:
+        '''True if the last run wrote this URL from the same HTML, state, config and boilerplate profile digest and its outputs still exist (=> skip it); recorded as unchanged'''
+        doc_id = self._by_url.get(normalize_url(url))
+        entry = self.docs.get(doc_id)
+        if entry is None or entry['html_hash'] != _sha(html) or entry['state_hash'] != state_hash(state) or entry['config_hash'] != self.config: return False
+        if entry.get('profile') != profile or not all((self.root / p).exists() for p in entry.get('outputs', ())): return False  # deleted output => write it again
+        self.changes.append(DocChanges(doc_id, entry['title'], url, 'unchanged'))
+        return True
+
+    def record(self, url: str, title: str, html: str, state: dict[str, bool] | None, chunks: list[dict[str, any]] | dict[str, str], doc_id: str | None, profile: str | None = None,
+               outputs: list[Path] = ()) -> DocChanges:
+        '''stores the hashes (and the written files, see OutputWriter.outputs) of a written document and diffs the content of its chunks (or their {id: content_hash}) against the last run'''
+        doc_id = doc_id or _sha(normalize_url(url))[:16]  # no canonical url/title => key by URL
+        old = self.docs.get(doc_id, {}).get('chunks', {})
+        new = chunks if isinstance(chunks, dict) else {c['id']: c['metadata']['content_hash'] for c in chunks}
+        added, removed, moved, unchanged = _diff(old, new)
+        res = DocChanges(doc_id, title, url, 'changed' if doc_id in self.docs else 'new', added, removed, moved, unchanged)
+        self.docs[doc_id] = {'url': url, 'title': title, 'html_hash': _sha(html), 'state_hash': state_hash(state), 'config_hash': self.config, 'chunks': new,
+                             'outputs': [Path(os.path.relpath(p, self.root)).as_posix() for p in outputs]}
+        if profile: self.docs[doc_id]['profile'] = profile  # digest of the applied boilerplate profile
+        self._by_url[normalize_url(url)] = doc_id
+        self.changes.append(res)
+        return res
+
+    def save(self) -> None:
+        '''writes the manifest and the change report of this run (temp file + rename)'''
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        for path, obj in ((self._path, self.docs), (self._changes_path, [asdict(c) for c in self.changes])):
+            tmp = path.with_name(path.name + '.tmp')
+            tmp.write_text(json.dumps(obj, ensure_ascii=False, indent=1), encoding='utf-8')
+            os.replace(tmp, path)
+
+    def summary(self) -> str:
+        count = lambda attr: sum(len(getattr(c, attr)) for c in self.changes)
+        skipped = sum(c.status == 'unchanged' for c in self.changes)
+        unchanged = sum(c.unchanged for c in self.changes if c.status != 'unchanged')
+        return f'{len(self.changes) - skipped} documents written, {skipped} unchanged (skipped); chunks: {count("added")} added, {count("removed")} removed, {unchanged} unchanged ({count("moved")} moved)'
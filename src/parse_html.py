@@ -0,0 +1,64 @@
+from dataclasses import dataclass, field
+from lxml import etree as ET
+from src import stats
+import copy, time
+
+PARSER = 'html5lib'  # html5lib (reference, pure python) | lxml (libxml2, fastest) | html5-parser (C html5 parser, lxml output)
+PARSERS = ('html5lib', 'lxml', 'html5-parser')  # all supported backends (benchmarks/check_parsers.py compares them)
+_EMPTY_PAGE = b'<html><head></head><body></body></html>'  # what every backend builds from an empty document
+
+@dataclass
+class ParsedHTML:  # one page parsed once and shared by metadata, url extraction and rendering
+    html: str  # raw HTML the tree was built from
+    root: ET.Element  # parsed lxml tree (treat as read-only, use clone() before modifying)
+    parse_time: float = 0.0  # seconds spent parsing
+    peak_mem: int = -1  # peak python heap during parsing in bytes (-1 if not measured)
+    _links: list[tuple[str, str | None]] = field(default=None, repr=False)  # cached (href, type) of the links in document order
+
+    def clone(self) -> ET.Element:
+        '''returns a private copy of the tree that can be modified safely'''
+        return copy.deepcopy(self.root)  # C-level copy, much cheaper than parsing again
+
+    def anchors(self) -> list[tuple[str, str | None]]:
+        '''returns (href, type attribute) of all <a href> elements in document order (computed once)'''
+        if self._links is None: self._links = [(h, a.get('type')) for a in self.root.iter('a') if (h := (a.get('href') or '').strip())]
+        return self._links
+
+def parse_html(html: str, measure: bool = False, parser: str = None) -> ParsedHTML:
+    '''parses the HTML once and records parse time (and peak memory if measure=True)'''
+    if measure:
+        import tracemalloc
+        tracing = tracemalloc.is_tracing()
+        if not tracing: tracemalloc.start()
+        tracemalloc.reset_peak()
+    start = time.perf_counter()
+    with stats.stage('parse'): root = _html_to_ET(html, parser or PARSER)
+    parse_time = time.perf_counter() - start
+    peak_mem = -1
+    if measure:
+        peak_mem = tracemalloc.get_traced_memory()[1]
+        if not tracing: tracemalloc.stop()
+    return ParsedHTML(html, root, parse_time, peak_mem)
+
+def as_parsed(html: 'str | ParsedHTML') -> ParsedHTML:
+    '''accepts raw HTML or an already parsed page and always returns a ParsedHTML'''
+    return html if isinstance(html, ParsedHTML) else parse_html(html)
+
+def _html_to_ET(html: str, parser: str = 'html5lib') -> ET.Element:
+    '''creates a correct working lxml tree with the chosen parser backend'''
+    if parser == 'html5lib':
+        import html5lib
+        doc = html5lib.parse(html, treebuilder='lxml', namespaceHTMLElements=False)  # parse HTML
+        return doc.getroot()
+    if parser == 'lxml':
+        import lxml.html
+        parser = lxml.html.HTMLParser(encoding='utf-8', huge_tree=True)  # bytes input, so an <?xml encoding=...?> prolog does not raise
+        data = html.encode('utf-8')
+        try: return lxml.html.document_fromstring(data, parser=parser)  # libxml2 html parser
+        except ET.ParserError: pass  # "Document is empty": only whitespace/comments (the html5 backends return an empty page)
+        try: return lxml.html.document_fromstring(data + _EMPTY_PAGE, parser=parser)  # keeps the comments before the root
+        except ET.ParserError: return lxml.html.document_fromstring(_EMPTY_PAGE, parser=parser)  # input ends before any markup (e.g. a NUL byte)
+    if parser == 'html5-parser':
+        import html5_parser  # needs lxml built against the same libxml2 (pip install --no-binary lxml lxml)
+        return html5_parser.parse(html, treebuilder='lxml', namespace_elements=False)  # gumbo based html5 parser
+    raise ValueError(f'unknown parser "{parser}", choose one of {PARSERS}')
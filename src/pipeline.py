@@ -0,0 +1,71 @@
+from src.extract_text import Doc, _render_with_state, _observe_blocks
+from src.boilerplate import Profile
+from src.dedup import NearDuplicates
+from src.extract_text_via_bs4 import extract_text_via_bs4
+from src.extract_metadata import extract_metadata
+from src.extract_urls import extract_urls
+from src.parse_html import parse_html
+from src.chunking import chunking, iter_chunks
+from src.stream_extract import stream_lines
+from src.writers import OutputWriter, DocStream
+from src import stats
+from dataclasses import dataclass
+from typing import Iterable, Iterator
+
+@dataclass
+class PageResult:  # everything the pipeline writes for one headless page (picklable, returned by pool workers)
+    url: str
+    title: str
+    docs: list[Doc]  # rendered documents (SILENT => only the base page)
+    chunks: list[list[dict[str, any]]]  # chunks per doc (same order as docs)
+    bs4_text: str  # BeautifulSoup comparison output
+    parse_time: float = 0.0
+    peak_mem: int = -1
+    stats: dict[str, any] | None = None  # stage times + counters of this page (src/stats.py), None if off
+    links: list[str] | None = None  # document links of the page as returned by extract_urls (crawl mode), None if not requested
+    blocks: list[tuple[str, str, bool]] | None = None  # (path, text_key, eligible) of the text blocks for learning boilerplate profiles, None if not requested
+
+def process_page(url: str, html: str, title: str, parse_stats: bool = False, collect_stats: bool = False, links: bool = False,
+                 profile: Profile | None = None, observe: bool = False) -> PageResult:
+    '''headless processing of one downloaded page: parse once, metadata, render, chunk (runs in pool workers)'''
+    stats.ENABLED = collect_stats  # worker process: its own module state
+    stats.begin(url)
+    stats.count('html_chars', len(html))  # input size, once per page (not per parse)
+    parsed = parse_html(html, measure=parse_stats)  # parse once, shared by metadata and rendering
+    chunk_template = extract_metadata(parsed)  # extract base metadata (canonical/url/domain/etc)
+    doc = Doc(url, title, html, _render_with_state(parsed, profile=profile), chunk_template, state=None)  # SILENT => all sections
+    chunks = chunking(doc.text, doc.metadata)  # chunk the text for RAG (uses markers)
+    bs4_text = extract_text_via_bs4(html)
+    hrefs = [u for u, _ in extract_urls(chunk_template['metadata'], parsed, url)] if links else None
+    blocks = _observe_blocks(parsed.root) if observe else None
+    return PageResult(url, title, [doc], [chunks], bs4_text, parsed.parse_time, parsed.peak_mem, stats.end(), hrefs, blocks)
+
+def stream_page(url: str, html: str, title: str, writer: OutputWriter, profile: Profile | None = None, dedup: NearDuplicates | None = None,
+                hashes: bool = True, batch: int = 64) -> tuple[dict[str, any], dict[str, str] | None]:
+    '''headless processing of one very large page without a tree: lines and chunks go into the writer as they are produced (main process);
+    returns the metadata template and {chunk id: content_hash} of the written chunks for the manifest (None if hashes=False)'''
+    stats.count('html_chars', len(html))
+    chunk_template = extract_metadata(html)  # raw HTML: only the head is parsed
+    written: dict[str, str] | None = {} if hashes else None
+    with writer.open_doc(title, html) as out, stats.stage('stream'):
+        pending: list[dict[str, any]] = []
+        for chunk in iter_chunks(_tee(stream_lines(html, profile), out), chunk_template):
+            pending.append(chunk)
+            if len(pending) < batch: continue
+            _write_chunks(pending, out, dedup, written)
+            pending = []
+        _write_chunks(pending, out, dedup, written)
+    return chunk_template, written
+
+def _tee(lines: Iterable[str], out: DocStream) -> Iterator[str]:
+    '''passes the text lines on to the chunker and writes them on the way'''
+    for ln in lines:
+        out.write_line(ln)
+        yield ln
+
+def _write_chunks(chunks: list[dict[str, any]], out: DocStream, dedup: NearDuplicates | None = None, written: dict[str, str] | None = None) -> None:
+    '''writes a batch of chunks (near-duplicates tagged/dropped first) and notes their content hashes'''
+    if dedup: chunks = dedup.filter(chunks)  # in order, so batches give the same result as the whole document
+    for c in chunks:
+        out.write_chunk(c)
+        if written is not None: written[c['id']] = c['metadata']['content_hash']
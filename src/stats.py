@@ -0,0 +1,115 @@
+'''optional instrumentation: wall/CPU time per pipeline stage and counters per document (off by default, near zero cost when off)
+
+Stage times are exclusive: a stage opened inside another one on the same thread (e.g. dedup inside
+stream) is subtracted from the outer stage, so the stages of a document add up to at most its wall time.
+'''
+from contextlib import nullcontext
+from functools import wraps
+import json, os, threading, time
+
+ENABLED = False  # set by main.py (STATS); checked at call time, so modules must use stats.ENABLED, not import the name
+_NULL = nullcontext()  # shared no-op context manager when disabled
+_LOCK = threading.Lock()  # record updates from several threads (e.g. the HTTP fetch pool)
+_local = threading.local()  # per thread: stack of the open stages
+
+def _new_record(url: str | None) -> dict[str, any]: return {'url': url, 'stages': {}, 'counters': {}}
+
+_run = _new_record(None)  # work outside of a document (e.g. batched fetches in the parallel runner)
+_record = _run  # record the stages and counters currently go to
+
+class _Stage:  # adds wall and CPU time of a with-block to the current record, without the time of the stages nested in it
+    __slots__ = ('name', 'wall', 'cpu', 'inner')
+
+    def __init__(self, name: str): self.name = name
+
+    def __enter__(self):
+        if not hasattr(_local, 'stack'): _local.stack = []
+        _local.stack.append(self)
+        self.inner = [0.0, 0.0]  # wall, cpu of the nested stages
+        self.wall, self.cpu = time.perf_counter(), time.process_time()
+        return self
+
+    def __exit__(self, *exc):
+        wall, cpu = time.perf_counter() - self.wall, time.process_time() - self.cpu
+        _local.stack.pop()
+        if _local.stack:  # the enclosing stage does not count this time again
+            _local.stack[-1].inner[0] += wall
+            _local.stack[-1].inner[1] += cpu
+        with _LOCK:
+            st = _record['stages'].setdefault(self.name, {'wall': 0.0, 'cpu': 0.0, 'calls': 0})
+            st['wall'] += wall - self.inner[0]
+            st['cpu'] += cpu - self.inner[1]
+            st['calls'] += 1
+
+def stage(name: str):
+    '''with stats.stage('parse'): ...  (times the block if enabled)'''
+    return _Stage(name) if ENABLED else _NULL
+
+def timed(name: str):
+    '''decorator version of stage() for whole functions'''
+    def deco(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not ENABLED: return fn(*args, **kwargs)
+            with _Stage(name): return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+def count(name: str, n: int = 1) -> None:
+    '''adds n to a counter of the current record (call once per batch, not per element)'''
+    if not ENABLED: return
+    with _LOCK: _record['counters'][name] = _record['counters'].get(name, 0) + n
+
+def begin(url: str) -> None:
+    '''starts the record of one document'''
+    global _record
+    if ENABLED: _record = _new_record(url)
+
+def end() -> dict[str, any] | None:
+    '''finishes the current document record and returns it (None if disabled)'''
+    global _record
+    if not ENABLED or _record is _run: return None
+    rec, _record = _record, _run
+    return rec
+
+def merge(into: dict[str, any], rec: dict[str, any] | None) -> dict[str, any]:
+    '''adds the stages and counters of rec (e.g. from a pool worker) to into'''
+    if not rec: return into
+    for name, st in rec['stages'].items():
+        tgt = into['stages'].setdefault(name, {'wall': 0.0, 'cpu': 0.0, 'calls': 0})
+        for k in tgt: tgt[k] += st[k]
+    for name, n in rec['counters'].items(): into['counters'][name] = into['counters'].get(name, 0) + n
+    return into
+
+class StatsLog:  # one JSON line per document + a summary of the run (sum of all documents and the run record)
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)  # first run in a new project folder
+        self._file = open(path, 'w', encoding='utf-8')
+        _run['stages'].clear()  # the run record starts with this log
+        _run['counters'].clear()
+        self.total = _new_record(None)
+        self.docs = 0
+
+    def write(self, rec: dict[str, any] | None) -> None:
+        if rec is None: return
+        self._file.write(json.dumps(_rounded(rec), ensure_ascii=False) + '\n')
+        merge(self.total, rec)
+        self.docs += 1
+
+    def close(self) -> dict[str, any]:
+        '''writes the summary line and returns it'''
+        merge(self.total, _run)
+        summary = {**_rounded(self.total), 'url': None, 'documents': self.docs}
+        self._file.write(json.dumps({'summary': summary}, ensure_ascii=False) + '\n')
+        self._file.close()
+        return summary
+
+def format_summary(summary: dict[str, any]) -> str:
+    stages = sorted(summary['stages'].items(), key=lambda kv: -kv[1]['wall'])
+    lines = [f"{summary['documents']} documents"]
+    lines += [f"  {name:<10} wall {st['wall']:9.3f}s  cpu {st['cpu']:9.3f}s  calls {st['calls']}" for name, st in stages]
+    lines += [f"  {name:<22} {n:,}" for name, n in sorted(summary['counters'].items())]
+    return '\n'.join(lines)
+
+def _rounded(rec: dict[str, any]) -> dict[str, any]:
+    return {**rec, 'stages': {k: {'wall': round(v['wall'], 6), 'cpu': round(v['cpu'], 6), 'calls': v['calls']} for k, v in rec['stages'].items()}}
@@ -0,0 +1,145 @@
+'''bounded-memory extraction of very large pages: parser events instead of a whole tree, skipped subtrees pruned where they start,
+blocks -> merged lines -> chunks as generators (same text as _render_with_state with PARSER = 'lxml', all sections kept)'''
+from src.extract_text import (BLOCK_TAG, _MARKER_PREFIX, _get_tag, _get_lvl, _should_skip_node, _skip_reason, _child_path, _get_visibility,
+                              _get_headings, _insert_section_markers, _get_blocks, _normalize_whitespace, _merge_lines_iter)
+from src.boilerplate import Profile
+from src import stats
+from collections import Counter
+from lxml import etree as ET
+from typing import Iterable, Iterator
+
+FEED_CHARS = 1 << 16  # characters fed to the parser per step
+INTRO_BUFFER = 1 << 20  # characters of blocks held back until the first heading gives the Intro marker its level (after that: level 99 like a page without headings)
+
+_OPEN, _ATOMIC, _SKIP = 0, 1, 2  # element walked child by child | block/table/heading rendered whole at its end | pruned
+
+class _Frame:  # one open element on the walker stack
+    __slots__ = ('node', 'kind', 'below', 'text_done')
+
+    def __init__(self, node: ET.Element, kind: int, below: str | None, text_done: bool = False):
+        self.node, self.kind, self.text_done = node, kind, text_done
+        self.below = below  # _OPEN: profile path its children are built from | _ATOMIC: profile path of its parent (see _get_visibility)
+
+class _Walker:  # parser events -> blocks in document order; processed children are deleted, so only the open elements stay in memory
+    def __init__(self, profile: Profile | None = None):
+        self.profile = profile if profile is not None and profile.paths else None
+        self.texts = profile if profile is not None and profile.texts else None
+        self.stack: list[_Frame] = []
+        self.inside = 0  # depth below an _ATOMIC/_SKIP top frame (those events are not walked)
+        self.intro: list[str] | None = None  # blocks held back until the Intro level is known (None: marker is out)
+        self.intro_chars = 0
+        self.filtered: Counter[str] = Counter()  # stats: elements_visited + skipped_<reason> like _count_filtered
+        self.headings = self.blocks = 0
+
+    def events(self, events: Iterable[tuple[str, ET.Element]]) -> Iterator[str]:
+        for event, node in events:
+            top = self.stack[-1] if self.stack else None
+            if top is not None and top.kind != _OPEN and (self.inside or event == 'start'):  # below an atomic/pruned element
+                if event == 'start': self.inside += 1
+                else:
+                    self.inside -= 1
+                    if top.kind == _SKIP: _drop_done(node)  # pruned subtree is never read: free it while it is parsed
+                continue
+            if event == 'start': yield from self._start(node, top)
+            else: yield from self._end(self.stack.pop())
+
+    def finish(self) -> Iterator[str]:
+        while self.stack: yield from self._end(self.stack.pop())  # truncated page
+        if self.intro is not None: yield from self._release(99)
+        stats.count('headings', self.headings + 1)
+        stats.count('blocks', self.blocks)
+        for name, n in self.filtered.items(): stats.count(name, n)
+
+    def _start(self, node: ET.Element, parent: _Frame | None) -> Iterator[str]:
+        if parent is not None: yield from self._flush(parent, node)  # text before this child is complete now
+        above = parent.below if parent is not None else ''
+        path = _child_path(above, node) if self.profile else None
+        visible = not (path is not None and path in self.profile.paths) and not _should_skip_node(node)
+        self.filtered['elements_visited'] += 1
+        if not visible:
+            self.filtered[f'skipped_{_skip_reason(node) or "profile"}'] += 1
+            self.stack.append(_Frame(node, _SKIP, None))
+        elif (tag := _get_tag(node)) in BLOCK_TAG or tag == 'table' or _get_lvl(node) is not None:
+            self.stack.append(_Frame(node, _ATOMIC, above))
+        else:
+            below = path if path is not None and path in self.profile.prefixes else None
+            self.stack.append(_Frame(node, _OPEN, below, text_done=parent is None))
+            if parent is None:  # root: its text is replaced by the Intro marker
+                self.intro, self.blocks = [], self.blocks + 1
+
+    def _end(self, frame: _Frame) -> Iterator[str]:
+        if frame.kind == _OPEN: yield from self._flush(frame, None)
+        elif frame.kind == _ATOMIC: yield from self._atomic(frame)
+        frame.node.clear(keep_tail=True)  # the tail is read by the parent (next child or its end)
+
+    def _flush(self, frame: _Frame, upto: ET.Element | None) -> Iterator[str]:
+        '''text of the element and the tails of its children before upto (None = all), processed children are deleted'''
+        node = frame.node
+        if not frame.text_done:
+            frame.text_done = True
+            if node.text and (t := _normalize_whitespace(node.text)): yield from self._emit(t)
+        while (child := next(iter(node), None)) is not None and child is not upto:  # len(node) would count the children parsed ahead
+            if child.tail and (t := _normalize_whitespace(child.tail)): yield from self._emit(t)  # also the tails of comments (no events)
+            del node[0]
+
+    def _atomic(self, frame: _Frame) -> Iterator[str]:
+        '''a complete block element/table/heading: same visibility, headings, markers and blocks as on the whole tree'''
+        node = frame.node
+        vis = _get_visibility(node, self.profile, frame.below)
+        self.filtered['elements_visited'] += len(vis) - 1  # the element itself was counted at its start
+        for n, visible in vis.items():
+            if not visible: self.filtered[f'skipped_{_skip_reason(n) or "profile"}'] += 1
+        heads = _get_headings(node, vis)[1:]  # without the Intro entry of the subtree
+        if heads:
+            self.headings += len(heads)
+            if self.intro is not None: yield from self._release(heads[0].lvl)
+            _insert_section_markers(node, vis, heads)
+        for block in _get_blocks(node, vis): yield from self._emit(block.text)
+
+    def _emit(self, text: str) -> Iterator[str]:
+        if self.texts is not None and self.texts.skip_text(text): return  # repeated texts of the site
+        self.blocks += 1
+        if self.intro is None:
+            yield text
+            return
+        self.intro.append(text)
+        self.intro_chars += len(text)
+        if self.intro_chars > INTRO_BUFFER: yield from self._release(99)
+
+    def _release(self, lvl: int) -> Iterator[str]:
+        intro, self.intro = self.intro, None
+        yield f'{_MARKER_PREFIX}Intro; level: {lvl}>>>'
+        yield from intro
+
+def _drop_done(node: ET.Element) -> None:
+    '''frees a finished element below a pruned one and its finished earlier siblings'''
+    node.clear()
+    parent = node.getparent()
+    if parent is not None:
+        while node.getprevious() is not None: del parent[0]
+
+def stream_blocks(html: str | Iterable[str], profile: Profile | None = None) -> Iterator[str]:
+    '''text blocks + section markers of a page in document order, parsed piece by piece (memory: open elements + the largest block/table)'''
+    pieces = (html[i:i + FEED_CHARS] for i in range(0, len(html), FEED_CHARS)) if isinstance(html, str) else html
+    parser = ET.HTMLPullParser(events=('start', 'end'), huge_tree=True)
+    walker = _Walker(profile)
+    for piece in _cut_before_tags(pieces):
+        parser.feed(piece)
+        yield from walker.events(parser.read_events())
+    parser.close()
+    yield from walker.events(parser.read_events())
+    yield from walker.finish()
+
+def _cut_before_tags(pieces: Iterable[str]) -> Iterator[str]:
+    '''re-cuts the input right before a '<' (libxml2's HTML push parser stops emitting events until close() once a piece ends inside a tag)'''
+    rest = ''
+    for piece in pieces:
+        rest += piece
+        if (cut := rest.rfind('<', 1)) > 0:
+            yield rest[:cut]
+            rest = rest[cut:]
+    if rest: yield rest
+
+def stream_lines(html: str | Iterable[str], profile: Profile | None = None) -> Iterator[str]:
+    '''merged lines of the page text (_render_with_state(...).splitlines() without the tree, the block list or the text)'''
+    return _merge_lines_iter(ln for block in stream_blocks(html, profile) for ln in block.splitlines())
@@ -0,0 +1,289 @@
+'''output writers for the pipeline: per document folders (plain/gzip/zstd), one combined JSONL per run or columnar chunk tables (Parquet/Arrow)'''
+from abc import ABC, abstractmethod
+from pathlib import Path
+from datetime import datetime
+from src import stats
+import gzip, hashlib, json, os, shutil
+
+OUTPUTS = ('folder', 'gzip', 'zstd', 'jsonl', 'jsonl.gz', 'jsonl.zst', 'parquet', 'arrow')  # see get_writer()
+ROWS_PER_FILE = 1_000_000  # parquet/arrow: chunks per file, then the next numbered file is started
+ROW_GROUP = 10_000  # parquet/arrow: chunks buffered per row group / record batch
+_BUFFER = 1 << 20  # bytes per write syscall for the big files
+_SUFFIX = {None: '', 'gzip': '.gz', 'zstd': '.zst'}
+
+def _open(path: Path, compress: str | None, mode: str = 'w'):
+    '''text file for writing ('x': fails if it exists), optionally compressed (one big buffer instead of many small writes)'''
+    if compress == 'gzip': return gzip.open(path, mode + 't', encoding='utf-8', compresslevel=6)
+    if compress == 'zstd':
+        import zstandard  # optional dependency, only for the zstd outputs
+        return zstandard.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8', buffering=_BUFFER)
+
+def _run_stem(data: Path) -> Path:
+    '''data/run-<time>-<pid>: microseconds + process id, two runs started in the same second get their own files'''
+    return data / f'run-{datetime.now():%Y%m%d-%H%M%S-%f}-{os.getpid()}'
+
+def _jsonl(chunks: list[dict[str, any]]) -> str: return ''.join(json.dumps(c, ensure_ascii=False) + '\n' for c in chunks)
+
+class OutputWriter(ABC):  # base class: what the pipeline writes per document
+    @abstractmethod
+    def write_doc(self, title: str, html: str, text: str, chunks: list[dict[str, any]]) -> None: ...
+    @abstractmethod
+    def write_text(self, title: str, text: str) -> None: ...  # extra plaintext output (BS4 comparison)
+    def open_doc(self, title: str, html: str) -> 'DocStream': return _BufferedDoc(self, title, html)  # streamed document (pages too large for the tree)
+    def outputs(self, title: str) -> list[Path]: return []  # files the document was written to (the incremental skip checks they still exist)
+
+    def output_name(self, title: str, url: str) -> str:
+        '''title the outputs of url are written under, unique in this run: a title another URL already has ("Log in", "Index") gets a short hash of the URL'''
+        from src.extract_urls import normalize_url
+        if not hasattr(self, '_owners'): self._owners: dict[str, str] = {}  # output name -> normalized URL
+        key = normalize_url(url)
+        if self._owners.setdefault(title, key) == key: return title
+        name = f'{title} ({hashlib.sha256(key.encode("utf-8")).hexdigest()[:8]})'
+        self._owners.setdefault(name, key)
+        return name
+
+    def reserve(self, names: dict[str, str]) -> None:
+        '''output name -> URL of earlier runs (manifest): a skipped document keeps its name, no other URL gets it'''
+        from src.extract_urls import normalize_url
+        if not hasattr(self, '_owners'): self._owners = {}
+        for name, url in names.items(): self._owners.setdefault(name, normalize_url(url))
+
+    def close(self) -> None: pass
+    def __enter__(self): return self
+    def __exit__(self, *exc): self.close()
+
+class DocStream(ABC):  # one document written while it is produced: text lines and chunks one by one (stream mode, see src/stream_extract.py)
+    @abstractmethod
+    def write_line(self, line: str) -> None: ...
+    @abstractmethod
+    def write_chunk(self, chunk: dict[str, any]) -> None: ...
+    def close(self) -> None: pass
+    def __enter__(self): return self
+    def __exit__(self, *exc): self.close()
+
+class _BufferedDoc(DocStream):  # writers without a streaming layout (chunk tables): collected and written with write_doc() at the end
+    def __init__(self, writer: OutputWriter, title: str, html: str):
+        self.writer, self.title, self.html = writer, title, html
+        self.lines: list[str] = []
+        self.chunks: list[dict[str, any]] = []
+
+    def write_line(self, line: str) -> None: self.lines.append(line)
+    def write_chunk(self, chunk: dict[str, any]) -> None: self.chunks.append(chunk)
+    def close(self) -> None: self.writer.write_doc(self.title, self.html, '\n'.join(self.lines), self.chunks)
+
+class FolderWriter(OutputWriter):  # today's layout: data/<title>/<title>_{raw.html,input.txt,output.txt,chunks.jsonl}[.gz|.zst]
+    def __init__(self, ROOT: str | Path, compress: str | None = None):
+        self.data = Path(ROOT) / 'data'
+        self.compress = compress
+        self._suffix = _SUFFIX[compress]
+
+    @stats.timed('write')
+    def write_doc(self, title: str, html: str, text: str, chunks: list[dict[str, any]]) -> None:
+        folder = self._folder(title)
+        raw = folder / f'{title}_raw.html{self._suffix}'
+        self._write(raw, html)
+        _link(raw, folder / f'{title}_input.txt{self._suffix}')  # same bytes as _raw.html => hard link instead of a second write
+        self._write(folder / f'{title}_output.txt{self._suffix}', text)
+        self._write(folder / f'{title}_chunks.jsonl{self._suffix}', _jsonl(chunks))  # one write for all lines
+        print(f'Written: "{title}" (raw/input, output, {len(chunks)} chunks)')
+
+    def write_text(self, title: str, text: str) -> None:
+        self._write(self._folder(title) / f'{title}_output.txt{self._suffix}', text)
+        print(f'Output: "{title}" has been written')
+
+    def open_doc(self, title: str, html: str) -> DocStream:
+        folder = self._folder(title)
+        raw = folder / f'{title}_raw.html{self._suffix}'
+        self._write(raw, html)
+        _link(raw, folder / f'{title}_input.txt{self._suffix}')
+        return _FolderDoc(title, folder / f'{title}_output.txt{self._suffix}', folder / f'{title}_chunks.jsonl{self._suffix}', self.compress)
+
+    def outputs(self, title: str) -> list[Path]: return [self.data / title / f'{title}_{name}{self._suffix}' for name in ('raw.html', 'input.txt', 'output.txt', 'chunks.jsonl')]
+
+    def _folder(self, title: str) -> Path:
+        folder = self.data / title
+        folder.mkdir(parents=True, exist_ok=True)
+        return folder
+
+    def _write(self, path: Path, text: str) -> None:
+        with _open(path, self.compress) as f:
+            for i in range(0, len(text), _BUFFER): f.write(text[i:i + _BUFFER])  # no encoded copy of a whole (very large) page
+        if stats.ENABLED: stats.count('bytes_written', path.stat().st_size)  # on disk (after compression)
+
+class _FolderDoc(DocStream):  # the same files as FolderWriter.write_doc, written line by line
+    def __init__(self, title: str, text_path: Path, chunks_path: Path, compress: str | None):
+        self.title, self.paths = title, (text_path, chunks_path)
+        self._text, self._chunks = _open(text_path, compress), _open(chunks_path, compress)
+        self._sep = ''  # no newline after the last line (same bytes as '\n'.join(lines))
+        self.n_chunks = 0
+
+    def write_line(self, line: str) -> None:
+        self._text.write(self._sep + line)
+        self._sep = '\n'
+
+    def write_chunk(self, chunk: dict[str, any]) -> None:
+        self._chunks.write(json.dumps(chunk, ensure_ascii=False) + '\n')
+        self.n_chunks += 1
+
+    def close(self) -> None:
+        self._text.close()
+        self._chunks.close()
+        if stats.ENABLED: stats.count('bytes_written', sum(p.stat().st_size for p in self.paths))
+        print(f'Written: "{self.title}" (raw/input, output, {self.n_chunks} chunks)')
+
+def _link(src: Path, dst: Path) -> None:
+    dst.unlink(missing_ok=True)  # a link to the old raw file would keep the old content
+    try: os.link(src, dst)
+    except OSError: shutil.copyfile(src, dst)  # no hard links (e.g. FAT, other drive) => copy
+
+class JsonlWriter(OutputWriter):  # one run = data/run-<time>-<pid>_chunks.jsonl (all chunks) + data/run-<time>-<pid>_docs.jsonl (title, html, text)
+    def __init__(self, ROOT: str | Path, compress: str | None = None):
+        data = Path(ROOT) / 'data'
+        data.mkdir(parents=True, exist_ok=True)
+        stem = _run_stem(data)
+        self.chunks_path, self.docs_path = Path(f'{stem}_chunks.jsonl{_SUFFIX[compress]}'), Path(f'{stem}_docs.jsonl{_SUFFIX[compress]}')
+        self._chunks = _open(self.chunks_path, compress, 'x')  # open for the whole run, never over the files of another run
+        self._docs = _open(self.docs_path, compress, 'x')
+
+    @stats.timed('write')
+    def write_doc(self, title: str, html: str, text: str, chunks: list[dict[str, any]]) -> None:
+        self._docs.write(json.dumps({'title': title, 'html': html, 'text': text}, ensure_ascii=False) + '\n')
+        self._chunks.write(_jsonl(chunks))
+        print(f'Written: "{title}" ({len(chunks)} chunks) to {self.chunks_path.name}')
+
+    def write_text(self, title: str, text: str) -> None: self._docs.write(json.dumps({'title': title, 'text': text}, ensure_ascii=False) + '\n')
+
+    def open_doc(self, title: str, html: str) -> DocStream: return _JsonlDoc(self, title, html)
+    def outputs(self, title: str) -> list[Path]: return [self.chunks_path, self.docs_path]
+
+    def close(self) -> None:
+        self._chunks.close()
+        self._docs.close()
+        stats.count('bytes_written', self.chunks_path.stat().st_size + self.docs_path.stat().st_size)
+
+class _JsonlDoc(DocStream):  # the docs line of write_doc written in pieces: the text string is escaped line by line
+    def __init__(self, writer: JsonlWriter, title: str, html: str):
+        self.writer, self.title = writer, title
+        writer._docs.write(json.dumps({'title': title}, ensure_ascii=False)[:-1] + ', "html": "')  # same separators as json.dumps
+        for i in range(0, len(html), _BUFFER): writer._docs.write(json.dumps(html[i:i + _BUFFER], ensure_ascii=False)[1:-1])
+        writer._docs.write('", "text": "')
+        self._sep = ''
+        self.n_chunks = 0
+
+    def write_line(self, line: str) -> None:
+        self.writer._docs.write(json.dumps(self._sep + line, ensure_ascii=False)[1:-1])
+        self._sep = '\n'
+
+    def write_chunk(self, chunk: dict[str, any]) -> None:
+        self.writer._chunks.write(json.dumps(chunk, ensure_ascii=False) + '\n')
+        self.n_chunks += 1
+
+    def close(self) -> None:
+        self.writer._docs.write('"}\n')
+        print(f'Written: "{self.title}" ({self.n_chunks} chunks) to {self.writer.chunks_path.name}')
+
+_META_COLUMNS = ('doc_id', 'chunk_index', 'headings', 'word_count', 'start_char', 'end_char', 'overlap_char', 'content_type',
+                 'content_hash', 'canonical_url', 'title', 'site', 'domain', 'language', 'fetched_at', 'cluster_id')  # chunk['metadata'] keys => columns
+
+def chunk_schema():
+    '''fixed schema of the chunk tables: metadata flattened, repeated strings dictionary encoded, headings as list<struct>'''
+    import pyarrow as pa  # optional dependency, only for the parquet/arrow outputs
+    repeated = pa.dictionary(pa.int32(), pa.string())  # same value for all chunks of a document (or of a site)
+    heading = pa.struct([('heading', pa.string()), ('lvl', pa.int16()), ('got_split', pa.bool_())])
+    return pa.schema([
+        ('id', pa.string()), ('text', pa.string()), ('doc_id', repeated), ('chunk_index', pa.int32()), ('headings', pa.list_(heading)),
+        ('word_count', pa.int32()), ('start_char', pa.int32()), ('end_char', pa.int32()), ('overlap_char', pa.int32()),
+        ('content_type', repeated), ('content_hash', pa.string()), ('canonical_url', repeated), ('title', repeated),
+        ('site', repeated), ('domain', repeated), ('language', repeated), ('fetched_at', pa.timestamp('us', tz='UTC')),
+        ('cluster_id', pa.string()),  # near-duplicate cluster (DEDUP = 'tag'), else null
+    ])
+
+def _docs_schema():
+    import pyarrow as pa
+    return pa.schema([('title', pa.string()), ('html', pa.large_string()), ('text', pa.large_string())])
+
+class _TableSink:  # rows buffered as columns => one record batch per `batch_rows`, numbered files of ~`file_rows` rows
+    def __init__(self, stem: str, schema, fmt: str, batch_rows: int | None = None, file_rows: int | None = None):
+        self.stem, self.schema, self.fmt = stem, schema, fmt
+        self.batch_rows, self.file_rows = batch_rows or ROW_GROUP, file_rows or ROWS_PER_FILE
+        self.paths: list[Path] = []
+        self._cols: dict[str, list] = {name: [] for name in schema.names}
+        self._rows = self._file_rows = 0
+        self._writer = None
+
+    def append(self, row: dict[str, any]) -> None:
+        for name, col in self._cols.items(): col.append(row.get(name))
+        self._rows += 1
+        if self._rows >= self.batch_rows: self.flush()
+
+    def flush(self) -> None:
+        if not self._rows: return
+        import pyarrow as pa
+        batch = pa.RecordBatch.from_pydict(self._cols, schema=self.schema)
+        if self._writer is None: self._writer = self._open()
+        self._writer.write_batch(batch)  # parquet: one row group per batch
+        self._file_rows += self._rows
+        self._cols = {name: [] for name in self._cols}
+        self._rows = 0
+        if self._file_rows >= self.file_rows: self._close_file()
+
+    def close(self) -> None:
+        self.flush()
+        self._close_file()
+
+    def current_path(self) -> Path:
+        '''file the rows appended so far end up in (opened with the next flush if no file is open)'''
+        n = len(self.paths) - (self._writer is not None)
+        return Path(f'{self.stem}-{n:05}.{"parquet" if self.fmt == "parquet" else "arrows"}')
+
+    def _open(self):
+        path = self.current_path()
+        self.paths.append(path)
+        if self.fmt == 'parquet':
+            import pyarrow.parquet as pq
+            return pq.ParquetWriter(path, self.schema, compression='zstd')
+        import pyarrow as pa
+        return pa.ipc.new_stream(path, self.schema, options=pa.ipc.IpcWriteOptions(compression='zstd'))  # stream format: the dictionaries may change per batch
+
+    def _close_file(self) -> None:
+        if self._writer is not None: self._writer.close()
+        self._writer, self._file_rows = None, 0
+
+class TableWriter(OutputWriter):  # data/run-<time>-<pid>_chunks-<n>.parquet|.arrows (one row per chunk) + data/run-<time>-<pid>_docs-<n>.* (title, html, text)
+    def __init__(self, ROOT: str | Path, fmt: str = 'parquet'):
+        data = Path(ROOT) / 'data'
+        data.mkdir(parents=True, exist_ok=True)
+        stem = _run_stem(data)
+        self.chunks = _TableSink(f'{stem}_chunks', chunk_schema(), fmt)
+        self.docs = _TableSink(f'{stem}_docs', _docs_schema(), fmt, batch_rows=64)  # whole pages => small batches
+
+    @stats.timed('write')
+    def write_doc(self, title: str, html: str, text: str, chunks: list[dict[str, any]]) -> None:
+        self.docs.append({'title': title, 'html': html, 'text': text})
+        for c in chunks: self.chunks.append(_flatten(c))
+        print(f'Written: "{title}" ({len(chunks)} chunks) to {self.chunks.stem}-*.{self.chunks.fmt}')
+
+    def write_text(self, title: str, text: str) -> None: self.docs.append({'title': title, 'text': text})
+    def outputs(self, title: str) -> list[Path]: return [self.docs.current_path()]  # chunkless documents still have their docs row
+
+    def close(self) -> None:
+        self.chunks.close()
+        self.docs.close()
+        stats.count('bytes_written', sum(p.stat().st_size for p in self.chunks.paths + self.docs.paths))
+
+def _flatten(chunk: dict[str, any]) -> dict[str, any]:
+    '''one table row of a chunk dict from chunking()'''
+    meta = chunk['metadata']
+    row = {k: meta.get(k) for k in _META_COLUMNS}
+    row['id'], row['text'] = chunk['id'], chunk['text']
+    if row['fetched_at']: row['fetched_at'] = datetime.fromisoformat(row['fetched_at'])
+    return row
+
+def get_writer(kind: str, ROOT: str | Path) -> OutputWriter:
+    '''folder | gzip | zstd (per document folders), jsonl | jsonl.gz | jsonl.zst (one combined file per run) or parquet | arrow (chunk tables)'''
+    if kind not in OUTPUTS: raise ValueError(f'unknown output {kind!r}, expected one of {OUTPUTS}')
+    if kind in ('parquet', 'arrow'): return TableWriter(ROOT, kind)
+    base, _, ext = kind.partition('.')
+    compress = {'gzip': 'gzip', 'zstd': 'zstd', 'gz': 'gzip', 'zst': 'zstd'}.get(ext or base)
+    return JsonlWriter(ROOT, compress) if base == 'jsonl' else FolderWriter(ROOT, compress)